@@ -0,0 +1,122 @@
+"""
+parse_company_regulations 벤치마크.
+
+현재 코퍼스(data/remo_guideline.json)로 원문과 비슷한 텍스트를 다시 만들고, 이를 N배(기본 1000배)
+이어 붙인 합성 코퍼스에서 다음을 비교합니다.
+ - legacy: 장마다 패턴을 다시 컴파일하고 장/조 텍스트를 복사한 뒤, 전체 리스트를 json.dumps(indent=2)
+ - list: parse_company_regulations() + write_json()
+ - stream: iter_company_regulations() -> write_jsonl() (레코드를 하나씩 씀)
+ - item / clause: 항/호 단위로 더 잘게 나눠서 write_jsonl()
+
+사용법: python benchmarks/bench_chunk_data.py [--scale 1000]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from chunk_data import parse_company_regulations, iter_company_regulations, write_json, write_jsonl
+
+
+def legacy_parse_company_regulations(text):
+    # 이전 구현 (비교 기준)
+    results = []
+    chapter_pattern = re.compile(r'(제\d+장)')
+    chapters = list(chapter_pattern.finditer(text))
+    chapter_positions = [(m.start(), m.group(1)) for m in chapters]
+    for idx, (start_pos, chapter_title) in enumerate(chapter_positions):
+        chapter_end = chapter_positions[idx + 1][0] if idx + 1 < len(chapter_positions) else len(text)
+        chapter_text = text[start_pos:chapter_end]
+        article_pattern = re.compile(r'(제\d+조\()')
+        article_matches = list(article_pattern.finditer(chapter_text))
+        if article_matches:
+            article_starts = [m.start() for m in article_matches]
+            article_starts.append(len(chapter_text))
+            for i in range(len(article_matches)):
+                article_block = chapter_text[article_starts[i]:article_starts[i + 1]].strip()
+                split_index = article_block.find(") ")
+                if split_index != -1:
+                    title = article_block[:split_index + 1].strip()
+                    content = article_block[split_index + 2:].strip()
+                else:
+                    title = article_block
+                    content = ""
+                results.append({"section": chapter_title, "title": title, "content": content.replace("\n", " ")})
+        else:
+            results.append({"section": chapter_title, "title": "", "content": chapter_text.strip().replace("\n", "")})
+    return results
+
+
+class NullWriter:
+    # 디스크 속도 대신 직렬화 비용만 재기 위해 쓴 글자 수만 셉니다.
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, s):
+        self.chars += len(s)
+
+
+def build_corpus(json_path, scale):
+    with open(json_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    # 같은 장의 조항은 장 제목 뒤에 이어지도록 원문 형태로 되돌립니다.
+    lines = []
+    current_section = None
+    for entry in entries:
+        if entry["section"] != current_section:
+            current_section = entry["section"]
+            lines.append(f"{current_section} \n")
+        lines.append(f"{entry['title']} {entry['content']}\n")
+    return "".join(lines) * scale
+
+
+def measure(name, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:8s} {elapsed:8.2f}s {count / elapsed:12,.0f} records/s  peak {peak / 2**20:8.1f} MiB")
+    return elapsed
+
+
+def run_legacy(text):
+    records = legacy_parse_company_regulations(text)
+    NullWriter().write(json.dumps(records, ensure_ascii=False, indent=2))
+    return len(records)
+
+
+def run_list(text):
+    records = parse_company_regulations(text)
+    write_json(records, NullWriter())
+    return len(records)
+
+
+def run_stream(text, granularity="article"):
+    return write_jsonl(iter_company_regulations(text, granularity), NullWriter())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--json", default=os.path.join(ROOT, "data/remo_guideline.json"))
+    args = parser.parse_args()
+
+    text = build_corpus(args.json, args.scale)
+    print(f"합성 코퍼스: {args.scale}배, {len(text) / 2**20:.1f}M 글자")
+    # 결과가 이전 구현과 같은지 작은 입력으로 먼저 확인합니다.
+    sample = build_corpus(args.json, 1)
+    assert legacy_parse_company_regulations(sample) == parse_company_regulations(sample)
+
+    measure("legacy", lambda: run_legacy(text))
+    measure("list", lambda: run_list(text))
+    measure("stream", lambda: run_stream(text))
+    measure("item", lambda: run_stream(text, "item"))
+    measure("clause", lambda: run_stream(text, "clause"))
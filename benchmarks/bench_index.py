@@ -0,0 +1,64 @@
+"""
+벡터 인덱스 종류별 크기/속도/정확도 비교.
+
+군집 구조가 있는 합성 임베딩(기본 1536차원, text-embedding-ada-002와 같은 크기)으로
+index_store.build_faiss_index()가 만드는 인덱스 종류마다 다음을 출력합니다.
+ - 학습+추가 시간, 직렬화된 인덱스 크기(bytes/문서)
+ - 질의당 검색 시간
+ - flat(정확 검색) 대비 recall@10 (코퍼스 벡터에 잡음을 더한 별도 질의 사용)
+
+사용법: python benchmarks/bench_index.py [--size 20000] [--dim 1536] [--types flat,sq8,hnsw,ivf,pq,ivfpq]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import faiss
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from index_store import build_faiss_index, configure_search, RECALL_K
+
+
+def make_vectors(size, dim, num_clusters, rng):
+    # 조항들이 주제별로 모여 있는 실제 임베딩과 비슷하게, 군집 중심 + 잡음으로 만듭니다.
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, size)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--types", default="flat,sq8,hnsw,ivf,pq,ivfpq")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(args.size, args.dim, max(1, args.size // 50), rng)
+    queries = vectors[rng.choice(args.size, args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, expected = exact.search(queries, RECALL_K)
+
+    print(f"문서 {args.size}개, {args.dim}차원, 질의 {args.queries}개")
+    print(f"{'type':8s} {'build':>8s} {'bytes/doc':>10s} {'ms/query':>9s} {'recall@' + str(RECALL_K):>10s}")
+    for index_type in args.types.split(","):
+        started = time.perf_counter()
+        index, built_type = build_faiss_index(vectors, index_type)
+        build_seconds = time.perf_counter() - started
+        configure_search(index)
+        bytes_per_doc = len(faiss.serialize_index(index)) / args.size
+
+        started = time.perf_counter()
+        _, actual = index.search(queries, RECALL_K)
+        ms_per_query = (time.perf_counter() - started) * 1000 / args.queries
+        recall = sum(len(set(e) & set(a)) for e, a in zip(expected, actual)) / (args.queries * RECALL_K)
+        print(f"{built_type:8s} {build_seconds:7.1f}s {bytes_per_doc:10.0f} {ms_per_query:9.3f} {recall:10.3f}")
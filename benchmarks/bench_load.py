@@ -0,0 +1,273 @@
+"""
+FastAPI 백엔드 부하 테스트 (OpenAI/Ollama 없이).
+
+stub_openai_server.py를 띄우고, 백엔드(uvicorn backend:app)를 그 서버에 붙여 실행한 뒤
+workload.py의 한국어 질문을 동시 요청 수(concurrency)별로 보내서 다음을 출력합니다.
+ - 기동 시간: 인덱스가 없을 때(cold, 임베딩+인덱스 생성)와 저장된 인덱스를 열 때(warm).
+   /healthz가 응답하기까지(프로세스 기동)와 /readyz가 200이 되기까지(워밍업 완료)를 따로 잽니다.
+ - 엔드포인트/동시성별 QPS, 지연 시간 p50/p95/p99, 스트리밍은 첫 토큰까지의 시간(TTFT), 상태 코드별 실패 수
+ - 백엔드 프로세스 RSS (기동 직후, 부하 후, 최대)
+코퍼스는 임시 디렉터리에 복사해서 쓰므로 data/의 인덱스는 건드리지 않습니다.
+--json-out으로 결과를 커밋 해시와 함께 저장하면 커밋 간에 비교할 수 있습니다.
+
+사용법: python benchmarks/bench_load.py [--concurrency 1,4,16] [--requests 100]
+        [--routes guideline,guideline/stream,guideline/ollama] [--embedding-provider fake|openai]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from workload import build_workload, DEFAULT_JSON_PATH
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_rss(pid: int):
+    # (현재 RSS, 최대 RSS) MiB. /proc이 없는 OS에서는 (None, None)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_ready(url: str, process, timeout: float):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"프로세스가 종료되었습니다 (code {process.returncode}): {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{timeout}초 안에 준비되지 않았습니다: {url}")
+
+
+def start_process(args, env, cwd, ready_urls, timeout, log_path):
+    """
+    프로세스를 띄우고 ready_urls가 차례로 200을 돌려줄 때까지 기다립니다. (URL별 기동 후 경과 시간 목록 반환)
+    """
+    # 출력은 파이프가 차서 멈추지 않도록 파일로 보냅니다.
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(args, env=env, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        started = time.perf_counter()
+        elapsed = []
+        for url in ready_urls:
+            wait_until_ready(url, process, timeout)
+            elapsed.append(time.perf_counter() - started)
+        return process, elapsed
+    except Exception:
+        process.kill()
+        with open(log_path, "rb") as log:
+            print(log.read().decode("utf-8", "replace")[-2000:])
+        raise
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def prepare_corpus(json_path: str, directory: str):
+    shutil.copy(json_path, os.path.join(directory, "remo_guideline.json"))
+    manifest = {"documents": [{"id": "remo_guideline", "title": "취업규칙", "path": "remo_guideline.json"}]}
+    with open(os.path.join(directory, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return os.path.join(directory, "corpus.json")
+
+
+async def send(client, route, item, session_id):
+    payload = {"session_id": session_id, "query": item["query"], "history_mode": "delta", "conversation": False}
+    started = time.perf_counter()
+    first_token = None
+    if route.endswith("/stream"):
+        async with client.stream("POST", f"/chatbot/{route}", json=payload) as response:
+            status = response.status_code
+            async for line in response.aiter_lines():
+                if first_token is None and line.startswith('{"type": "token"'):
+                    first_token = time.perf_counter() - started
+                if line.startswith('{"type": "error"'):
+                    status = "stream_error"
+    else:
+        response = await client.post(f"/chatbot/{route}", json=payload)
+        status = response.status_code
+    return status, time.perf_counter() - started, first_token
+
+
+async def run_level(base_url, route, workload, concurrency, total):
+    """
+    동시에 concurrency개씩 요청을 보내며 total개를 처리합니다. 작업자마다 세션 하나를 씁니다.
+    """
+    latencies, ttfts, failures = [], [], {}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(workload[i % len(workload)])
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def worker():
+            session_id = uuid.uuid4().hex
+            while not queue.empty():
+                item = queue.get_nowait()
+                try:
+                    status, latency, first_token = await send(client, route, item, session_id)
+                except httpx.HTTPError as e:
+                    status, latency, first_token = type(e).__name__, None, None
+                if status == 200:
+                    latencies.append(latency)
+                    if first_token is not None:
+                        ttfts.append(first_token)
+                else:
+                    failures[str(status)] = failures.get(str(status), 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "route": route, "concurrency": concurrency, "requests": total, "ok": len(latencies),
+        "failures": failures, "seconds": round(elapsed, 3), "qps": round(len(latencies) / elapsed, 2),
+    }
+    for name, values in (("latency", latencies), ("ttft", ttfts)):
+        for q in (0.5, 0.95, 0.99):
+            value = percentile(values, q)
+            result[f"{name}_p{int(q * 100)}_ms"] = round(value * 1000, 1) if value is not None else None
+    return result
+
+
+def print_results(report):
+    startup = report["startup"]
+    print(f"커밋 {report['commit']}, 기동(/readyz) cold {startup['cold_seconds']:.2f}s / warm {startup['warm_seconds']:.2f}s, "
+          f"/healthz까지 {startup['healthz_seconds']:.2f}s")
+    rss = report["rss_mib"]
+    if rss["idle"] is not None:
+        print(f"RSS 기동 직후 {rss['idle']:.0f} MiB, 부하 후 {rss['after_load']:.0f} MiB, 최대 {rss['peak']:.0f} MiB")
+    print(f"{'route':22s} {'conc':>4s} {'qps':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'ttft50':>8s} {'fail':>5s}")
+    for r in report["results"]:
+        fmt = lambda value: f"{value:8.1f}" if value is not None else f"{'-':>8s}"
+        print(f"{r['route']:22s} {r['concurrency']:4d} {r['qps']:7.2f} {fmt(r['latency_p50_ms'])} {fmt(r['latency_p95_ms'])} "
+              f"{fmt(r['latency_p99_ms'])} {fmt(r['ttft_p50_ms'])} {sum(r['failures'].values()):5d}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", default=DEFAULT_JSON_PATH, help="질문과 코퍼스를 만들 조항 JSON")
+    parser.add_argument("--routes", default="guideline,guideline/stream,guideline/ollama")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=100, help="동시성 단계마다 보낼 요청 수")
+    parser.add_argument("--workload-size", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedding-provider", default="fake", choices=("fake", "openai"),
+                        help="fake: 백엔드 안에서 해시 임베딩, openai: 스텁 서버의 /v1/embeddings를 HTTP로 호출")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="답변 캐시를 켭니다. (기본은 꺼서, 같은 질문이 반복되어도 매번 검색/생성 경로를 측정)")
+    parser.add_argument("--stub-latency", type=float, default=0.3)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--stub-completion-tokens", type=int, default=60)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--json-out", help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args()
+
+    workload = build_workload(args.json, args.workload_size, args.seed)
+    stub_port, backend_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        env.update({
+            "GUIDELINE_CORPUS": prepare_corpus(args.json, directory),
+            "GUIDELINE_OPENAI_BASE_URL": f"{stub_url}/v1",
+            "GUIDELINE_OLLAMA_BASE_URL": f"{stub_url}/v1",
+            "GUIDELINE_EMBEDDING_PROVIDER": args.embedding_provider,
+            "OPENAI_API_KEY": "stub",
+            "PYTHONUNBUFFERED": "1",
+        })
+        if not args.answer_cache:
+            env["GUIDELINE_ANSWER_CACHE_SIZE"] = "0"
+
+        stub, _ = start_process(
+            [sys.executable, os.path.join(ROOT, "benchmarks", "stub_openai_server.py"), "--port", str(stub_port),
+             "--latency", str(args.stub_latency), "--tokens-per-second", str(args.stub_tokens_per_second),
+             "--completion-tokens", str(args.stub_completion_tokens)],
+            env, ROOT, [f"{stub_url}/v1/models"], 60, os.path.join(directory, "stub.log"),
+        )
+        backend_args = [sys.executable, "-m", "uvicorn", "backend:app", "--host", "127.0.0.1",
+                        "--port", str(backend_port), "--log-level", "warning"]
+        src = os.path.join(ROOT, "src")
+        backend_log = os.path.join(directory, "backend.log")
+        try:
+            # cold: 인덱스가 없어서 임베딩과 인덱스 생성까지 포함한 기동 시간
+            ready_urls = [f"{backend_url}/healthz", f"{backend_url}/readyz"]
+            backend, (_, cold_seconds) = start_process(backend_args, env, src, ready_urls, args.startup_timeout, backend_log)
+            stop_process(backend)
+            # warm: 저장된 인덱스를 여는 기동 시간. 부하 테스트는 이 프로세스로 합니다.
+            backend, (healthz_seconds, warm_seconds) = start_process(backend_args, env, src, ready_urls, args.startup_timeout, backend_log)
+            try:
+                idle_rss, _ = read_rss(backend.pid)
+                results = []
+                for route in args.routes.split(","):
+                    for concurrency in (int(value) for value in args.concurrency.split(",")):
+                        result = asyncio.run(run_level(backend_url, route, workload, concurrency, args.requests))
+                        print(f"  {route} x{concurrency}: {result['qps']} qps, p95 {result['latency_p95_ms']} ms")
+                        results.append(result)
+                after_rss, peak_rss = read_rss(backend.pid)
+            finally:
+                stop_process(backend)
+        finally:
+            stop_process(stub)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key != "json_out"},
+        "startup": {"cold_seconds": round(cold_seconds, 3), "warm_seconds": round(warm_seconds, 3),
+                    "healthz_seconds": round(healthz_seconds, 3)},
+        "rss_mib": {"idle": idle_rss, "after_load": after_rss, "peak": peak_rss},
+        "results": results,
+    }
+    print_results(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+골든 질문 세트로 검색 설정별 정확도와 속도를 비교합니다. (LLM 호출 없음)
+
+data/golden_questions.jsonl의 {"query": 질문, "expected": ["제N조", ...]}마다 검색을 실행해서
+설정별로 다음을 나란히 출력합니다.
+ - recall@k: 기대 조항 중 상위 k개 안에 나온 비율, hit@1: 1위가 기대 조항인 비율
+ - MRR: 처음 맞힌 조항 순위의 역수 평균 (못 찾으면 0)
+ - empty: 답할 수 있는 질문인데 재정렬 기준을 넘는 조항이 없어 되묻기로 끝난 비율
+ - reject: expected가 빈 질문(규정과 무관한 질문)에 빈 결과를 돌려준 비율
+ - 질의당 검색 시간 평균/p50/p95/p99와 단계별(tracing span) 평균, 인덱스 생성/적재 시간
+   (설정마다 쿼리 임베딩 메모리 캐시를 비우고 시작하므로 첫 회는 임베딩 호출 시간이 포함됩니다)
+--json-out으로 질문별 결과까지 저장하고, --compare로 이전 결과와 비교해 지표 차이와
+순위가 바뀐 질문을 보여 줍니다.
+
+설정은 ';'로 구분하고, 각 설정은 key=value를 ','로 나열합니다.
+ - mode: dense/lexical/hybrid, k: 반환 조항 수, reranker: none/lexical/cross-encoder
+ - index: FAISS 인덱스 종류(auto/flat/sq8/hnsw/ivf/pq/ivfpq), embedding: openai/local/fake
+ - granularity: article/item/clause (저장된 조항 JSON을 chunk_data.refine_records로 다시 나눔)
+코퍼스는 설정마다 임시 디렉터리에 복사해서 인덱스를 만들므로 data/의 인덱스는 건드리지 않습니다.
+
+사용법: python benchmarks/eval_retrieval.py [--configs "mode=hybrid,k=4;mode=dense,k=4,index=sq8"]
+        [--golden data/golden_questions.jsonl] [--query-source router|question] [--json-out eval.json] [--compare old.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from chunk_data import refine_records, write_json
+from query_router import QueryRouter, LOGO_LABEL, TOC_LABEL
+from article_index import ARTICLE_PATTERN
+from reranker import create_reranker, DEFAULT_RERANKER
+from retrieval_engine import GuidelineRetrievalEngine, DEFAULT_RETRIEVAL_MODE, DEFAULT_K
+from embedding_providers import DEFAULT_EMBEDDING_PROVIDER
+from index_store import DEFAULT_INDEX_TYPE
+from tracing import start_trace, end_trace
+
+DEFAULT_CORPUS = os.path.join(ROOT, "data", "remo_guideline.json")
+DEFAULT_GOLDEN = os.path.join(ROOT, "data", "golden_questions.jsonl")
+DEFAULT_CONFIGS = "mode=hybrid;mode=dense;mode=lexical;mode=hybrid,reranker=none"
+CONFIG_KEYS = ("mode", "k", "reranker", "index", "embedding", "granularity")
+
+
+def parse_configs(text: str):
+    """
+    "mode=hybrid,k=4;mode=dense" -> 빠진 값은 기본 설정(환경 변수)으로 채운 설정 목록
+    """
+    configs = []
+    for spec in filter(None, (part.strip() for part in text.split(";"))):
+        config = {
+            "mode": DEFAULT_RETRIEVAL_MODE, "k": DEFAULT_K, "reranker": DEFAULT_RERANKER,
+            "index": DEFAULT_INDEX_TYPE, "embedding": DEFAULT_EMBEDDING_PROVIDER, "granularity": "article",
+        }
+        for pair in filter(None, (item.strip() for item in spec.split(","))):
+            key, _, value = pair.partition("=")
+            if key not in CONFIG_KEYS or not value:
+                raise ValueError(f"알 수 없는 설정입니다: {pair} (가능한 키: {', '.join(CONFIG_KEYS)})")
+            config[key] = int(value) if key == "k" else value
+        configs.append(config)
+    return configs
+
+
+def config_name(config):
+    return ",".join(f"{key}={config[key]}" for key in CONFIG_KEYS)
+
+
+def load_golden(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    for item in items:
+        item["expected_articles"] = [int(number) for number in ARTICLE_PATTERN.findall(" ".join(item["expected"]))]
+    return items
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class EngineCache:
+    """
+    인덱스에 영향을 주는 설정(임베딩, 인덱스 종류, 분할 단위)이 같은 설정끼리는 엔진을 공유합니다.
+    (mode/k/reranker는 검색 시점 설정이므로 같은 인덱스로 비교합니다)
+    """
+    def __init__(self, corpus_path: str, directory: str):
+        self.corpus_path = corpus_path
+        self.directory = directory
+        self.engines = {}
+
+    def prepare_corpus(self, key, granularity: str):
+        corpus_dir = os.path.join(self.directory, "-".join(key))
+        os.makedirs(corpus_dir, exist_ok=True)
+        path = os.path.join(corpus_dir, os.path.basename(self.corpus_path))
+        with open(self.corpus_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        with open(path, "w", encoding="utf-8") as f:
+            write_json(refine_records(records, granularity), f)
+        return path
+
+    def get(self, config):
+        key = (config["embedding"], config["index"], config["granularity"])
+        if key not in self.engines:
+            path = self.prepare_corpus(key, config["granularity"])
+            started = time.perf_counter()
+            engine = GuidelineRetrievalEngine(path, embedding_provider=config["embedding"], index_type=config["index"])
+            build_seconds = time.perf_counter() - started
+            router = QueryRouter.from_documents(engine.documents)
+            self.engines[key] = (engine, router, build_seconds, len(engine.documents))
+        return self.engines[key]
+
+
+def search_query(item, router, query_source: str):
+    """
+    봇과 같은 검색어를 만듭니다. router이면 규칙 라우터의 키워드(확신이 없으면 질문 그대로),
+    question이면 질문 그대로 검색합니다. (LLM 분류는 호출하지 않습니다)
+    """
+    if query_source == "router":
+        label = router.classify(item["query"])
+        if label and label not in (LOGO_LABEL, TOC_LABEL):
+            return label
+    return item["query"]
+
+
+def score_query(item, docs, k: int):
+    # 같은 조를 항/호 단위로 나눈 청크가 여러 개 나와도 조 번호 기준으로 한 번만 셉니다.
+    articles = []
+    for doc in docs:
+        article = doc.metadata.get("article")
+        if article not in articles:
+            articles.append(article)
+    expected = item["expected_articles"]
+    ranks = [rank for rank, article in enumerate(articles[:k], 1) if article in expected]
+    return {
+        "articles": articles,
+        "first_rank": ranks[0] if ranks else None,
+        "recall": len({articles[rank - 1] for rank in ranks}) / len(expected) if expected else None,
+        "empty": not docs,
+    }
+
+
+def evaluate(config, golden, engines: EngineCache, query_source: str, repeat: int):
+    engine, router, build_seconds, num_documents = engines.get(config)
+    engine.reranker = create_reranker(config["reranker"])
+    # 설정끼리 같은 조건에서 비교하도록, 앞 설정이 남긴 쿼리 임베딩 캐시를 비웁니다.
+    engine.embeddings.clear()
+    rerank = config["reranker"] != "none"
+    latencies = []
+    stage_seconds = defaultdict(float)
+    results = []
+    for item in golden:
+        query = search_query(item, router, query_source)
+        for _ in range(repeat):
+            trace, token = start_trace()
+            try:
+                started = time.perf_counter()
+                docs = engine.retrieve(query, k=config["k"], mode=config["mode"], rerank=rerank)
+                latencies.append(time.perf_counter() - started)
+            finally:
+                end_trace(token)
+            for stage, _, seconds in trace.spans:
+                stage_seconds[stage] += seconds
+        result = score_query(item, docs, config["k"])
+        results.append(dict(result, query=item["query"], search_query=query, expected=item["expected"]))
+
+    answerable = [r for r in results if r["expected"]]
+    unanswerable = [r for r in results if not r["expected"]]
+    mean = lambda values: sum(values) / len(values) if values else None
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    summary = {
+        "name": config_name(config),
+        "config": config,
+        "documents": num_documents,
+        "build_seconds": round(build_seconds, 3),
+        "recall_at_k": mean([r["recall"] for r in answerable]),
+        "hit_at_1": mean([1.0 if r["first_rank"] == 1 else 0.0 for r in answerable]),
+        "mrr": mean([1.0 / r["first_rank"] if r["first_rank"] else 0.0 for r in answerable]),
+        "empty_rate": mean([1.0 if r["empty"] else 0.0 for r in answerable]),
+        "reject_rate": mean([1.0 if r["empty"] else 0.0 for r in unanswerable]),
+        "latency_ms": {
+            "mean": ms(mean(latencies)),
+            "p50": ms(percentile(latencies, 0.5)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+        },
+        "stage_mean_ms": {stage: ms(seconds / len(latencies)) for stage, seconds in stage_seconds.items()},
+        "queries": results,
+    }
+    for key in ("recall_at_k", "hit_at_1", "mrr", "empty_rate", "reject_rate"):
+        if summary[key] is not None:
+            summary[key] = round(summary[key], 4)
+    return summary
+
+
+def print_summaries(summaries):
+    fmt = lambda value, spec: format(value, spec) if value is not None else "-"
+    print(f"{'config':72s} {'docs':>5s} {'recall':>7s} {'hit@1':>6s} {'MRR':>6s} {'empty':>6s} {'reject':>6s} "
+          f"{'mean':>7s} {'p50':>7s} {'p95':>7s} {'p99':>7s}")
+    for s in summaries:
+        latency = s["latency_ms"]
+        print(f"{s['name']:72s} {s['documents']:5d} {fmt(s['recall_at_k'], '7.3f')} {fmt(s['hit_at_1'], '6.3f')} "
+              f"{fmt(s['mrr'], '6.3f')} {fmt(s['empty_rate'], '6.3f')} {fmt(s['reject_rate'], '6.3f')} "
+              f"{fmt(latency['mean'], '7.2f')} {fmt(latency['p50'], '7.2f')} {fmt(latency['p95'], '7.2f')} {fmt(latency['p99'], '7.2f')}")
+    print("(지연 시간 단위: ms/질의)")
+    for s in summaries:
+        stages = " ".join(f"{stage}={value:.2f}" for stage, value in s["stage_mean_ms"].items())
+        print(f"  {s['name']}: 인덱스 {s['build_seconds']:.2f}s, 단계 평균(ms) {stages}")
+
+
+def compare(summaries, previous_path: str):
+    """
+    이전 --json-out 결과와 같은 이름의 설정끼리 지표 차이와, 처음 맞힌 순위가 바뀐 질문을 출력합니다.
+    """
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    previous_by_name = {s["name"]: s for s in previous["summaries"]}
+    print(f"\n비교 대상: 커밋 {previous.get('commit')} ({previous.get('timestamp')})")
+    for s in summaries:
+        old = previous_by_name.get(s["name"])
+        if old is None:
+            print(f"  {s['name']}: 이전 결과 없음")
+            continue
+        deltas = []
+        for key in ("recall_at_k", "hit_at_1", "mrr", "empty_rate", "reject_rate"):
+            if s[key] is not None and old.get(key) is not None:
+                deltas.append(f"{key} {s[key] - old[key]:+.3f}")
+        if s["latency_ms"]["p50"] is not None and old["latency_ms"].get("p50"):
+            deltas.append(f"p50 {s['latency_ms']['p50'] - old['latency_ms']['p50']:+.2f}ms")
+        print(f"  {s['name']}: {', '.join(deltas)}")
+        old_ranks = {r["query"]: r["first_rank"] for r in old.get("queries", [])}
+        for r in s["queries"]:
+            if r["query"] in old_ranks and old_ranks[r["query"]] != r["first_rank"]:
+                print(f"    {r['query']}: 순위 {old_ranks[r['query']]} -> {r['first_rank']} (기대 {', '.join(r['expected'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="조항 JSON (parse_company_regulations 결과)")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS)
+    parser.add_argument("--query-source", default="router", choices=("router", "question"),
+                        help="router: 봇처럼 규칙 라우터 키워드로 검색, question: 질문 그대로 검색")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="질문마다 검색을 반복할 횟수 (2회째부터는 쿼리 임베딩 캐시가 적중합니다)")
+    parser.add_argument("--show-misses", action="store_true", help="기대 조항을 찾지 못한 질문을 출력")
+    parser.add_argument("--json-out", help="설정별 요약과 질문별 결과를 저장할 경로")
+    parser.add_argument("--compare", help="이전 --json-out 결과와 비교")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    configs = parse_configs(args.configs)
+    with tempfile.TemporaryDirectory() as directory:
+        engines = EngineCache(args.corpus, directory)
+        summaries = [evaluate(config, golden, engines, args.query_source, args.repeat) for config in configs]
+
+    print(f"골든 질문 {len(golden)}개 ({sum(1 for item in golden if item['expected'])}개는 답할 수 있는 질문), "
+          f"검색어: {args.query_source}")
+    print_summaries(summaries)
+    if args.show_misses:
+        for s in summaries:
+            misses = [r for r in s["queries"] if r["expected"] and r["first_rank"] is None]
+            print(f"\n{s['name']}: 못 찾은 질문 {len(misses)}개")
+            for r in misses:
+                found = ", ".join(f"제{article}조" if article is not None else "본문" for article in r["articles"]) or "없음"
+                print(f"  {r['query']} [{r['search_query']}] 기대 {', '.join(r['expected'])} / 결과 {found}")
+    if args.compare:
+        compare(summaries, args.compare)
+    if args.json_out:
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "golden": os.path.relpath(args.golden, ROOT),
+            "query_source": args.query_source,
+            "summaries": summaries,
+        }
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+벤치마크용 OpenAI 호환 스텁 서버.
+
+OpenAI/Ollama 대신 이 서버에 붙이면, 실제 모델 없이 정해진 지연 시간과 토큰 속도로 응답합니다.
+ - POST /v1/chat/completions: 일반/스트리밍(SSE) 응답. 프롬프트 종류를 보고
+   분류(핵심 키워드, logo_request/toc_request, 번호 목록), 질문 재작성, 답변(출처 포함)을 흉내 냅니다.
+ - POST /v1/embeddings: embedding_providers.HashingEmbeddings와 같은 결정적 해시 임베딩
+ - GET /v1/models
+
+사용법: python benchmarks/stub_openai_server.py [--port 6210] [--latency 0.3] [--tokens-per-second 40]
+봇 쪽 설정: GUIDELINE_OPENAI_BASE_URL=http://127.0.0.1:6210/v1 GUIDELINE_OLLAMA_BASE_URL=http://127.0.0.1:6210/v1
+"""
+import os
+import re
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from embedding_providers import HashingEmbeddings
+from query_router import strip_particle
+
+ARTICLE_TITLE_PATTERN = re.compile(r"제\d+조(?:의\d+)?\([^)]*\)")
+QUESTION_LINE_PATTERN = re.compile(r"질문:\s*(.+)")
+NUMBERED_LINE_PATTERN = re.compile(r"^\s*(\d+)\.\s*(.+?)\s*$", re.MULTILINE)
+WORD_PATTERN = re.compile(r"[가-힣A-Za-z0-9]+")
+ANSWER_WORDS = ("회사", "내규에", "따르면", "해당", "사항은", "다음과", "같이", "처리됩니다.", "자세한", "내용은",
+                "소속", "부서장과", "인사팀에", "문의해", "주세요.")
+
+app = FastAPI()
+settings = argparse.Namespace(latency=0.3, tokens_per_second=40.0, completion_tokens=60, embedding_latency=0.01, dim=1536)
+embeddings = None
+
+
+def keyword(question: str):
+    if "로고" in question:
+        return "logo_request"
+    if "목차" in question:
+        return "toc_request"
+    words = [strip_particle(word) for word in WORD_PATTERN.findall(question)]
+    return max(words, key=len) if words else question
+
+
+def respond(messages):
+    """
+    프롬프트 종류에 맞는 응답 텍스트를 만듭니다. (분류/재작성은 짧게, 답변은 completion_tokens 단어)
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    if "핵심적인 단어" in prompt:
+        body = prompt.split("질문:", 1)[-1]
+        if "번호" in prompt:
+            return "\n".join(f"{number}. {keyword(question)}" for number, question in NUMBERED_LINE_PATTERN.findall(body))
+        match = QUESTION_LINE_PATTERN.search(prompt)
+        return keyword(match.group(1) if match else prompt)
+    if "독립적인 질문" in prompt:
+        match = QUESTION_LINE_PATTERN.search(prompt)
+        return match.group(1).strip() if match else prompt
+    source = ARTICLE_TITLE_PATTERN.search(prompt)
+    words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(settings.completion_tokens)]
+    words.append(f"출처: {source.group(0) if source else '제1조(목적)'}(취업규칙)")
+    return " ".join(words)
+
+
+def split_tokens(text: str):
+    # 공백 단위 조각을 토큰으로 취급합니다.
+    pieces = text.split(" ")
+    return [piece if i == 0 else " " + piece for i, piece in enumerate(pieces)]
+
+
+def usage(messages, text):
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 2
+    completion_tokens = len(split_tokens(text))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "benchmark"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    messages = payload.get("messages", [])
+    model = payload.get("model", "stub")
+    text = respond(messages)
+    tokens = split_tokens(text)
+    created = int(time.time())
+    completion_id = f"chatcmpl-stub-{time.monotonic_ns()}"
+    token_delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+
+    if not payload.get("stream"):
+        await asyncio.sleep(settings.latency + token_delay * len(tokens))
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage(messages, text),
+        })
+
+    def chunk(delta, finish_reason=None):
+        data = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def event_stream():
+        await asyncio.sleep(settings.latency)
+        yield chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            yield chunk({"content": token})
+            if token_delay:
+                await asyncio.sleep(token_delay)
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request):
+    payload = await request.json()
+    inputs = payload.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    # 토큰 ID 입력은 문자열로 바꿔서 해시합니다. (결정적이기만 하면 됩니다)
+    texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+    if settings.embedding_latency > 0:
+        await asyncio.sleep(settings.embedding_latency)
+    vectors = embeddings.embed_documents(texts)
+    base64_output = payload.get("encoding_format") == "base64"
+    data = []
+    for i, vector in enumerate(vectors):
+        value = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode() if base64_output else vector
+        data.append({"object": "embedding", "index": i, "embedding": value})
+    tokens = sum(len(text) for text in texts) // 2
+    return {"object": "list", "data": data, "model": payload.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6210)
+    parser.add_argument("--latency", type=float, default=0.3, help="첫 토큰까지의 지연(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="생성 속도 (0이면 지연 없음)")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="답변 길이(단어 수)")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="임베딩 요청당 지연(초)")
+    parser.add_argument("--dim", type=int, default=1536, help="임베딩 차원")
+    args = parser.parse_args()
+    settings = args
+    embeddings = HashingEmbeddings(args.dim)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
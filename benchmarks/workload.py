@@ -0,0 +1,85 @@
+"""
+조항 JSON(remo_guideline.json)에서 벤치마크용 한국어 질문 목록을 만듭니다.
+
+조항 제목의 주제어(예: 제31조(연차유급휴가) -> 연차유급휴가)로 여러 말투의 질문을 만들고,
+조항 번호 질문, 목차/로고 요청, 모호한 질문을 실제 사용 비율과 비슷하게 섞습니다.
+같은 seed면 항상 같은 목록이 나오므로 커밋 간에 결과를 비교할 수 있습니다.
+
+사용법: python benchmarks/workload.py [--size 200] [--seed 0] > workload.jsonl
+"""
+import os
+import re
+import json
+import random
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_JSON_PATH = os.path.join(ROOT, "data", "remo_guideline.json")
+
+TITLE_PATTERN = re.compile(r"제(\d+)조(?:의\d+)?\(([^)]*)\)")
+TOPIC_TEMPLATES = (
+    "{topic}에 대해 알려줘",
+    "{topic}{eun} 어떻게 되나요?",
+    "{topic} 관련 규정이 궁금합니다",
+    "{topic} 기준이 뭐야?",
+    "우리 회사 {topic} 규정 좀 설명해 주세요",
+)
+ARTICLE_TEMPLATES = ("제{number}조 내용 알려줘", "제{number}조는 무슨 내용이야?")
+FIXED_QUESTIONS = {
+    "toc": ("회사 내규의 목차를 보여줘", "취업규칙 목차 알려줘"),
+    "logo": ("회사의 로고를 제공해 줘", "회사 로고 보여줘"),
+    "vague": ("이거 어떻게 해요?", "그거 언제까지 해야 돼?", "오늘 점심 뭐 먹지?"),
+}
+# 질문 종류별 비율
+MIX = (("topic", 0.75), ("article", 0.1), ("toc", 0.05), ("logo", 0.03), ("vague", 0.07))
+
+
+def topic_particle(topic: str):
+    # 받침이 있으면 '은', 없으면 '는'
+    last = topic[-1] if topic else ""
+    if "가" <= last <= "힣":
+        return "은" if (ord(last) - ord("가")) % 28 else "는"
+    return "은(는)"
+
+
+def load_topics(json_path: str):
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    topics = []
+    for entry in data:
+        match = TITLE_PATTERN.search(entry.get("title", ""))
+        if match:
+            topics.append((int(match.group(1)), re.sub(r"\s+", " ", match.group(2)).strip()))
+    return topics
+
+
+def build_workload(json_path: str = DEFAULT_JSON_PATH, size: int = 200, seed: int = 0):
+    """
+    [{"query": 질문, "kind": topic/article/toc/logo/vague}] 목록을 반환합니다.
+    """
+    rng = random.Random(seed)
+    topics = load_topics(json_path)
+    kinds, weights = zip(*MIX)
+    workload = []
+    for _ in range(size):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "topic":
+            _, topic = rng.choice(topics)
+            query = rng.choice(TOPIC_TEMPLATES).format(topic=topic, eun=topic_particle(topic))
+        elif kind == "article":
+            number, _ = rng.choice(topics)
+            query = rng.choice(ARTICLE_TEMPLATES).format(number=number)
+        else:
+            query = rng.choice(FIXED_QUESTIONS[kind])
+        workload.append({"query": query, "kind": kind})
+    return workload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", default=DEFAULT_JSON_PATH)
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for item in build_workload(args.json, args.size, args.seed):
+        print(json.dumps(item, ensure_ascii=False))
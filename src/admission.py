@@ -0,0 +1,176 @@
+import math
+import time
+import asyncio
+import contextvars
+from collections import deque
+import metrics
+
+metrics.describe("guideline_admission_requests_total", "동시 처리 제한 결과 (result=admitted/queue_full/deadline/timeout)")
+metrics.describe("guideline_admission_queue_depth", "처리 슬롯을 기다리는 요청 수")
+metrics.describe("guideline_admission_in_flight", "처리 중인 요청 수")
+metrics.describe("guideline_admission_wait_seconds", "처리 슬롯을 얻기까지 기다린 시간(초)")
+metrics.describe("guideline_admission_service_seconds", "처리 슬롯을 점유한 시간(초)")
+
+_current_admission = contextvars.ContextVar("guideline_admission", default=None)
+
+
+class Overloaded(Exception):
+    """
+    처리 슬롯을 제한 시간 안에 얻을 수 없어 요청을 거절했습니다. retry_after는 다시 시도해 볼 만한 대기 시간(초)입니다.
+    """
+    def __init__(self, name: str, reason: str, retry_after: float):
+        super().__init__(f"{name} 요청이 많아 처리할 수 없습니다. ({reason})")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    def __init__(self, controller, started: float):
+        self.controller = controller
+        self.started = started
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """
+    느린 모델 서버 앞에 두는 동시 처리 제한입니다.
+     - 동시에 max_concurrency개까지만 처리하고, 나머지는 도착 순서대로 최대 max_queue개까지 기다립니다.
+     - 대기열이 가득 찼거나, 지금까지의 평균 처리 시간으로 추정한 대기 시간이 마감(max_wait 또는
+       요청별 timeout)을 넘으면 기다리지 않고 바로 거절합니다.
+     - 기다리다 마감을 넘겨도 거절합니다. 거절은 Overloaded 예외로 알리며, 백엔드는 503으로 응답합니다.
+    모델 서버가 감당할 수 있는 만큼만 보내서, 몰릴 때도 받아들인 요청의 지연 시간이 무너지지 않게 합니다.
+    """
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_wait: float, initial_service_time: float = 1.0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # 처리 시간의 지수 이동 평균. 대기 시간 추정에 씁니다.
+        self.service_time = initial_service_time
+        self.loop = None
+        self.waiters = deque()
+        self.in_flight = 0
+
+    def _reset(self, loop):
+        # 이벤트 루프가 바뀌면(테스트 클라이언트, 워커 재시작 등) 이전 루프의 대기열을 버립니다.
+        self.loop = loop
+        self.waiters = deque()
+        self.in_flight = 0
+
+    def _update_gauges(self):
+        labels = {"route": self.name}
+        metrics.set_gauge("guideline_admission_queue_depth", len(self.waiters), labels)
+        metrics.set_gauge("guideline_admission_in_flight", self.in_flight, labels)
+
+    def estimated_wait(self, position: int):
+        # 앞에 position명이 기다리고 있을 때, 슬롯을 얻기까지 걸릴 것으로 보이는 시간
+        return math.ceil(position / self.max_concurrency) * self.service_time
+
+    def _reject(self, reason: str, position: int):
+        metrics.inc("guideline_admission_requests_total", {"route": self.name, "result": reason})
+        raise Overloaded(self.name, reason, max(1.0, self.estimated_wait(position)))
+
+    def _admit(self, started: float):
+        now = time.monotonic()
+        metrics.inc("guideline_admission_requests_total", {"route": self.name, "result": "admitted"})
+        metrics.observe("guideline_admission_wait_seconds", now - started, {"route": self.name})
+        self._update_gauges()
+        return AdmissionTicket(self, now)
+
+    async def acquire(self, timeout: float = None):
+        """
+        처리 슬롯을 얻어 AdmissionTicket을 반환합니다. 처리가 끝나면 반드시 ticket.release()를 호출해야 합니다.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self._reset(loop)
+        started = time.monotonic()
+        if self.in_flight < self.max_concurrency and not self.waiters:
+            self.in_flight += 1
+            return self._admit(started)
+
+        position = len(self.waiters) + 1
+        deadline = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        if len(self.waiters) >= self.max_queue:
+            self._reject("queue_full", position)
+        if self.estimated_wait(position) > deadline:
+            self._reject("deadline", position)
+
+        future = loop.create_future()
+        self.waiters.append(future)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # 마감과 동시에 슬롯을 넘겨받았으면, 받은 슬롯을 그대로 돌려줍니다.
+                self.in_flight -= 1
+                self._wake_next()
+            else:
+                future.cancel()
+                self.waiters.remove(future)
+            self._update_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("timeout", len(self.waiters))
+        return self._admit(started)
+
+    def _wake_next(self):
+        # 빈 슬롯을 대기열 앞의 요청부터 넘깁니다. (시간 초과로 취소된 대기는 건너뜁니다)
+        while self.waiters and self.in_flight < self.max_concurrency:
+            future = self.waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _release(self, service_seconds: float):
+        self.in_flight = max(0, self.in_flight - 1)
+        self.service_time = 0.8 * self.service_time + 0.2 * service_seconds
+        metrics.observe("guideline_admission_service_seconds", service_seconds, {"route": self.name})
+        self._wake_next()
+        self._update_gauges()
+
+
+class RequestAdmission:
+    """
+    요청 하나의 처리 슬롯입니다. with 블록 안에서 모델을 처음 호출할 때(admit_model_call) 슬롯을 얻고,
+    블록을 나갈 때 반환합니다. 답변 캐시/로고/목차처럼 모델을 부르지 않는 응답은 슬롯을 쓰지 않습니다.
+    """
+    def __init__(self, controller, timeout: float = None):
+        self.controller = controller
+        self.timeout = timeout
+        self.ticket = None
+        self.token = None
+
+    async def acquire(self):
+        if self.ticket is None:
+            self.ticket = await self.controller.acquire(self.timeout)
+
+    def release(self):
+        if self.ticket is not None:
+            self.ticket.release()
+
+    def __enter__(self):
+        self.token = _current_admission.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        try:
+            _current_admission.reset(self.token)
+        except ValueError:
+            # 스트림 제너레이터가 다른 컨텍스트에서 닫힌 경우 (연결이 끊긴 뒤 정리될 때)
+            pass
+
+
+async def admit_model_call():
+    # 현재 요청에 RequestAdmission이 있으면 처리 슬롯을 얻습니다. (요청당 한 번, 이미 얻었으면 바로 반환)
+    admission = _current_admission.get()
+    if admission is not None:
+        await admission.acquire()
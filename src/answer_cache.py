@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+import metrics
+
+ANSWER_CACHE_SIZE = int(os.getenv("GUIDELINE_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("GUIDELINE_ANSWER_CACHE_TTL", str(24 * 60 * 60)))
+# 코사인 유사도가 이 값 이상이면 같은 질문으로 봅니다. 0이면 의미 기반 단계를 끕니다.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("GUIDELINE_ANSWER_CACHE_THRESHOLD", "0.95"))
+
+NORMALIZE_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+# '제15조'/'제16조', '3일'/'5일'처럼 숫자만 다른 질문은 임베딩이 거의 같아도 답이 다르므로,
+# 의미 기반 단계는 질문에 나온 숫자가 모두 같을 때만 답변을 재사용합니다.
+NUMBER_PATTERN = re.compile(r"\d+")
+
+metrics.describe("guideline_answer_cache_requests_total", "답변 캐시 조회 결과 (tier=exact/semantic, result=hit/miss)")
+
+
+def normalize_question(question: str):
+    # 공백/문장부호/대소문자 차이만 있는 질문은 같은 키가 되도록 정규화합니다.
+    text = unicodedata.normalize("NFKC", question).lower()
+    return NORMALIZE_PATTERN.sub("", text)
+
+
+def question_numbers(question: str):
+    return frozenset(int(number) for number in NUMBER_PATTERN.findall(unicodedata.normalize("NFKC", question)))
+
+
+class _Entry:
+    __slots__ = ("answer", "vector", "numbers", "created_at")
+
+    def __init__(self, answer, vector, numbers, created_at):
+        self.answer = answer
+        self.vector = vector
+        self.numbers = numbers
+        self.created_at = created_at
+
+
+class AnswerCache:
+    """
+    answer_question() 앞단의 답변 캐시입니다.
+     1. 정규화한 질문 텍스트가 같으면 바로 반환하고 (exact),
+     2. 아니면 질문 임베딩과 저장된 질문 임베딩의 코사인 유사도가 threshold 이상이고 질문에 나온 숫자가
+        같은 답변을 반환합니다 (semantic). 임베딩 없이 답하는 경로에서는 semantic=False로 이 단계를 건너뜁니다.
+    LRU + TTL로 오래된 항목을 밀어내며, 코퍼스 해시가 바뀌면 전체를 비웁니다.
+    """
+    def __init__(self, embeddings=None, max_entries: int = ANSWER_CACHE_SIZE,
+                 ttl_seconds: float = ANSWER_CACHE_TTL, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 name: str = "default"):
+        self.embeddings = embeddings if threshold > 0 else None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.name = name
+        self.corpus_hash = None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _record(self, tier: str, hit: bool):
+        metrics.inc("guideline_answer_cache_requests_total",
+                    {"cache": self.name, "tier": tier, "result": "hit" if hit else "miss"})
+
+    def _check_corpus(self, corpus_hash):
+        if corpus_hash != self.corpus_hash:
+            self.entries.clear()
+            self.corpus_hash = corpus_hash
+
+    def _is_fresh(self, entry, now):
+        return now - entry.created_at < self.ttl_seconds
+
+    def get_exact(self, question: str, corpus_hash):
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self.lock:
+            self._check_corpus(corpus_hash)
+            entry = self.entries.get(key)
+            if entry is not None and not self._is_fresh(entry, now):
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        self._record("exact", entry is not None)
+        return entry.answer if entry is not None else None
+
+    def get_semantic(self, vector, corpus_hash, numbers=frozenset()):
+        now = time.monotonic()
+        best_key, best_score = None, self.threshold
+        with self.lock:
+            self._check_corpus(corpus_hash)
+            for key, entry in list(self.entries.items()):
+                if not self._is_fresh(entry, now):
+                    del self.entries[key]
+                    continue
+                if entry.vector is None or entry.numbers != numbers:
+                    continue
+                score = float(np.dot(vector, entry.vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            answer = None
+            if best_key is not None:
+                self.entries.move_to_end(best_key)
+                answer = self.entries[best_key].answer
+        self._record("semantic", answer is not None)
+        return answer
+
+    def _unit_vector(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, question: str, corpus_hash, semantic: bool = True):
+        """
+        (답변 또는 None, 질문 벡터 또는 None)을 반환합니다. 질문 벡터는 put()에 넘겨 재사용합니다.
+        semantic=False이면 exact 단계만 보고 질문을 임베딩하지 않습니다.
+        """
+        answer = self.get_exact(question, corpus_hash)
+        if answer is not None or self.embeddings is None or not semantic:
+            return answer, None
+        vector = self._unit_vector(self.embeddings.embed_query(question))
+        return self.get_semantic(vector, corpus_hash, question_numbers(question)), vector
+
+    async def aget(self, question: str, corpus_hash, semantic: bool = True):
+        answer = self.get_exact(question, corpus_hash)
+        if answer is not None or self.embeddings is None or not semantic:
+            return answer, None
+        vector = self._unit_vector(await self.embeddings.aembed_query(question))
+        return self.get_semantic(vector, corpus_hash, question_numbers(question)), vector
+
+    def put(self, question: str, answer: str, corpus_hash, vector=None):
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        with self.lock:
+            self._check_corpus(corpus_hash)
+            self.entries[key] = _Entry(answer, vector, question_numbers(question), time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
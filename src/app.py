@@ -1,8 +1,8 @@
 import streamlit as st
 import requests
 import uuid
+import json
 import time
-import random
 from bs4 import BeautifulSoup
 import os
 
@@ -14,22 +14,95 @@ if "session_id" not in st.session_state:
 if "history" not in st.session_state:
     st.session_state["history"] = []
 
-api_url = "http://220.82.64.80:6202/chatbot/guideline"
+api_url = "http://220.82.64.80:6202/chatbot/guideline/stream"
+
+LOGO_PREFIX = "회사 로고 파일 경로:"
+
+def render_user_message(container, text):
+    container.markdown(
+        f"""
+        <div class="user-message">{text}</div>
+        """,
+        unsafe_allow_html=True
+    )
+
+def render_bot_message(container, text):
+    container.markdown(
+        f"""
+        <div class="message-box">{text}</div>
+        """,
+        unsafe_allow_html=True
+    )
+
+def render_logo(bot_message):
+    logo_path = bot_message.replace(LOGO_PREFIX, "").strip()
+
+    # 경로가 올바르면 이미지 표시
+    if os.path.exists(logo_path):
+        st.image(logo_path, caption="회사 로고", use_container_width=False, width=500)
+    else:
+        st.warning("로고 파일을 찾을 수 없습니다.")
+
+# 토큰 조각을 이 시간(초) 단위로 모아서 화면에 보냅니다. (토큰마다 다시 그리지 않도록)
+STREAM_FLUSH_SECONDS = 0.05
+
+def read_tokens(response, result):
+    """
+    백엔드가 보내는 NDJSON에서 답변 조각을 꺼내 st.write_stream에 넘깁니다.
+    done/error 이벤트는 result에 기록하고, 로고 경로는 텍스트로 보여주지 않습니다. (완료 후 이미지로 표시)
+    """
+    pending = ""
+    last_flush = time.monotonic()
+    for line in response.iter_lines():
+        if not line:
+            continue
+        event = json.loads(line)
+        if event["type"] == "token":
+            result["output"] += event["content"]
+            if result["output"].startswith(LOGO_PREFIX):
+                continue
+            pending += event["content"]
+            if time.monotonic() - last_flush >= STREAM_FLUSH_SECONDS:
+                yield pending
+                pending = ""
+                last_flush = time.monotonic()
+        elif event["type"] == "done":
+            st.session_state["history"].extend(event["history"])
+            result["response"] = event["response"]
+            break
+        elif event["type"] == "error":
+            result["error"] = True
+            break
+    if pending:
+        yield pending
+
+#스트리밍 응답 수신 함수: 백엔드가 보내는 토큰을 st.write_stream으로 받는 대로 이어 붙입니다.
+def stream_answer(container, query):
+    result = {"output": "", "response": None, "error": False}
+    with requests.post(
+        api_url,
+        json={
+            "session_id": st.session_state["session_id"],
+            "query": query,
+            # 이번 질문/답변만 받아서 기존 기록 뒤에 붙입니다.
+            "history_mode": "delta"
+        },
+        stream=True,
+        timeout=300
+    ) as response:
+        if response.status_code != 200:
+            st.error("오류가 발생했습니다. 다시 시도해주세요.")
+            return None
+        container.write_stream(read_tokens(response, result))
+    if result["error"]:
+        st.error("오류가 발생했습니다. 다시 시도해주세요.")
+        return None
+    output = result["response"] if result["response"] is not None else result["output"]
+    # 스트리밍이 끝나면 말풍선 스타일로 한 번만 다시 그립니다.
+    if not output.startswith(LOGO_PREFIX):
+        render_bot_message(container, output)
+    return output
 
-#입력 지연 함수
-def display_text_with_delay(container, text, delay):
-    output = ""
-    for char in text:
-        output += char
-        container.markdown(
-            f"""
-            <div class="message-box">{output}</div>
-            """,
-            unsafe_allow_html=True
-        )
-        random_delay = random.uniform(delay - 0.01, delay + 0.01)
-        time.sleep(max(0, random_delay))
-        
 # # 스타일 적용 로직
 # with open("./style.css") as css:
 #     st.markdown( f'<style>{css.read()}</style>' , unsafe_allow_html= True)
@@ -216,61 +289,34 @@ st.markdown(
 #                 unsafe_allow_html=True
 #             )
 
-query = st.chat_input(placeholder="질문을 입력하세요.")
-if query:    
-    with st.spinner("답변 생성 중입니다. 잠시만 기다려 주세요..."):
-        # 시스템 프롬프트 미포함
-        response = requests.post(
-            api_url,
-            json={
-                "session_id": st.session_state["session_id"],
-                "query": query
-            }
-        )
-        print(response.text)
-    
-    if response.status_code == 200:
-        result = response.json()
-        st.session_state["history"] = result["history"]
-    else:
-        st.error("오류가 발생했습니다. 다시 시도해주세요.")
-            
 history = st.session_state["history"]
 
 # 유저 - 봇 채팅 박스 서로 구분
-for i, message in enumerate(history):
+for message in history:
     if message.startswith("User:"):
-        messagebox = st.empty()
-        messagebox.markdown(
-            f"""
-            <div class="user-message">{message[5:]}</div>
-            """,
-            unsafe_allow_html=True
-        )
+        render_user_message(st.empty(), message[5:])
     
     elif message.startswith("Chatbot:"):
         bot_message = message[9:]  # "Chatbot: " 부분 제거
 
         # 1️⃣ 로고 요청일 경우 (경로 반환 감지)
-        if "회사 로고 파일 경로:" in bot_message:
-            logo_path = bot_message.replace("회사 로고 파일 경로:", "").strip()
-
-            # 경로가 올바르면 이미지 표시
-            if os.path.exists(logo_path):
-                st.image(logo_path, caption="회사 로고", use_container_width=False, width=500)
-            else:
-                st.warning("로고 파일을 찾을 수 없습니다.")
+        if LOGO_PREFIX in bot_message:
+            render_logo(bot_message)
 
         # 2️⃣ 일반적인 답변일 경우 (텍스트 출력)
         else:
-            if i == len(history) - 1:
-                messagebox = st.empty()
-                display_text_with_delay(messagebox, bot_message, delay=0.02)
-            else:
-                messagebox = st.empty()
-                messagebox.markdown(
-                    f"""
-                    <div class="message-box">{bot_message}</div>
-                    """,
-                    unsafe_allow_html=True
-                )
\ No newline at end of file
+            render_bot_message(st.empty(), bot_message)
+
+query = st.chat_input(placeholder="질문을 입력하세요.")
+if query:
+    render_user_message(st.empty(), query)
+    messagebox = st.empty()
+    try:
+        bot_message = stream_answer(messagebox, query)
+    except requests.RequestException:
+        bot_message = None
+        st.error("오류가 발생했습니다. 다시 시도해주세요.")
+
+    if bot_message and LOGO_PREFIX in bot_message:
+        messagebox.empty()
+        render_logo(bot_message)
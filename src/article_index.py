@@ -0,0 +1,97 @@
+import re
+
+ARTICLE_PATTERN = re.compile(r"제\s*(\d+)\s*조")
+# 본문 중간의 '제N조(...)에 따라' 같은 인용이 조항 제목으로 잘못 잘린 경우를 거르기 위해
+# 제목 전체가 '제N조(...)' 형태인지 확인합니다.
+ARTICLE_TITLE_PATTERN = re.compile(r"제\s*(\d+)\s*조\s*\([^()]*\)")
+CHAPTER_PATTERN = re.compile(r"제\s*(\d+)\s*장")
+
+
+def parse_article_number(title: str):
+    match = ARTICLE_TITLE_PATTERN.fullmatch((title or "").strip())
+    return int(match.group(1)) if match else None
+
+
+def parse_chapter_number(section: str):
+    match = CHAPTER_PATTERN.match((section or "").strip())
+    return int(match.group(1)) if match else None
+
+
+def make_article_ids(sections, titles, suffixes=None):
+    """
+    조항마다 '장/조' 형태의 안정적인 ID를 만듭니다. (예: '제3장/제12조')
+    문서를 다시 파싱해도 같은 조항은 같은 ID를 가지므로, 재적재 시 조항 단위 비교에 씁니다.
+    항/호 단위로 나눈 레코드는 suffixes(예: '①', '①-1')를 붙여 구분합니다.
+    같은 장에 같은 번호가 또 나오면 '#2'처럼 순번을 붙이고, 번호가 없는 레코드는 '본문'으로 둡니다.
+    """
+    ids = []
+    seen = {}
+    suffixes = suffixes or [""] * len(sections)
+    for section, title, suffix in zip(sections, titles, suffixes):
+        article = parse_article_number(title)
+        base = f"{(section or '').strip() or '-'}/" + (f"제{article}조" if article is not None else "본문")
+        if suffix:
+            base += f"/{suffix}"
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f"{base}#{seen[base]}")
+    return ids
+
+
+def base_article_id(article_id: str):
+    """항/호 단위 ID에서 조 단위 부분만 남깁니다. (예: '제3장/제12조/①-1' -> '제3장/제12조')"""
+    section, _, rest = (article_id or "").partition("/")
+    return f"{section}/{rest.split('/', 1)[0].split('#', 1)[0]}"
+
+
+class ArticleIndex:
+    """
+    '제N장'/'제N조' 번호로 조항을 바로 찾는 정확 일치 색인입니다.
+    parse_company_regulations() 결과(section/title/content)를 문서 순서대로 받아서 만들며,
+    같은 번호가 여러 번 나오는 경우(예: 본칙 제1조와 부칙 제1조)는 모두 반환합니다.
+    """
+    def __init__(self, sections, titles):
+        self.by_article = {}
+        self.by_chapter = {}
+        self.chapters = []  # 문서 번호 -> 장 번호
+        for position, (section, title) in enumerate(zip(sections, titles)):
+            chapter = parse_chapter_number(section)
+            self.chapters.append(chapter)
+            if chapter is not None:
+                self.by_chapter.setdefault(chapter, []).append(position)
+            article = parse_article_number(title)
+            if article is not None:
+                self.by_article.setdefault(article, []).append(position)
+
+    @classmethod
+    def from_documents(cls, documents):
+        return cls(
+            [doc.metadata.get("section", "") for doc in documents],
+            [doc.page_content.split("\n", 1)[0] for doc in documents],
+        )
+
+    def lookup(self, query: str, neighbors: int = 0):
+        """
+        질의에 등장하는 조항 번호(없으면 장 번호)에 해당하는 문서 번호 목록을 반환합니다.
+        neighbors > 0이면 같은 장 안의 앞뒤 조항도 문맥으로 함께 붙입니다.
+        번호가 없거나 색인에 없는 번호면 빈 목록입니다.
+        """
+        positions = []
+        for match in ARTICLE_PATTERN.finditer(query):
+            positions.extend(self.by_article.get(int(match.group(1)), []))
+        if not positions:
+            for match in CHAPTER_PATTERN.finditer(query):
+                positions.extend(self.by_chapter.get(int(match.group(1)), []))
+            # 장 단위 조회에는 이미 장 전체가 포함되므로 주변 조항을 붙이지 않습니다.
+            return list(dict.fromkeys(positions))
+
+        if neighbors > 0:
+            # 질의한 조항이 항상 앞에 오도록 주변 조항은 뒤에 붙입니다.
+            expanded = list(positions)
+            for position in positions:
+                start = max(0, position - neighbors)
+                end = min(len(self.chapters), position + neighbors + 1)
+                for other in range(start, end):
+                    if self.chapters[other] == self.chapters[position]:
+                        expanded.append(other)
+            positions = expanded
+        return list(dict.fromkeys(positions))
@@ -1,47 +1,319 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
-from guideline_bot import GuidelineBot
-from guideline_bot_with_ollama import GuidelineOllamaBot
+from contextlib import asynccontextmanager, nullcontext
+from http_clients import aclose_http_clients
+from lazy_component import LazyComponent
+from session_store import create_session_store
+from conversation import ConversationState
+from admission import AdmissionController, RequestAdmission, Overloaded
+from tracing import start_trace, end_trace, current_trace, TRACE_LOG
+import metrics
 from dotenv import load_dotenv
 import os
+import re
+import json
+import math
+import asyncio
 
-app = FastAPI()
 load_dotenv()
+
+metrics.describe("guideline_http_request_seconds", "엔드포인트별 응답 시간(초), 스트리밍은 마지막 줄까지")
+metrics.describe("guideline_cache_hit_ratio", "캐시 적중률 (cache=answer/embedding, 프로세스 시작 이후 누적)")
+
+TRACE_ID_PATTERN = re.compile(r"[A-Za-z0-9_.:-]{1,64}")
+
+class TraceMiddleware:
+    """
+    요청마다 추적 정보(Trace)를 만들고, 응답 헤더 X-Trace-Id로 돌려줍니다. 요청에 X-Trace-Id가 있으면 그 값을 씁니다.
+    응답이 끝나면(스트리밍은 마지막 줄까지) 엔드포인트별 응답 시간 히스토그램에 기록하고,
+    GUIDELINE_TRACE_LOG=1이면 단계별 소요 시간을 한 줄로 출력합니다.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested_id = dict(scope["headers"]).get(b"x-trace-id", b"").decode("latin-1")
+        trace, token = start_trace(requested_id if TRACE_ID_PATTERN.fullmatch(requested_id) else None)
+        status = 500
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # 경로 파라미터/없는 경로로 라벨이 늘어나지 않도록, 매칭된 라우트의 경로 템플릿을 씁니다.
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            metrics.observe("guideline_http_request_seconds", trace.elapsed(),
+                            {"method": scope["method"], "path": path, "status": str(status)})
+            if TRACE_LOG:
+                print(f"{scope['method']} {scope['path']} {status} {trace.summary()}")
+            end_trace(token)
+
 class Query(BaseModel):
     session_id: str
     query: str
+    # full: 보관 중인 대화 기록 전체를 반환, delta: 이번 요청에서 추가된 메시지만 반환
+    history_mode: str = "full"
+    # 이전 대화 요약을 참고해서 후속 질문("그럼 그건요?")에 답할지 여부
+    conversation: bool = True
+    # 응답에 단계별 소요 시간(trace)을 함께 넣을지 여부
+    trace: bool = False
 
-json_path = os.path.join(os.path.dirname(__file__), "../data/remo_guideline.json")
+# 조항 JSON 하나 또는 여러 규정 문서를 나열한 매니페스트 (data/corpus.json 참고)
+corpus_path = os.getenv("GUIDELINE_CORPUS") or os.path.join(os.path.dirname(__file__), "../data/corpus.json")
 openai_api_key = os.getenv("OPENAI_API_KEY")
-chatbot = GuidelineBot(json_path, openai_api_key)
-ollamaChatbot = GuidelineOllamaBot(json_path)
 
-session_history = {}
+# 검색 엔진과 봇은 import 시점이 아니라 처음 쓰일 때(또는 기동 직후 워밍업에서) 만듭니다.
+# LangChain/FAISS import와 인덱스 적재가 무거우므로, 프로세스는 바로 떠서 /healthz에 답하고
+# /readyz는 워밍업 대상이 모두 준비된 뒤에 200을 돌려줍니다.
+def create_engine():
+    from retrieval_engine import get_retrieval_engine
+    return get_retrieval_engine(corpus_path, openai_api_key)
 
-@app.post("/chatbot/guideline")
-def get_response_with_guideline(query: Query):
-    session_id = query.session_id
-    if session_id not in session_history:
-        session_history[session_id] = [] 
-    current_user_input = query.query.strip()
-    session_history[session_id].append(f"User: {current_user_input}") 
-    response = chatbot.answer_question(current_user_input)
-    session_history[session_id].append(f"Chatbot: {response}")
-    return {
+def create_chatbot():
+    from guideline_bot import GuidelineBot
+    # 두 봇이 문서/인덱스를 하나의 검색 엔진으로 공유합니다.
+    return GuidelineBot(corpus_path, openai_api_key, engine=engine.get())
+
+def create_ollama_chatbot():
+    from guideline_bot_with_ollama import GuidelineOllamaBot
+    # 분류 묶음 크기는 Ollama 동시 처리 제한에 맞춥니다.
+    return GuidelineOllamaBot(corpus_path, engine=engine.get(), max_concurrency=ollama_admission.max_concurrency)
+
+engine = LazyComponent("engine", create_engine)
+chatbot = LazyComponent("chatbot", create_chatbot)
+ollamaChatbot = LazyComponent("ollama_chatbot", create_ollama_chatbot)
+COMPONENTS = {"engine": engine, "chatbot": chatbot, "ollama_chatbot": ollamaChatbot}
+
+# 기동 직후 미리 만들어 둘 구성 요소 (쉼표로 구분, none이면 모두 첫 요청 때 만듦).
+# 예: OpenAI 경로만 받는 워커는 GUIDELINE_WARMUP=chatbot
+WARMUP = [name.strip() for name in os.getenv("GUIDELINE_WARMUP", "chatbot,ollama_chatbot").split(",")
+          if name.strip() and name.strip() != "none"]
+for name in WARMUP:
+    if name not in COMPONENTS:
+        raise ValueError(f"알 수 없는 워밍업 대상입니다: {name} (가능한 값: {', '.join(COMPONENTS)}, none)")
+
+# 세션 기록은 메시지 수/유휴 시간/전체 용량이 제한된 저장소에 보관합니다. (GUIDELINE_SESSION_STORE)
+session_store = create_session_store()
+
+# 코퍼스 재적재 요청에 필요한 토큰 (설정하지 않으면 검사하지 않음)
+ADMIN_TOKEN = os.getenv("GUIDELINE_ADMIN_TOKEN")
+# 0보다 크면 이 간격(초)으로 매니페스트/문서 JSON 변경을 확인해서 자동으로 재적재합니다. (워커가 여러 개일 때 유용)
+CORPUS_WATCH_INTERVAL = float(os.getenv("GUIDELINE_CORPUS_WATCH_INTERVAL", "0"))
+
+# 로컬 Ollama 모델 서버로 동시에 보내는 요청 수 제한. 넘치는 요청은 대기열에서 기다리고,
+# 대기열이 차거나 마감(초) 안에 처리할 수 없을 것 같으면 503으로 바로 거절합니다.
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("GUIDELINE_OLLAMA_MAX_CONCURRENCY", "4"))
+OLLAMA_MAX_QUEUE = int(os.getenv("GUIDELINE_OLLAMA_MAX_QUEUE", "32"))
+OLLAMA_MAX_WAIT = float(os.getenv("GUIDELINE_OLLAMA_MAX_WAIT", "30"))
+ollama_admission = AdmissionController("ollama", OLLAMA_MAX_CONCURRENCY, OLLAMA_MAX_QUEUE, OLLAMA_MAX_WAIT)
+
+def corpus_mtimes(retrieval_engine):
+    paths = [corpus_path] + [shard.spec.path for shard in retrieval_engine.snapshot.shards]
+    return [os.stat(path).st_mtime_ns for path in paths]
+
+async def watch_corpus():
+    # 엔진이 만들어진 뒤부터 변경을 확인합니다.
+    retrieval_engine = await engine.aget()
+    last_mtime = corpus_mtimes(retrieval_engine)
+    while True:
+        await asyncio.sleep(CORPUS_WATCH_INTERVAL)
+        try:
+            mtime = corpus_mtimes(retrieval_engine)
+        except OSError:
+            continue
+        if mtime != last_mtime:
+            last_mtime = mtime
+            try:
+                await asyncio.to_thread(retrieval_engine.reload)
+            except Exception as e:
+                print(f"코퍼스 재적재 실패: {e}")
+
+async def warmup():
+    for name in WARMUP:
+        try:
+            await COMPONENTS[name].aget()
+        except Exception as e:
+            # 실패한 구성 요소는 /readyz에 오류로 보이고, 다음 요청에서 다시 만들어 봅니다.
+            print(f"{name} 워밍업 실패: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    tasks = [asyncio.create_task(warmup())]
+    if CORPUS_WATCH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(watch_corpus()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await aclose_http_clients()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TraceMiddleware)
+
+@app.exception_handler(Overloaded)
+async def reject_overloaded(request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+def start_turn(query: Query):
+    return query.query.strip()
+
+async def run_session_store(function, *args):
+    # SQLite 저장소는 다른 워커의 쓰기 잠금을 기다릴 수 있으므로, 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+    if session_store.blocking:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+async def load_conversation(query: Query):
+    if not query.conversation:
+        return None
+    return ConversationState.from_dict(await run_session_store(session_store.get_state, query.session_id))
+
+async def finish_turn(query: Query, current_user_input: str, response: str, conversation=None):
+    return await run_session_store(save_turn, query, current_user_input, response, conversation)
+
+def save_turn(query: Query, current_user_input: str, response: str, conversation=None):
+    if conversation is not None:
+        session_store.set_state(query.session_id, conversation.to_dict())
+    new_messages = [f"User: {current_user_input}", f"Chatbot: {response}"]
+    session_store.append(query.session_id, *new_messages)
+    if query.history_mode == "delta":
+        return new_messages
+    return session_store.get_history(query.session_id)
+
+def trace_payload(query: Query):
+    trace = current_trace()
+    return trace.to_dict() if query.trace and trace is not None else None
+
+async def answer_with(bot, query: Query):
+    current_user_input = start_turn(query)
+    conversation = await load_conversation(query)
+    response = await bot.aanswer_question(current_user_input, conversation)
+    result = {
         "response": response,
-        "history": session_history[session_id]
+        "history": await finish_turn(query, current_user_input, response, conversation)
     }
+    if query.trace:
+        result["trace"] = trace_payload(query)
+    return result
 
-@app.post("/chatbot/guideline/ollama")
-def get_response_with_ollama(query: Query):
-    session_id = query.session_id
-    if session_id not in session_history:
-        session_history[session_id] = [] 
-    current_user_input = query.query.strip()
-    session_history[session_id].append(f"User: {current_user_input}") 
-    response = ollamaChatbot.answer_question(current_user_input)
-    session_history[session_id].append(f"Chatbot: {response}")
+async def stream_with(bot, query: Query, admission=None):
+    """
+    NDJSON 스트림으로 응답합니다. 한 줄에 JSON 객체 하나씩:
+     - {"type": "token", "content": ...}: 생성되는 대로 보내는 답변 조각
+     - {"type": "done", "response": ..., "history": [...]}: 마지막 줄, 전체 답변과 대화 기록(history_mode에 따름)
+       (query.trace이면 "trace"에 단계별 소요 시간도 넣습니다)
+     - {"type": "error", "message": ...}: 생성 도중 오류 (동시 처리 제한으로 거절되면 "reason"과 "retry_after"도 넣음)
+    admission(RequestAdmission)을 넘기면 답변을 만드는 동안 그 슬롯을 쓰고, 답변이 끝나거나 중단되면 반환합니다.
+    """
+    current_user_input = start_turn(query)
+    conversation = await load_conversation(query)
+
+    async def event_stream():
+        chunks = []
+        try:
+            with admission or nullcontext():
+                async for chunk in bot.astream_answer(current_user_input, conversation):
+                    chunks.append(chunk)
+                    yield json.dumps({"type": "token", "content": chunk}, ensure_ascii=False) + "\n"
+        except Overloaded as e:
+            error = {"type": "error", "message": str(e), "reason": e.reason, "retry_after": math.ceil(e.retry_after)}
+            yield json.dumps(error, ensure_ascii=False) + "\n"
+            return
+        except Exception as e:
+            yield json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+            return
+        response = "".join(chunks)
+        history = await finish_turn(query, current_user_input, response, conversation)
+        done = {"type": "done", "response": response, "history": history}
+        if query.trace:
+            done["trace"] = trace_payload(query)
+        yield json.dumps(done, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+# 캐시별 (조회 카운터, 단계 순서). 첫 단계의 조회 수가 전체 조회 수이고, 어느 단계에서든 적중하면 적중입니다.
+CACHE_COUNTERS = {
+    "answer": ("guideline_answer_cache_requests_total", ("exact", "semantic")),
+    "embedding": ("guideline_embedding_cache_requests_total", ("memory", "disk")),
+}
+
+def update_cache_hit_ratios():
+    for cache, (name, tiers) in CACHE_COUNTERS.items():
+        lookups = metrics.registry.total(name, {"tier": tiers[0]})
+        hits = sum(metrics.registry.total(name, {"tier": tier, "result": "hit"}) for tier in tiers)
+        if lookups:
+            metrics.set_gauge("guideline_cache_hit_ratio", hits / lookups, {"cache": cache})
+
+@app.get("/healthz")
+async def healthz():
+    # 프로세스가 살아 있는지만 봅니다. (인덱스 적재 중에도 200)
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # 워밍업 대상이 모두 준비되어야 200. 로드 밸런서는 이 응답이 200일 때만 트래픽을 보냅니다.
+    ready = all(COMPONENTS[name].ready for name in WARMUP)
+    content = {
+        "status": "ready" if ready else "starting",
+        "components": {name: component.status() for name, component in COMPONENTS.items()},
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus 텍스트 포맷
+    update_cache_hit_ratios()
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/reload")
+async def reload_corpus(x_admin_token: str = Header(None)):
+    # 바뀐 조항만 다시 임베딩해서 새 스냅샷을 만든 뒤 교체합니다. 처리 중인 요청은 이전 스냅샷으로 끝납니다.
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="invalid admin token")
+    retrieval_engine = await engine.aget()
+    reloaded = await asyncio.to_thread(retrieval_engine.reload)
+    snapshot = retrieval_engine.snapshot
     return {
-        "response": response,
-        "history": session_history[session_id]
-    }
\ No newline at end of file
+        "reloaded": reloaded,
+        "corpus_hash": snapshot.corpus_hash,
+        "documents": [{"id": shard.doc_id, "title": shard.spec.title, "articles": len(shard.documents)} for shard in snapshot.shards],
+    }
+
+# 핸들러는 async로 동작하며, LLM/임베딩 호출을 기다리는 동안 스레드풀 슬롯을 점유하지 않습니다.
+@app.post("/chatbot/guideline")
+async def get_response_with_guideline(query: Query):
+    return await answer_with(await chatbot.aget(), query)
+
+@app.post("/chatbot/guideline/stream")
+async def stream_response_with_guideline(query: Query):
+    return await stream_with(await chatbot.aget(), query)
+
+# Ollama 경로는 동시 처리 제한을 거칩니다. X-Request-Timeout(초)으로 요청별 마감을 더 짧게 줄 수 있습니다.
+# 슬롯은 봇이 모델(분류/재작성/생성)을 처음 호출할 때 얻으므로, 캐시/로고/목차 응답은 제한을 받지 않습니다.
+@app.post("/chatbot/guideline/ollama")
+async def get_response_with_ollama(query: Query, x_request_timeout: float = Header(None)):
+    bot = await ollamaChatbot.aget()
+    with RequestAdmission(ollama_admission, x_request_timeout):
+        return await answer_with(bot, query)
+
+@app.post("/chatbot/guideline/ollama/stream")
+async def stream_response_with_ollama(query: Query, x_request_timeout: float = Header(None)):
+    # 슬롯은 스트림에서 답변을 다 만들었거나 중단되면 반환합니다.
+    return await stream_with(await ollamaChatbot.aget(), query, RequestAdmission(ollama_admission, x_request_timeout))
\ No newline at end of file
@@ -1,74 +1,192 @@
 import re
+import sys
 import json
-import textract
+import argparse
 
-def parse_company_regulations(text):
-    results = []
+# 챕터 패턴: "제1장", "제2장" 등
+CHAPTER_PATTERN = re.compile(r'(제\d+장)')
+# "제"와 "조("를 기준으로 조의 시작점을 찾아 분리
+ARTICLE_PATTERN = re.compile(r'(제\d+조\()')
+# 항 패턴: "①" ~ "⑳"
+ITEM_PATTERN = re.compile(r'[①-⑳]')
+# 호 패턴: 공백 뒤의 "1. ", "2. " 등 ("1.5배" 같은 소수는 제외)
+CLAUSE_PATTERN = re.compile(r'(?:^|(?<=\s))(\d{1,2})\.\s')
 
-    # 챕터 패턴: "제1장", "제2장" 등
-    chapter_pattern = re.compile(r'(제\d+장)')
-    # 챕터별 위치 찾기
-    chapters = list(chapter_pattern.finditer(text))
-    chapter_positions = [(m.start(), m.group(1)) for m in chapters]
+# article: 조 단위 (기존 출력과 동일), item: 항(①②…) 단위, clause: 호(1. 2. …) 단위
+GRANULARITIES = ("article", "item", "clause")
+
+
+def _rstrip_end(text, start, end):
+    # text[start:end].rstrip()의 끝 위치를 복사 없이 구합니다.
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
+
+
+def _iter_article_records(text, chapter_title, chapter_start, chapter_end):
+    article_starts = [m.start() for m in ARTICLE_PATTERN.finditer(text, chapter_start, chapter_end)]
+    if not article_starts:
+        yield {
+            "section": chapter_title,
+            "title": "",
+            "content": text[chapter_start:chapter_end].strip().replace("\n", "")
+        }
+        return
+
+    # 마지막 조의 끝은 챕터의 끝
+    article_starts.append(chapter_end)
+    for i in range(len(article_starts) - 1):
+        # 조는 항상 "제"로 시작하므로 앞쪽 공백은 없고, 뒤쪽 공백만 잘라냅니다.
+        block_start = article_starts[i]
+        block_end = _rstrip_end(text, block_start, article_starts[i + 1])
+        # 첫 번째 ") + 공백" 을 기준으로 분리
+        split_index = text.find(") ", block_start, block_end)
+        if split_index != -1:
+            # ") "의 ")"까지 포함
+            title = text[block_start:split_index + 1].strip()
+            # ") " 이후의 내용
+            content = text[split_index + 2:block_end].strip()
+        else:
+            title = text[block_start:block_end]
+            content = ""
+
+        # content 항목에서 \n 문자를 제거 (공백으로 대체)
+        content = content.replace("\n", " ")
+
+        yield {
+            "section": chapter_title,
+            "title": title,
+            "content": content
+        }
+
+
+def _split_on(pattern, text):
+    """
+    pattern이 나오는 위치마다 text를 나눠 (머리말, [(표지, 본문), ...])를 반환합니다.
+    """
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return text.strip(), []
+    lead = text[:matches[0].start()].strip()
+    parts = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        parts.append((match.group(0).strip(), text[match.start():end].strip()))
+    return lead, parts
+
+
+def _iter_fine_records(record, granularity):
+    """
+    조 레코드를 항(①②…) 단위로, clause이면 다시 호(1. 2. …) 단위로 나눕니다.
+    호 단위 레코드에는 소속 항의 머리말(예: "① 다음 각 호의 내용을 ...")을 붙여 문맥을 유지합니다.
+    나눌 항이나 호가 없으면 상위 단위 레코드를 그대로 냅니다.
+    """
+    lead, items = _split_on(ITEM_PATTERN, record["content"])
+    if not items:
+        items = [("", record["content"])]
+    elif lead:
+        yield dict(record, item="", content=lead)
+
+    for item, item_text in items:
+        item_record = dict(record, item=item, content=item_text)
+        if granularity != "clause":
+            yield item_record
+            continue
+        item_lead, clauses = _split_on(CLAUSE_PATTERN, item_text)
+        if not clauses:
+            yield item_record
+            continue
+        if item_lead:
+            yield dict(item_record, clause="", content=item_lead)
+        for clause, clause_text in clauses:
+            yield dict(item_record, clause=clause.rstrip("."), content=f"{item_lead} {clause_text}".strip())
 
-    for idx, (start_pos, chapter_title) in enumerate(chapter_positions):
-        chapter_start = start_pos
+
+def iter_company_regulations(text, granularity="article"):
+    """
+    내규 텍스트를 한 번 훑으면서 조항 레코드(section/title/content)를 하나씩 냅니다.
+    장/조 경계는 원문에서의 위치로만 찾고, 레코드를 만들 때만 문자열을 잘라내므로
+    수 MB 크기의 문서도 장/조 단위 복사본을 만들지 않습니다.
+    granularity가 item/clause이면 조를 항/호 단위로 더 잘게 나누고 item/clause 키를 붙입니다.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"지원하지 않는 분할 단위입니다: {granularity} (가능한 값: {', '.join(GRANULARITIES)})")
+
+    # 챕터별 위치 찾기
+    chapter_positions = [(m.start(), m.group(1)) for m in CHAPTER_PATTERN.finditer(text)]
+    for idx, (chapter_start, chapter_title) in enumerate(chapter_positions):
         chapter_end = chapter_positions[idx + 1][0] if idx + 1 < len(chapter_positions) else len(text)
-        chapter_text = text[chapter_start:chapter_end]
-
-        # "제"와 "조("를 기준으로 조의 시작점을 찾아 분리
-        article_pattern = re.compile(r'(제\d+조\()')
-        article_matches = list(article_pattern.finditer(chapter_text))
-
-        if article_matches:
-            # 각 조의 시작 위치를 리스트로 저장
-            article_starts = [m.start() for m in article_matches]
-            # 마지막 조의 끝은 챕터의 끝
-            article_starts.append(len(chapter_text))
-
-            for i in range(len(article_matches)):
-                article_block = chapter_text[article_starts[i]:article_starts[i+1]].strip()
-                # 첫 번째 ") + 공백" 을 기준으로 분리
-                split_index = article_block.find(") ")
-                if split_index != -1:
-                    # ") "의 ")"까지 포함
-                    title = article_block[:split_index+1].strip()  
-                    # ") " 이후의 내용
-                    content = article_block[split_index+2:].strip()   
-                else:
-                    title = article_block
-                    content = ""
-
-                # content 항목에서 \n 문자를 제거 (공백으로 대체)
-                content = content.replace("\n", " ")
-
-                obj = {
-                    "section": chapter_title,
-                    "title": title,
-                    "content": content
-                }
-                results.append(obj)
+        yield from refine_records(_iter_article_records(text, chapter_title, chapter_start, chapter_end), granularity)
+
+
+def refine_records(records, granularity="article"):
+    """
+    조 단위 레코드(예: 저장된 조항 JSON)를 granularity 단위로 다시 나눕니다.
+    원본 문서를 다시 읽지 않고도 분할 단위를 바꿔 볼 수 있습니다. (benchmarks/eval_retrieval.py)
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"지원하지 않는 분할 단위입니다: {granularity} (가능한 값: {', '.join(GRANULARITIES)})")
+    for record in records:
+        if granularity == "article":
+            yield record
         else:
-            obj = {
-                "section": chapter_title,
-                "title": "",
-                "content": chapter_text.strip().replace("\n", "")
-            }
-            results.append(obj)
+            yield from _iter_fine_records(record, granularity)
+
+
+def parse_company_regulations(text, granularity="article"):
+    return list(iter_company_regulations(text, granularity))
+
+
+def write_json(records, f):
+    """
+    json.dumps(list(records), ensure_ascii=False, indent=2)와 같은 내용을 레코드 단위로 써서,
+    전체 결과를 하나의 문자열로 만들지 않습니다.
+    """
+    first = True
+    for record in records:
+        # 레코드는 문자열 값만 가진 평평한 dict이므로 indent=2 형식을 직접 만듭니다. (값 인코딩은 C 구현 사용)
+        fields = ",\n".join(
+            f"    {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+            for key, value in record.items()
+        )
+        f.write(("[\n  {\n" if first else ",\n  {\n") + fields + "\n  }")
+        first = False
+    f.write("[]" if first else "\n]")
+
+
+def write_jsonl(records, f):
+    # 한 줄에 레코드 하나 (JSON Lines)
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def read_document(file_path):
+    # textract는 .doc 변환에만 필요하므로 여기서 불러옵니다.
+    import textract
+    return textract.process(file_path).decode('utf-8')
 
-    return results
 
 if __name__ == "__main__":
-    file_path = "../data/remo_guideline.doc"
+    parser = argparse.ArgumentParser(description="내규 문서를 조항 단위 레코드로 나눕니다.")
+    parser.add_argument("file_path", nargs="?", default="../data/remo_guideline.doc")
+    parser.add_argument("-o", "--output", default="../data/remo_guideline.json", help="'-'이면 표준 출력")
+    parser.add_argument("--format", choices=("json", "jsonl"), default="json")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default="article")
+    args = parser.parse_args()
+
     try:
-        raw_bytes = textract.process(file_path)
-        doc_text = raw_bytes.decode('utf-8')
+        doc_text = read_document(args.file_path)
     except Exception as e:
         print(f"파일 읽기 실패: {e}")
         exit(1)
 
-    parsed_data = parse_company_regulations(doc_text)
-    json_output = json.dumps(parsed_data, ensure_ascii=False, indent=2)
-    
-    with open('../data/remo_guideline.json', 'w', encoding='utf-8') as f:
-        f.write(json_output)
+    records = iter_company_regulations(doc_text, args.granularity)
+    writer = write_jsonl if args.format == "jsonl" else write_json
+    if args.output == "-":
+        writer(records, sys.stdout)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            writer(records, f)
@@ -0,0 +1,139 @@
+import os
+import re
+from langchain.docstore.document import Document
+from conversation import count_tokens
+from lexical_index import tokenize
+from chunk_data import ITEM_PATTERN
+import metrics
+
+# 프롬프트에 넣을 규정 본문의 최대 토큰 수
+CONTEXT_TOKEN_BUDGET = int(os.getenv("GUIDELINE_CONTEXT_TOKENS", "1500"))
+# 항(①②…) 하나가 이보다 길면 문장 단위로 더 나눕니다.
+MAX_PASSAGE_TOKENS = int(os.getenv("GUIDELINE_CONTEXT_PASSAGE_TOKENS", "120"))
+
+SENTENCE_END_PATTERN = re.compile(r"(?<=[다함음임])\.\s+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+GAP_MARKER = " … "
+
+metrics.describe("guideline_context_tokens_total", "프롬프트에 넣은 규정 본문 토큰 수")
+metrics.describe("guideline_context_trimmed_tokens_total", "예산 때문에 잘라낸 규정 본문 토큰 수")
+metrics.describe("guideline_context_documents_total", "프롬프트 규정 문서 처리 결과 (result=kept/trimmed/duplicate)")
+
+
+class AssembledContext:
+    def __init__(self, documents, tokens: int, original_tokens: int):
+        self.documents = documents
+        self.tokens = tokens
+        self.original_tokens = original_tokens
+
+
+def _normalize(text: str):
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def split_passages(content: str):
+    """
+    조항 본문을 항(①②…) 단위로, 긴 항은 다시 문장 단위로 나눕니다.
+    원문의 줄맞춤용 연속 공백은 토큰만 차지하므로 한 칸으로 줄입니다.
+    """
+    starts = [match.start() for match in ITEM_PATTERN.finditer(content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    passages = []
+    for start, end in zip(starts, starts[1:] + [len(content)]):
+        item = _normalize(content[start:end])
+        if not item:
+            continue
+        if count_tokens(item) <= MAX_PASSAGE_TOKENS:
+            passages.append(item)
+        else:
+            passages.extend(sentence for sentence in SENTENCE_END_PATTERN.split(item) if sentence.strip())
+    return passages
+
+
+def deduplicate(documents):
+    """
+    같은 조항(chunk_id/본문)이 여러 번 나오거나, 한 조항이 다른 조항 안에 통째로 들어 있으면
+    (예: 조 전체와 그 조의 항 청크) 앞의 것 하나만 남깁니다. 검색 순위는 유지합니다.
+    """
+    kept = []
+    normalized = []
+    for doc in documents:
+        text = _normalize(doc.page_content)
+        if any(text in other for other in normalized):
+            metrics.inc("guideline_context_documents_total", {"result": "duplicate"})
+            continue
+        # 뒤에 나온 문서가 앞의 문서를 포함하면, 앞의 문서 자리를 더 큰 문서로 바꿉니다.
+        containing = [i for i, other in enumerate(normalized) if other in text]
+        if containing:
+            metrics.inc("guideline_context_documents_total", {"result": "duplicate"}, value=len(containing))
+            first = containing[0]
+            kept[first], normalized[first] = doc, text
+            for i in reversed(containing[1:]):
+                del kept[i], normalized[i]
+            continue
+        kept.append(doc)
+        normalized.append(text)
+    return kept
+
+
+def assemble_context(query: str, documents, budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+    검색된 조항들을 토큰 예산 안에 맞춰 프롬프트용 문서 목록으로 만듭니다.
+     1. 중복/포함 관계인 조항을 합치고,
+     2. 모든 조항의 제목 줄(제N조(...))은 출처 표기를 위해 항상 남기며,
+     3. 각 조항에서 질문과 가장 많이 겹치는 문단을 하나씩 먼저 넣은 뒤,
+     4. 남은 예산은 검색 순위가 높은 조항부터 관련도 순으로 문단을 더 채웁니다.
+    남긴 문단은 원문 순서로 이어 붙이고, 빠진 부분은 '…'로 표시합니다. 문서 순서는 검색 순위 그대로입니다.
+    """
+    documents = deduplicate(documents)
+    query_tokens = set(tokenize(query))
+    entries = []
+    original_tokens = 0
+    used = 0
+    for doc in documents:
+        title, _, content = doc.page_content.partition("\n")
+        passages = split_passages(content)
+        costs = [count_tokens(passage) for passage in passages]
+        scores = [len(query_tokens & set(tokenize(passage))) for passage in passages]
+        # 관련도가 높은 순, 같으면 앞에 나온 문단부터
+        order = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+        title_cost = count_tokens(title) + 1
+        original_tokens += title_cost + sum(costs)
+        used += title_cost
+        entries.append({"doc": doc, "title": title, "passages": passages, "costs": costs, "order": order, "selected": set()})
+
+    def fill(entry, limit):
+        nonlocal used
+        for i in entry["order"]:
+            if len(entry["selected"]) >= limit:
+                break
+            if i not in entry["selected"] and used + entry["costs"][i] <= budget:
+                entry["selected"].add(i)
+                used += entry["costs"][i]
+
+    for entry in entries:
+        fill(entry, 1)
+    for entry in entries:
+        fill(entry, len(entry["passages"]))
+
+    assembled = []
+    for entry in entries:
+        parts = []
+        previous = -1
+        for i in sorted(entry["selected"]):
+            if parts and i != previous + 1:
+                parts.append(GAP_MARKER.strip())
+            parts.append(entry["passages"][i])
+            previous = i
+        if entry["selected"] and previous != len(entry["passages"]) - 1:
+            parts.append(GAP_MARKER.strip())
+        trimmed = len(entry["selected"]) < len(entry["passages"])
+        metrics.inc("guideline_context_documents_total", {"result": "trimmed" if trimmed else "kept"})
+        content = " ".join(parts)
+        assembled.append(Document(page_content=f"{entry['title']}\n{content}" if content else entry["title"],
+                                  metadata=entry["doc"].metadata))
+
+    metrics.inc("guideline_context_tokens_total", value=used)
+    metrics.inc("guideline_context_trimmed_tokens_total", value=max(0, original_tokens - used))
+    return AssembledContext(assembled, used, original_tokens)
@@ -0,0 +1,69 @@
+import os
+import re
+
+# 대화 요약에 쓸 최대 토큰 수와, 요약에 남길 답변 앞부분 길이(글자)
+SUMMARY_TOKEN_BUDGET = int(os.getenv("GUIDELINE_CONVERSATION_SUMMARY_TOKENS", "400"))
+ANSWER_SNIPPET_CHARS = int(os.getenv("GUIDELINE_CONVERSATION_ANSWER_CHARS", "150"))
+
+# 앞선 대화를 가리키는 표현이 있으면 후속 질문으로 봅니다.
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(그럼|그러면|그렇다면|그런데|근데|그래서|그리고|또|아까)"
+    r"|그건|그거|그것|이건|이거|이것|저건|그때|거기|그\s*경우|그런\s*경우|그\s*외|위\s*내용|방금"
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text: str):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # tiktoken이 없으면 한국어 기준 대략 2글자당 1토큰으로 추정합니다.
+    return (len(text) + 1) // 2
+
+
+def is_follow_up(question: str):
+    return FOLLOW_UP_PATTERN.search(question) is not None
+
+
+class ConversationState:
+    """
+    세션별 대화 상태입니다. 세션 저장소에 dict로 저장됩니다.
+     - turns: [질문, 답변 앞부분] 목록. 토큰 예산을 넘으면 오래된 턴부터 버리는 롤링 요약입니다.
+     - last_query: 직전 턴에서 검색에 쓴 쿼리
+     - last_ids: 직전 턴에서 검색된 조항의 chunk_id (같은 주제의 후속 질문이면 검색 없이 재사용)
+    """
+    def __init__(self, turns=None, last_query=None, last_ids=None, token_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.turns = [list(turn) for turn in (turns or [])]
+        self.last_query = last_query
+        self.last_ids = list(last_ids or [])
+        self.token_budget = token_budget
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(data.get("turns"), data.get("last_query"), data.get("last_ids"))
+
+    def to_dict(self):
+        return {"turns": self.turns, "last_query": self.last_query, "last_ids": self.last_ids}
+
+    def is_empty(self):
+        return not self.turns
+
+    def summary(self):
+        return "\n".join(f"사용자: {question}\n답변: {answer}" for question, answer in self.turns)
+
+    def add_turn(self, question: str, answer: str, query: str = None, chunk_ids=None):
+        snippet = WHITESPACE_PATTERN.sub(" ", answer).strip()
+        if len(snippet) > ANSWER_SNIPPET_CHARS:
+            snippet = snippet[:ANSWER_SNIPPET_CHARS] + "…"
+        self.turns.append([question, snippet])
+        # 검색을 하지 않은 턴(로고/목차 등)이면 이전 주제를 지웁니다.
+        self.last_query = query
+        self.last_ids = list(chunk_ids or [])
+        while len(self.turns) > 1 and count_tokens(self.summary()) > self.token_budget:
+            self.turns.pop(0)
@@ -0,0 +1,47 @@
+import os
+import json
+
+
+class DocumentSpec:
+    """
+    코퍼스를 이루는 규정 문서 하나입니다.
+     - doc_id: 문서 ID (인덱스 샤드와 검색 결과 메타데이터에 쓰임)
+     - title: 사람이 읽는 문서 이름 (예: 취업규칙)
+     - path: parse_company_regulations() 결과 JSON 경로
+     - aliases: 질문에 이 이름이 나오면 해당 문서만 검색합니다.
+    """
+    def __init__(self, doc_id: str, title: str, path: str, aliases=None):
+        self.doc_id = doc_id
+        self.title = title
+        self.path = path
+        self.aliases = [alias for alias in [title, *(aliases or [])] if alias]
+
+    def mentioned_in(self, query: str):
+        compact = query.replace(" ", "")
+        return any(alias.replace(" ", "") in compact for alias in self.aliases)
+
+
+def load_manifest(path: str):
+    """
+    코퍼스 경로를 문서 목록으로 읽습니다.
+     - 조항 목록(JSON 배열) 파일이면 문서 하나짜리 코퍼스로 보고,
+     - {"documents": [{"id", "title", "path", "aliases"}, ...]} 형태면 매니페스트로 읽습니다.
+       path는 매니페스트 파일 기준 상대 경로입니다.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        doc_id = os.path.splitext(os.path.basename(path))[0]
+        return [DocumentSpec(doc_id, doc_id, path)]
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    specs = []
+    for entry in data.get("documents", []):
+        doc_path = os.path.join(base_dir, entry["path"])
+        doc_id = entry.get("id") or os.path.splitext(os.path.basename(doc_path))[0]
+        specs.append(DocumentSpec(doc_id, entry.get("title") or doc_id, doc_path, entry.get("aliases")))
+    if len({spec.doc_id for spec in specs}) != len(specs):
+        raise ValueError(f"매니페스트에 중복된 문서 ID가 있습니다: {path}")
+    if not specs:
+        raise ValueError(f"매니페스트에 문서가 없습니다: {path}")
+    return specs
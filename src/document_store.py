@@ -0,0 +1,67 @@
+import os
+import json
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import Docstore
+
+BLOB_FILE = "documents.bin"
+OFFSETS_FILE = "documents.offsets.npy"
+
+
+class DocumentStore(Docstore):
+    """
+    조항 본문과 메타데이터를 파일 하나(UTF-8 바이트열)에 이어 붙여 저장하고, 정수 번호로 읽는 문서 저장소입니다.
+    파일은 mmap으로 열어서 같은 인덱스를 여는 워커들이 페이지 캐시를 공유하며, Document 객체는 조회할 때만 만듭니다.
+    번호는 FAISS 인덱스의 행 번호와 같으므로, FAISS의 docstore로 그대로 쓸 수 있습니다. (읽기 전용)
+    """
+    def __init__(self, directory: str):
+        self.blob = np.memmap(os.path.join(directory, BLOB_FILE), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(directory, BLOB_FILE)) else np.zeros(0, dtype=np.uint8)
+        # [본문0 시작, 메타0 시작, 본문1 시작, 메타1 시작, ..., 끝]
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self._positions = None
+
+    @staticmethod
+    def write(documents, directory: str):
+        offsets = [0]
+        with open(os.path.join(directory, BLOB_FILE), "wb") as f:
+            for doc in documents:
+                for data in (doc.page_content.encode("utf-8"),
+                             json.dumps(doc.metadata, ensure_ascii=False).encode("utf-8")):
+                    f.write(data)
+                    offsets.append(offsets[-1] + len(data))
+        np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+
+    def _slice(self, start, end):
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def __len__(self):
+        return (len(self.offsets) - 1) // 2
+
+    def __getitem__(self, position: int):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        text_start, meta_start, end = self.offsets[2 * position:2 * position + 3]
+        return Document(page_content=self._slice(text_start, meta_start), metadata=json.loads(self._slice(meta_start, end)))
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def find(self, article_id: str):
+        # article_id -> 번호 색인은 처음 필요할 때 한 번만 만듭니다.
+        if self._positions is None:
+            self._positions = {doc.metadata.get("article_id"): position for position, doc in enumerate(self)}
+        position = self._positions.get(article_id)
+        return self[position] if position is not None else None
+
+    def search(self, search: int):
+        try:
+            return self[int(search)]
+        except (IndexError, ValueError):
+            return f"ID {search} not found."
+
+    def delete(self, ids):
+        raise NotImplementedError("DocumentStore는 읽기 전용입니다. 인덱스를 다시 저장해서 갱신합니다.")
@@ -0,0 +1,235 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import metrics
+
+QUERY_CACHE_SIZE = int(os.getenv("GUIDELINE_EMBEDDING_CACHE_SIZE", "10000"))
+# 지정하면 쿼리 임베딩을 SQLite 파일에도 저장해서 재시작/다른 워커와 공유합니다.
+QUERY_CACHE_PATH = os.getenv("GUIDELINE_EMBEDDING_CACHE_PATH")
+# SQLite 캐시에 보관할 최대 쿼리 수. 넘으면 오래전에 저장한 것부터 지웁니다.
+DISK_CACHE_SIZE = int(os.getenv("GUIDELINE_EMBEDDING_DISK_CACHE_SIZE", "100000"))
+# 저장할 때마다 개수를 세지 않고, 이 횟수마다 한 번씩 상한을 넘는 행을 지웁니다.
+DISK_PRUNE_INTERVAL = 100
+# 동시에 들어온 쿼리 임베딩 요청을 모으는 시간(초)과 한 번에 보낼 최대 개수
+BATCH_WINDOW_SECONDS = float(os.getenv("GUIDELINE_EMBEDDING_BATCH_WINDOW", "0.005"))
+MAX_BATCH_SIZE = int(os.getenv("GUIDELINE_EMBEDDING_MAX_BATCH", "64"))
+
+metrics.describe("guideline_embedding_cache_requests_total", "쿼리 임베딩 캐시 조회 결과 (tier=memory/disk, result=hit/miss)")
+metrics.describe("guideline_embedding_batches_total", "임베딩 API로 보낸 배치 요청 수")
+metrics.describe("guideline_embedding_batched_queries_total", "배치 요청에 포함된 쿼리 수")
+
+
+class SQLiteEmbeddingStore:
+    """
+    여러 워커가 공유하는 쿼리 임베딩 파일 캐시입니다. 최대 max_entries개를 보관하며,
+    넘으면 저장한 지 오래된 것부터 지웁니다. (다른 워커의 쓰기를 기다릴 수 있으므로 비동기 경로에서는 스레드로 호출)
+    """
+    def __init__(self, path: str, max_entries: int = DISK_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.pid = None
+        self.puts = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (model, text))"
+        )
+        try:
+            # 저장 시각 열이 없던 이전 파일
+            conn.execute("ALTER TABLE query_embeddings ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created_at ON query_embeddings (created_at)")
+        conn.commit()
+        self.prune()
+
+    def _connection(self):
+        # 미리 적재한 뒤 fork된 워커(serve.py)가 부모의 연결을 그대로 쓰지 않도록 pid마다 새로 엽니다.
+        if self.pid != os.getpid():
+            self.lock = threading.Lock()
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.pid = os.getpid()
+        return self.conn
+
+    def get(self, model: str, text: str):
+        conn = self._connection()
+        with self.lock:
+            row = conn.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND text = ?", (model, text)
+            ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32).tolist() if row else None
+
+    def put(self, model: str, text: str, vector):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        conn = self._connection()
+        with self.lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model, text, vector, created_at) VALUES (?, ?, ?, ?)",
+                (model, text, blob, time.time()),
+            )
+            conn.commit()
+            self.puts += 1
+            if self.puts % DISK_PRUNE_INTERVAL:
+                return
+        self.prune()
+
+    def prune(self):
+        conn = self._connection()
+        with self.lock:
+            conn.execute(
+                "DELETE FROM query_embeddings WHERE rowid IN ("
+                "  SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+
+class EmbeddingBatcher:
+    """
+    짧은 시간(window) 안에 여러 요청에서 들어온 쿼리 임베딩을 모아 aembed_documents 한 번으로 보냅니다.
+    같은 텍스트가 동시에 요청되면 하나의 호출 결과를 함께 기다립니다.
+    """
+    def __init__(self, embeddings: Embeddings, window: float = BATCH_WINDOW_SECONDS, max_batch: int = MAX_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.window = window
+        self.max_batch = max_batch
+        self.loop = None
+        self.pending = OrderedDict()  # text -> future
+        self.timer = None
+
+    def _reset(self, loop):
+        # 이벤트 루프가 바뀌면(테스트 클라이언트, 워커 재시작 등) 이전 루프의 상태를 버립니다.
+        self.loop = loop
+        self.pending = OrderedDict()
+        self.timer = None
+
+    async def embed(self, text: str):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self._reset(loop)
+        future = self.pending.get(text)
+        if future is None:
+            future = loop.create_future()
+            self.pending[text] = future
+            if len(self.pending) >= self.max_batch:
+                self._flush()
+            elif self.timer is None:
+                self.timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, OrderedDict()
+        if batch:
+            self.loop.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        texts = list(batch)
+        metrics.inc("guideline_embedding_batches_total")
+        metrics.inc("guideline_embedding_batched_queries_total", value=len(texts))
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, vector in zip(texts, vectors):
+            future = batch[text]
+            if not future.done():
+                future.set_result(vector)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    쿼리 임베딩 캐시 래퍼입니다. (모델 이름, 텍스트) 키로 메모리 LRU -> (선택) SQLite 순서로 찾고,
+    없을 때만 실제 임베딩을 호출합니다. 비동기 경로는 EmbeddingBatcher로 동시 요청을 묶고,
+    SQLite 조회/저장은 스레드에서 실행해 이벤트 루프를 막지 않습니다.
+    문서 임베딩(인덱스 생성)은 캐시 없이 그대로 위임합니다.
+    """
+    def __init__(self, embeddings: Embeddings, model: str = None, max_entries: int = QUERY_CACHE_SIZE,
+                 cache_path: str = QUERY_CACHE_PATH, batch_window: float = BATCH_WINDOW_SECONDS,
+                 max_batch: int = MAX_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = SQLiteEmbeddingStore(cache_path) if cache_path else None
+        self.batcher = EmbeddingBatcher(embeddings, batch_window, max_batch) if batch_window > 0 else None
+
+    def _get_memory(self, text: str):
+        with self.lock:
+            vector = self.entries.get(text)
+            if vector is not None:
+                self.entries.move_to_end(text)
+        metrics.inc("guideline_embedding_cache_requests_total", {"tier": "memory", "result": "hit" if vector is not None else "miss"})
+        return vector
+
+    def _get_disk(self, text: str):
+        vector = self.store.get(self.model, text)
+        metrics.inc("guideline_embedding_cache_requests_total", {"tier": "disk", "result": "hit" if vector is not None else "miss"})
+        if vector is not None:
+            self._remember(text, vector)
+        return vector
+
+    def _get_cached(self, text: str):
+        vector = self._get_memory(text)
+        if vector is None and self.store is not None:
+            vector = self._get_disk(text)
+        return vector
+
+    async def _aget_cached(self, text: str):
+        vector = self._get_memory(text)
+        if vector is None and self.store is not None:
+            vector = await asyncio.to_thread(self._get_disk, text)
+        return vector
+
+    def _remember(self, text: str, vector):
+        with self.lock:
+            self.entries[text] = vector
+            self.entries.move_to_end(text)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        # 메모리 캐시만 비웁니다. (SQLite 저장소는 그대로)
+        with self.lock:
+            self.entries.clear()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get_cached(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._remember(text, vector)
+            if self.store is not None:
+                self.store.put(self.model, text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await self._aget_cached(text)
+        if vector is None:
+            if self.batcher is not None:
+                vector = await self.batcher.embed(text)
+            else:
+                vector = await self.embeddings.aembed_query(text)
+            self._remember(text, vector)
+            if self.store is not None:
+                await asyncio.to_thread(self.store.put, self.model, text, vector)
+        return vector
@@ -0,0 +1,136 @@
+import os
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from http_clients import get_http_client, get_async_http_client, OPENAI_BASE_URL
+from lexical_index import tokenize
+
+# openai: OpenAI(호환) 임베딩 API, local: 프로세스 안에서 CPU로 계산하는 sentence-transformers 모델,
+# fake: 모델 없이 해시로 계산하는 결정적 임베딩 (벤치마크/오프라인 테스트용)
+EMBEDDING_PROVIDERS = ("openai", "local", "fake")
+DEFAULT_EMBEDDING_PROVIDER = os.getenv("GUIDELINE_EMBEDDING_PROVIDER", "openai")
+OPENAI_EMBEDDING_MODEL = os.getenv("GUIDELINE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+# 한국어를 지원하는 작은 다국어 문장 임베딩 모델 (약 118M 파라미터, 384차원)
+LOCAL_EMBEDDING_MODEL = os.getenv("GUIDELINE_LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# torch: PyTorch 추론 (quantize이면 Linear 층을 int8 동적 양자화), onnx: ONNX Runtime 추론
+LOCAL_EMBEDDING_BACKEND = os.getenv("GUIDELINE_LOCAL_EMBEDDING_BACKEND", "torch")
+LOCAL_EMBEDDING_QUANTIZE = os.getenv("GUIDELINE_LOCAL_EMBEDDING_QUANTIZE", "1") == "1"
+# onnx 백엔드에서 쓸 모델 파일 (양자화된 파일이 있으면 지정, 예: onnx/model_qint8_avx2.onnx)
+LOCAL_EMBEDDING_ONNX_FILE = os.getenv("GUIDELINE_LOCAL_EMBEDDING_ONNX_FILE")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("GUIDELINE_LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+# 인코딩에 쓸 CPU 스레드 수 (0이면 라이브러리 기본값)
+LOCAL_EMBEDDING_THREADS = int(os.getenv("GUIDELINE_LOCAL_EMBEDDING_THREADS", "0"))
+FAKE_EMBEDDING_DIM = int(os.getenv("GUIDELINE_FAKE_EMBEDDING_DIM", "1536"))
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    sentence-transformers 모델로 프로세스 안에서 임베딩을 계산합니다. 네트워크 호출이 없으므로
+    오프라인 환경에서도 인덱스를 만들 수 있고, 쿼리 임베딩은 CPU에서 수 ms 안에 끝납니다.
+     - 문서 임베딩은 batch_size 단위로 묶어서 인코딩하고,
+     - torch 백엔드는 Linear 층을 int8로 동적 양자화하며, threads로 연산 스레드 수를 정합니다.
+     - onnx 백엔드는 ONNX Runtime으로 추론합니다. (양자화된 onnx 파일을 onnx_file로 지정)
+    sentence-transformers가 필요합니다: pip install sentence-transformers (onnx는 sentence-transformers[onnx])
+    """
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, backend: str = LOCAL_EMBEDDING_BACKEND,
+                 quantize: bool = LOCAL_EMBEDDING_QUANTIZE, onnx_file: str = LOCAL_EMBEDDING_ONNX_FILE,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE, threads: int = LOCAL_EMBEDDING_THREADS):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("로컬 임베딩에는 sentence-transformers 패키지가 필요합니다: pip install sentence-transformers") from e
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"지원하지 않는 로컬 임베딩 백엔드입니다: {backend} (가능한 값: torch, onnx)")
+
+        self.batch_size = batch_size
+        if backend == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if onnx_file:
+                model_kwargs["file_name"] = onnx_file
+            self.client = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+            variant = f"onnx:{onnx_file}" if onnx_file else "onnx"
+        else:
+            import torch
+            if threads > 0:
+                torch.set_num_threads(threads)
+            self.client = SentenceTransformer(model_name, device="cpu")
+            if quantize:
+                self.client = torch.quantization.quantize_dynamic(self.client, {torch.nn.Linear}, dtype=torch.qint8)
+            variant = "torch-int8" if quantize else "torch"
+        # 인덱스 키에 쓰이므로, 모델이나 추론 방식이 바뀌면 인덱스를 다시 만듭니다.
+        self.model = f"local:{model_name}:{variant}"
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.client.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # CPU 연산이므로 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+
+@lru_cache(maxsize=65536)
+def _token_bucket(token: str, dim: int):
+    value = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    모델/네트워크 없이 계산하는 결정적 임베딩입니다. lexical_index.tokenize()의 토큰마다 해시로 정한
+    차원에 ±1을 더한 뒤 정규화하므로, 단어가 겹치는 문장끼리 가깝습니다.
+    같은 입력에는 항상 같은 벡터를 돌려주므로 벤치마크 결과를 커밋 간에 비교할 수 있습니다. (검색 품질 평가용은 아님)
+    """
+    def __init__(self, dim: int = FAKE_EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"fake:hashing:{dim}"
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            index, sign = _token_bucket(token, self.dim)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def create_embeddings(provider: str = None, openai_api_key: str = None):
+    """
+    GUIDELINE_EMBEDDING_PROVIDER 값으로 임베딩 구현을 고릅니다. 인덱스 생성과 쿼리 검색이
+    같은 구현을 쓰며, 구현/모델이 바뀌면 저장된 인덱스는 자동으로 다시 만들어집니다.
+    """
+    provider = provider or DEFAULT_EMBEDDING_PROVIDER
+    if provider == "openai":
+        return OpenAIEmbeddings(
+            model=OPENAI_EMBEDDING_MODEL,
+            openai_api_key=openai_api_key or os.getenv("OPENAI_API_KEY"),
+            openai_api_base=OPENAI_BASE_URL,
+            # OpenAI 호환 서버는 tiktoken 토큰 ID 입력을 받지 못하므로 텍스트를 그대로 보냅니다.
+            check_embedding_ctx_length=OPENAI_BASE_URL is None,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
+    if provider == "local":
+        return LocalEmbeddings()
+    if provider == "fake":
+        return HashingEmbeddings()
+    raise ValueError(f"지원하지 않는 임베딩 제공자입니다: {provider} (가능한 값: {', '.join(EMBEDDING_PROVIDERS)})")
@@ -67,48 +67,58 @@
 
 
 import os
-import json
-from langchain.docstore.document import Document
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
+import time
+from langchain_openai import ChatOpenAI
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
+from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
+from retrieval_engine import get_retrieval_engine
+from http_clients import get_http_client, get_async_http_client, OPENAI_BASE_URL
+from query_router import QueryRouter, LOGO_LABEL, TOC_LABEL
+from article_index import ARTICLE_PATTERN, CHAPTER_PATTERN
+from answer_cache import AnswerCache
+from conversation import is_follow_up, count_tokens
+from tracing import span, record_span, annotate
+from context_assembler import assemble_context, CONTEXT_TOKEN_BUDGET
+import metrics
+
+metrics.describe("guideline_conversation_turns_total", "대화 턴 처리 방식 (standalone/new_topic/reused/rewritten)")
+metrics.describe("guideline_llm_tokens_total", "답변 생성 프롬프트/응답 토큰 수 (type=prompt/completion, count_tokens 기준)")
+
+# 재정렬 후 기준을 넘는 조항이 하나도 없을 때, LLM을 호출하지 않고 돌려주는 답변
+NO_MATCH_ANSWER = (
+    "질문과 관련된 회사 내규 조항을 찾지 못했습니다. "
+    "어떤 규정(예: 연차휴가, 출장비, 징계 절차)에 대한 질문인지 조금 더 구체적으로 말씀해 주세요."
+)
 
 class GuidelineBot:
-    def __init__(self, json_path: str, openai_api_key: str):
+    def __init__(self, json_path: str, openai_api_key: str, engine=None, use_router: bool = True):
         self.json_path = json_path
         self.openai_api_key = openai_api_key
-        self.documents = self.load_json_documents()
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
-        self.vectorstore = self.create_vector_store()
-        self.chat_model = ChatOpenAI(
+        # 문서/임베딩/인덱스는 프로세스 전체에서 공유하는 검색 엔진이 가지고 있습니다.
+        self.engine = engine or get_retrieval_engine(json_path, openai_api_key)
+        # 규칙으로 결정할 수 있는 질문은 LLM 분류 호출 없이 바로 처리합니다.
+        self.router = QueryRouter.from_documents(self.engine.documents) if use_router else None
+        self.router_corpus_hash = self.engine.corpus_hash
+        self.chat_model = self.create_chat_model()
+        self.context_budget = CONTEXT_TOKEN_BUDGET
+        # 자주 반복되는 질문은 분류/검색/생성 없이 캐시된 답변을 돌려줍니다. (봇마다 모델이 다르므로 캐시도 따로)
+        self.answer_cache = AnswerCache(self.engine.embeddings, name=type(self).__name__)
+        self.logo_path = os.path.join(os.path.dirname(__file__), "../data/logo.jpg")
+
+    def create_chat_model(self):
+        return ChatOpenAI(
             openai_api_key=self.openai_api_key, 
+            openai_api_base=OPENAI_BASE_URL,
             temperature=0.1, 
-            model="chatgpt-4o-latest"
+            model="chatgpt-4o-latest",
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
         )
-        self.logo_path = os.path.join(os.path.dirname(__file__), "../data/logo.jpg")
-    
-    def load_json_documents(self):
-        with open(self.json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        documents = []
-        for entry in data:
-            text = f"{entry.get('title', '')}\n{entry.get('content', '')}"
-            metadata = {"section": entry.get("section", "")}
-            doc = Document(page_content=text, metadata=metadata)
-            documents.append(doc)
-        return documents
-
-    def create_vector_store(self):
-        vectorstore = FAISS.from_documents(self.documents, self.embeddings)
-        return vectorstore
-
-    def create_qa_chain(self, query: str):
-        # retriever를 통해 사용자의 쿼리와 관련된 문서를 검색합니다.
-        retriever = self.vectorstore.as_retriever()
-        retrieved_docs = retriever.get_relevant_documents(query)
+
+    def build_qa_prompt(self, query: str, with_history: bool = False):
         system_prompt = (
             "당신은 회사 'REMO'의 임직원들에게 회사 내규에 대해 답변해 주는 비서 역할입니다. "
             "회사 내규에 관련된 질문이 아니라면, 일반적인 답변을 해 주면서 회사 내규와 관련된 질문을 해 달라고 유도하세요. "
@@ -119,40 +129,79 @@ class GuidelineBot:
             "규정 양식은 답변의 마지막에 '출처: 제oo조(규정 종류)' 와 같은 형식으로 제공해 주세요."
             "규정을 참고해서, 임직원들에게 도움이 될 수 있는 답변을 해 주세요!"
         )
-        prompt = ChatPromptTemplate.from_messages([
+        if with_history:
+            system_prompt += (
+                "\n\n이전 대화 요약:\n{history}\n\n"
+                "사용자의 질문이 이전 대화를 이어서 묻는 것이라면, 이전 대화 요약을 참고해서 답변해 주세요."
+            )
+        # 질문은 템플릿 변수가 아니라 그대로 전달되도록 중괄호를 이스케이프합니다.
+        escaped_query = query.replace("{", "{{").replace("}", "}}")
+        return ChatPromptTemplate.from_messages([
             ("system", system_prompt),
-            ("human", query)
+            ("human", escaped_query)
         ])
-        chain = create_stuff_documents_chain(self.chat_model, prompt)
-        answer = chain.invoke({"context": retrieved_docs})
+
+    def build_qa_inputs(self, query: str, docs, history: str = None):
+        # 검색된 조항을 그대로 넣지 않고, 중복을 합치고 질문과 관련된 문단만 토큰 예산 안에서 남깁니다.
+        with span("prompt_assembly"):
+            context = assemble_context(query, docs, self.context_budget)
+            inputs = {"context": context.documents}
+            if history:
+                inputs["history"] = history
+            prompt_tokens = context.tokens + count_tokens(query) + (count_tokens(history) if history else 0)
+        annotate(context_docs=len(context.documents), context_tokens=context.tokens, prompt_tokens=prompt_tokens)
+        metrics.inc("guideline_llm_tokens_total", {"bot": type(self).__name__, "type": "prompt"}, value=prompt_tokens)
+        return inputs
+
+    def record_completion(self, answer: str):
+        completion_tokens = count_tokens(answer)
+        annotate(completion_tokens=completion_tokens)
+        metrics.inc("guideline_llm_tokens_total", {"bot": type(self).__name__, "type": "completion"}, value=completion_tokens)
+
+    def create_qa_chain(self, query: str, docs=None, history: str = None):
+        # 공유 검색 엔진을 통해 사용자의 쿼리와 관련된 문서를 검색합니다. (docs가 주어지면 재사용)
+        retrieved_docs = docs if docs is not None else self.engine.retrieve(query)
+        if not retrieved_docs:
+            return NO_MATCH_ANSWER
+        chain = create_stuff_documents_chain(self.chat_model, self.build_qa_prompt(query, bool(history)))
+        inputs = self.build_qa_inputs(query, retrieved_docs, history)
+        with span("generation"):
+            answer = chain.invoke(inputs)
+        self.record_completion(answer)
+        return answer
+
+    async def acreate_qa_chain(self, query: str, docs=None, history: str = None):
+        retrieved_docs = docs if docs is not None else await self.engine.aretrieve(query)
+        if not retrieved_docs:
+            return NO_MATCH_ANSWER
+        chain = create_stuff_documents_chain(self.chat_model, self.build_qa_prompt(query, bool(history)))
+        inputs = self.build_qa_inputs(query, retrieved_docs, history)
+        with span("generation"):
+            answer = await chain.ainvoke(inputs)
+        self.record_completion(answer)
         return answer
 
     def get_company_logo(self):
+        with span("logo"):
+            return self._company_logo()
+
+    def _company_logo(self):
         if os.path.exists(self.logo_path):
             return f"회사 로고 파일 경로:{self.logo_path}"
         else:
             return "회사 로고 파일을 찾을 수 없습니다."
 
     def load_toc(self):
-        toc_path = os.path.join(os.path.dirname(self.json_path), "../data/remo_toc.json")
-        try:
-            with open(toc_path, "r", encoding="utf-8") as f:
-                toc_data = json.load(f)
-            toc_text = json.dumps(toc_data, ensure_ascii=False, indent=2)
-            prompt_template = ChatPromptTemplate.from_template(
-                "아래의 JSON 형식 목차 데이터를 보기 좋은 텍스트 형태로 정리해 주세요.\n\n"
-                "JSON 데이터:\n{toc}\n\n"
-                "사용자가 쉽게 이해할 수 있도록 깔끔한 형식으로 정리해 주세요."
-                "문서 맨 앞의 '목차' 텍스트는 제거하고 '제 1장' 부터 출력하고, 문서의 끝까지 마크다운 양식을 적용해 주세요."
-            )
-            # LLM 체인 실행
-            formatted_toc = self.chat_model.invoke(prompt_template.format(toc=toc_text))
-            return formatted_toc.content.strip()
-        except Exception as e:
-            return f"목차 정보를 불러오는 중 오류가 발생했습니다: {e}"
+        # 목차는 검색 엔진이 코퍼스에서 미리 만들어 둔 것을 그대로 반환합니다. (LLM 호출 없음)
+        with span("toc"):
+            if not self.engine.toc:
+                return "목차 정보를 찾을 수 없습니다."
+            return self.engine.toc
 
+    async def aload_toc(self):
+        return self.load_toc()
 
-    def classify_question(self, question: str):
+    def create_classification_chain(self):
         classification_prompt = ChatPromptTemplate.from_template(
             "다음 질문에 대해, 만약 질문이 회사 로고 요청(예: '회사의 로고를 제공해 줘')에 해당하면 'logo_request', "
             "만약 질문이 회사 내규의 목차를 보여달라는 요청(예: '회사 내규의 목차를 보여줘')에 해당하면 'toc_request'를 출력하고, "
@@ -160,30 +209,232 @@ class GuidelineBot:
             "질문: {question}\n"
             "답변:"
         )
+        return classification_prompt | self.chat_model | RunnablePassthrough()
+
+    def classify_question(self, question: str):
+        result = self.create_classification_chain().invoke({"question": question})
+        return result.content.strip().lower()
 
-        classification_chain = classification_prompt | self.chat_model | RunnablePassthrough()
-        
-        result = classification_chain.invoke({"question": question})
+    async def aclassify_question(self, question: str):
+        result = await self.create_classification_chain().ainvoke({"question": question})
         return result.content.strip().lower()
 
+    def route_question(self, question: str):
+        if self.router is None:
+            return None
+        if self.router_corpus_hash != self.engine.corpus_hash:
+            # 코퍼스가 다시 적재되었으면 조항 제목 키워드도 새로 만듭니다.
+            self.router_corpus_hash = self.engine.corpus_hash
+            self.router = QueryRouter.from_documents(self.engine.documents)
+        with span("route"):
+            return self.router.classify(question)
+
+    def label_question(self, question: str):
+        return self.label_routed(question, self.route_question(question))
+
+    def label_routed(self, question: str, label: str):
+        # 규칙 라우터의 결과(label)를 쓰고, 확신할 수 없었을 때(None)만 LLM 분류 체인을 호출합니다.
+        classifier = "rule"
+        if not label:
+            with span("classify"):
+                label = self.classify_question(question)
+            classifier = "llm"
+        annotate(label=label, classifier=classifier)
+        return label
 
+    async def alabel_question(self, question: str):
+        return await self.alabel_routed(question, self.route_question(question))
+
+    async def alabel_routed(self, question: str, label: str):
+        classifier = "rule"
+        if not label:
+            with span("classify"):
+                label = await self.aclassify_question(question)
+            classifier = "llm"
+        annotate(label=label, classifier=classifier)
+        return label
+
+    def use_semantic_cache(self, question: str, routed: str):
+        """
+        답변 캐시의 의미 기반 단계(질문 임베딩)를 쓸지 정합니다. 로고/목차 요청, '제N조'/'제N장' 조회,
+        lexical 검색 모드는 임베딩 없이 답하는 경로이므로 캐시 조회 때문에 임베딩을 호출하지 않습니다.
+        """
+        if routed in (LOGO_LABEL, TOC_LABEL) or self.engine.mode == "lexical":
+            return False
+        return not (ARTICLE_PATTERN.search(question) or CHAPTER_PATTERN.search(question))
 
     def answer_question(self, question: str):
         """
-        질문을 LLM 체인을 통해 분류한 후,
+        질문을 라우터(규칙 기반, 확신할 수 없으면 LLM 체인)를 통해 분류한 후,
          - 'logo_request'이면 get_company_logo()를 반환하고,
          - 'toc_request'이면 load_toc()를 반환하며,
          - 그 외에는 분류 체인이 추출한 핵심 키워드를 검색 쿼리로 사용해 create_qa_chain()을 실행합니다.
+        같은(또는 의미상 매우 비슷한) 질문의 일반 답변은 답변 캐시에서 바로 반환합니다.
         """
-        label = self.classify_question(question)
-        print(label)
+        corpus_hash = self.engine.corpus_hash
+        routed = self.route_question(question)
+        with span("answer_cache"):
+            cached, vector = self.answer_cache.get(question, corpus_hash, self.use_semantic_cache(question, routed))
+        if cached is not None:
+            annotate(path="cache")
+            return cached
+        label = self.label_routed(question, routed)
         if label == "logo_request":
             return self.get_company_logo()
         elif label == "toc_request":
             return self.load_toc()
         else:
             # label(예: "연차"나 "근로수당")를 검색 쿼리로 사용합니다.
-            return self.create_qa_chain(query=label)
+            answer = self.create_qa_chain(query=label)
+            if answer != NO_MATCH_ANSWER:
+                self.answer_cache.put(question, answer, corpus_hash, vector)
+            return answer
+
+    def create_rewrite_chain(self):
+        rewrite_prompt = ChatPromptTemplate.from_template(
+            "다음은 회사 내규에 대한 이전 대화 요약입니다.\n{history}\n\n"
+            "마지막 질문이 이전 대화를 가리키고 있다면, 대화 맥락 없이도 이해할 수 있는 하나의 독립적인 질문으로 다시 써 주세요. "
+            "다시 쓴 질문만 출력하세요.\n"
+            "질문: {question}\n"
+            "독립적인 질문:"
+        )
+        return rewrite_prompt | self.chat_model | StrOutputParser()
+
+    async def arewrite_question(self, question: str, history: str):
+        with span("rewrite"):
+            result = await self.create_rewrite_chain().ainvoke({"question": question, "history": history})
+        return result.strip() or question
+
+    def is_contextual(self, question: str, conversation):
+        # 이전 대화가 있고, 질문이 앞선 대화를 가리키는 후속 질문인지
+        return conversation is not None and not conversation.is_empty() and is_follow_up(question)
+
+    async def aplan_turn(self, question: str, conversation, contextual: bool, routed: str = None):
+        """
+        질문을 처리할 방법을 정합니다. (검색/분류 레이블, 재사용할 문서, 생성 프롬프트에 넣을 질문)
+         - 후속 질문이 아니면: 기존과 같이 라우터/LLM 분류 레이블로 검색하고 레이블을 프롬프트에 넣습니다.
+         - 후속 질문인데 새 키워드가 있으면: 그 키워드로 검색하고, 원래 질문과 대화 요약으로 답변합니다.
+         - 후속 질문이고 같은 주제면: 직전 턴의 조항을 검색 없이 재사용합니다.
+         - 그 외에는: 대화 요약으로 질문을 독립적인 질문으로 다시 쓴 뒤 일반 경로로 처리합니다.
+        후속 질문이 아니면 호출한 쪽에서 답변 캐시를 보기 전에 라우팅한 결과(routed)를 받습니다.
+        """
+        if not contextual:
+            metrics.inc("guideline_conversation_turns_total", {"resolution": "standalone"})
+            label = await self.alabel_routed(question, routed)
+            return label, None, label
+        routed = self.route_question(question)
+        if routed:
+            metrics.inc("guideline_conversation_turns_total", {"resolution": "new_topic"})
+            return routed, None, question
+        if conversation.last_ids:
+            docs = self.engine.get_documents_by_ids(conversation.last_ids)
+            if docs:
+                metrics.inc("guideline_conversation_turns_total", {"resolution": "reused"})
+                return conversation.last_query, docs, question
+        metrics.inc("guideline_conversation_turns_total", {"resolution": "rewritten"})
+        standalone = await self.arewrite_question(question, conversation.summary())
+        label = await self.alabel_question(standalone)
+        return label, None, standalone
+
+    def record_turn(self, conversation, question: str, answer: str, query: str = None, docs=None):
+        if conversation is not None:
+            chunk_ids = [doc.metadata.get("chunk_id") for doc in (docs or []) if doc.metadata.get("chunk_id")]
+            conversation.add_turn(question, answer, query if docs else None, chunk_ids)
+
+    async def aanswer_question(self, question: str, conversation=None):
+        """
+        answer_question()의 비동기 버전입니다. 분류, 검색, 생성 모두 ainvoke로 실행되어
+        대기 중에 이벤트 루프를 점유하지 않습니다.
+        conversation(ConversationState)을 넘기면 이전 대화 요약을 참고하고, 이번 턴을 기록합니다.
+        """
+        contextual = self.is_contextual(question, conversation)
+        # 답변 도중 코퍼스가 다시 적재되어도 이전 코퍼스로 만든 답변은 이전 해시로 저장합니다.
+        corpus_hash = self.engine.corpus_hash
+        # 대화 요약은 후속 질문에만 넣습니다. 독립적인 질문의 답은 질문만으로 정해져야 다른 세션과 답변 캐시를 함께 쓸 수 있습니다.
+        history = conversation.summary() if contextual else None
+        vector = routed = None
+        # 후속 질문의 답은 대화 맥락에 따라 달라지므로 답변 캐시를 쓰지 않습니다.
+        if not contextual:
+            routed = self.route_question(question)
+            with span("answer_cache"):
+                cached, vector = await self.answer_cache.aget(question, corpus_hash, self.use_semantic_cache(question, routed))
+            if cached is not None:
+                annotate(path="cache")
+                self.record_turn(conversation, question, cached)
+                return cached
+        label, docs, prompt_query = await self.aplan_turn(question, conversation, contextual, routed)
+        if label == "logo_request":
+            answer = self.get_company_logo()
+        elif label == "toc_request":
+            answer = await self.aload_toc()
+        else:
+            if docs is None:
+                docs = await self.engine.aretrieve(label)
+            answer = await self.acreate_qa_chain(prompt_query, docs=docs, history=history)
+            # 되묻는 답변은 캐시하지 않습니다. (조항이 추가되면 답할 수 있는 질문일 수 있음)
+            if not contextual and docs:
+                self.answer_cache.put(question, answer, corpus_hash, vector)
+        self.record_turn(conversation, question, answer, label, docs)
+        return answer
+
+    async def astream_qa_chain(self, query: str, docs=None, history: str = None):
+        retrieved_docs = docs if docs is not None else await self.engine.aretrieve(query)
+        if not retrieved_docs:
+            yield NO_MATCH_ANSWER
+            return
+        chain = create_stuff_documents_chain(self.chat_model, self.build_qa_prompt(query, bool(history)))
+        inputs = self.build_qa_inputs(query, retrieved_docs, history)
+        started = time.perf_counter()
+        chunks = []
+        with span("generation"):
+            async for chunk in chain.astream(inputs):
+                if chunk:
+                    if not chunks:
+                        # 첫 토큰까지의 시간 (스트리밍 응답의 체감 지연)
+                        record_span("first_token", started)
+                    chunks.append(chunk)
+                    yield chunk
+        self.record_completion("".join(chunks))
+
+    async def astream_answer(self, question: str, conversation=None):
+        """
+        aanswer_question()과 같은 분기를 따르되, 일반 답변은 채팅 모델의 astream 토큰을
+        생성되는 대로 흘려보냅니다. 로고/목차 응답과 캐시된 답변은 한 덩어리로 보냅니다.
+        """
+        contextual = self.is_contextual(question, conversation)
+        # 답변 도중 코퍼스가 다시 적재되어도 이전 코퍼스로 만든 답변은 이전 해시로 저장합니다.
+        corpus_hash = self.engine.corpus_hash
+        # 대화 요약은 후속 질문에만 넣습니다. 독립적인 질문의 답은 질문만으로 정해져야 다른 세션과 답변 캐시를 함께 쓸 수 있습니다.
+        history = conversation.summary() if contextual else None
+        vector = routed = None
+        if not contextual:
+            routed = self.route_question(question)
+            with span("answer_cache"):
+                cached, vector = await self.answer_cache.aget(question, corpus_hash, self.use_semantic_cache(question, routed))
+            if cached is not None:
+                annotate(path="cache")
+                self.record_turn(conversation, question, cached)
+                yield cached
+                return
+        label, docs, prompt_query = await self.aplan_turn(question, conversation, contextual, routed)
+        if label == "logo_request":
+            answer = self.get_company_logo()
+            yield answer
+        elif label == "toc_request":
+            answer = await self.aload_toc()
+            yield answer
+        else:
+            if docs is None:
+                docs = await self.engine.aretrieve(label)
+            chunks = []
+            async for chunk in self.astream_qa_chain(prompt_query, docs=docs, history=history):
+                chunks.append(chunk)
+                yield chunk
+            answer = "".join(chunks)
+            # 되묻는 답변은 캐시하지 않습니다. (조항이 추가되면 답할 수 있는 질문일 수 있음)
+            if not contextual and docs:
+                self.answer_cache.put(question, answer, corpus_hash, vector)
+        self.record_turn(conversation, question, answer, label, docs)
 
 if __name__ == "__main__":
     load_dotenv()
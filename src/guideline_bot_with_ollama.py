@@ -1,126 +1,175 @@
 import os
-import json
-from langchain.docstore.document import Document
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
-from langchain.chains.combine_documents import create_stuff_documents_chain
+import re
+import asyncio
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
+from guideline_bot import GuidelineBot
+from http_clients import get_http_client, get_async_http_client, OLLAMA_BASE_URL, OLLAMA_MODEL
+from admission import admit_model_call
+import metrics
 
-class GuidelineOllamaBot:
-    def __init__(self, json_path: str, openai_api_key: str):
-        self.json_path = json_path
-        self.openai_api_key = openai_api_key
-        self.documents = self.load_json_documents()
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
-        self.vectorstore = self.create_vector_store()
-        # ChatOpenAI 인스턴스를 Ollama API를 사용하도록 수정:
-        self.chat_model = ChatOpenAI(
-            openai_api_key="dummy",                   # Ollama는 API 키가 필요 없으므로 더미 값 사용
-            openai_api_base="http://localhost:6203/v1/",  # Ollama API 엔드포인트 (환경에 따라 변경)
-            temperature=0.1,
-            model="deepseek-r1:671b"                    # 지정한 모델 이름
-        )
-        self.logo_path = os.path.join(os.path.dirname(__file__), "../data/logo.jpg")
-    
-    def load_json_documents(self):
-        with open(self.json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        documents = []
-        for entry in data:
-            text = f"{entry.get('title', '')}\n{entry.get('content', '')}"
-            metadata = {"section": entry.get("section", "")}
-            doc = Document(page_content=text, metadata=metadata)
-            documents.append(doc)
-        return documents
-
-    def create_vector_store(self):
-        vectorstore = FAISS.from_documents(self.documents, self.embeddings)
-        return vectorstore
-
-    def create_qa_chain(self, query: str):
-        # retriever를 통해 사용자의 쿼리와 관련된 문서를 검색합니다.
-        retriever = self.vectorstore.as_retriever()
-        retrieved_docs = retriever.get_relevant_documents(query)
-        system_prompt = (
-            "당신은 회사 'REMO'의 임직원들에게 회사 내규에 대해 답변해 주는 비서 역할입니다. "
-            "회사 내규에 관련된 질문이 아니라면, 일반적인 답변을 해 주면서 회사 내규와 관련된 질문을 해 달라고 유도하세요. "
-            "회사 내규에 관련된 질문이라면, 사용자의 질문 뒤에 관련 내규 문서가 첨부됩니다. 해당 내규 문서들의 내용 중, 질문과 관련있는 내용들을 참고해서 답변해 주세요. "
-            "관련 회사 내규 규정은 다음과 같습니다.\n규정:{context}\n\n"
-            "규정이 사용자의 질문과 관련이 없다면, 더 자세한 질문을 유도하세요."
-            "답변에 어떤 규정을 참고했는지 출처를 첨부해야 합니다. "
-            "규정 양식은 답변의 마지막에 '출처: 제oo조(규정 종류)' 와 같은 형식으로 제공해 주세요."
-            "규정을 참고해서, 임직원들에게 도움이 될 수 있는 답변을 해 주세요!"
-        )
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", query)
-        ])
-        chain = create_stuff_documents_chain(self.chat_model, prompt)
-        answer = chain.invoke({"context": retrieved_docs})
-        return answer
-
-    def get_company_logo(self):
-        if os.path.exists(self.logo_path):
-            return f"회사 로고 파일 경로:{self.logo_path}"
-        else:
-            return "회사 로고 파일을 찾을 수 없습니다."
-
-    def load_toc(self):
-        toc_path = os.path.join(os.path.dirname(self.json_path), "../data/remo_toc.json")
-        try:
-            with open(toc_path, "r", encoding="utf-8") as f:
-                toc_data = json.load(f)
-            toc_text = json.dumps(toc_data, ensure_ascii=False, indent=2)
-            prompt_template = ChatPromptTemplate.from_template(
-                "아래의 JSON 형식 목차 데이터를 보기 좋은 텍스트 형태로 정리해 주세요.\n\n"
-                "JSON 데이터:\n{toc}\n\n"
-                "사용자가 쉽게 이해할 수 있도록 깔끔한 형식으로 정리해 주세요."
-            )
-            # LLM 체인 실행
-            formatted_toc = self.chat_model.invoke(prompt_template.format(toc=toc_text))
-            return formatted_toc.content.strip()
-        except Exception as e:
-            return f"목차 정보를 불러오는 중 오류가 발생했습니다: {e}"
+# 0보다 크면 이 시간(초) 안에 들어온 분류 요청들을 프롬프트 하나로 묶어 모델을 한 번만 호출합니다.
+CLASSIFY_BATCH_WINDOW = float(os.getenv("GUIDELINE_OLLAMA_CLASSIFY_BATCH_WINDOW", "0"))
+CLASSIFY_MAX_BATCH = int(os.getenv("GUIDELINE_OLLAMA_CLASSIFY_MAX_BATCH", "8"))
 
-    def classify_question(self, question: str):
-        classification_prompt = ChatPromptTemplate.from_template(
-            "다음 질문에 대해, 만약 질문이 회사 로고 요청(예: '회사의 로고를 제공해 줘')에 해당하면 'logo_request', "
+THINK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+NUMBERED_LINE_PATTERN = re.compile(r"^\s*(\d+)\s*[.):]\s*(.+?)\s*$", re.MULTILINE)
+
+metrics.describe("guideline_classify_batches_total", "Ollama로 보낸 묶음 분류 요청 수")
+metrics.describe("guideline_classify_batched_questions_total", "묶음 분류 요청에 포함된 질문 수")
+metrics.describe("guideline_classify_batch_fallbacks_total", "묶음 분류 응답에서 답을 찾지 못해 따로 분류한 질문 수")
+
+
+def strip_think(text: str):
+    # deepseek-r1 등 추론 모델은 <think>…</think> 블록을 먼저 출력하므로 떼어 내고 답만 씁니다.
+    return THINK_PATTERN.sub("", text).strip()
+
+
+class ClassificationBatcher:
+    """
+    EmbeddingBatcher와 같은 방식으로, 짧은 시간(window) 안에 여러 요청에서 들어온 분류 질문을 모아
+    '번호. 질문' 목록 프롬프트 하나로 보내고 '번호. 답' 줄을 나눠서 돌려줍니다.
+    응답에서 번호를 찾지 못한 질문은 기존 단건 분류 체인으로 다시 분류합니다.
+    """
+    def __init__(self, bot, window: float = CLASSIFY_BATCH_WINDOW, max_batch: int = CLASSIFY_MAX_BATCH):
+        self.bot = bot
+        self.window = window
+        self.max_batch = max_batch
+        self.loop = None
+        self.pending = {}  # question -> future
+        self.timer = None
+
+    def _reset(self, loop):
+        self.loop = loop
+        self.pending = {}
+        self.timer = None
+
+    async def classify(self, question: str):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self._reset(loop)
+        future = self.pending.get(question)
+        if future is None:
+            future = loop.create_future()
+            self.pending[question] = future
+            if len(self.pending) >= self.max_batch:
+                self._flush()
+            elif self.timer is None:
+                self.timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            self.loop.create_task(self._run(batch))
+
+    def create_batch_chain(self):
+        prompt = ChatPromptTemplate.from_template(
+            "다음 질문들 각각에 대해, 만약 질문이 회사 로고 요청(예: '회사의 로고를 제공해 줘')에 해당하면 'logo_request', "
             "만약 질문이 회사 내규의 목차를 보여달라는 요청(예: '회사 내규의 목차를 보여줘')에 해당하면 'toc_request'를 출력하고, "
             "그렇지 않다면 질문에서 가장 핵심적인 단어(예: '연차', '근로수당' 등)를 한 단어로 출력하세요.\n"
-            "질문: {question}\n"
+            "질문과 같은 번호를 붙여 한 줄에 하나씩 '번호. 답변' 형식으로만 출력하세요.\n"
+            "질문:\n{questions}\n"
             "답변:"
         )
+        return prompt | self.bot.chat_model | StrOutputParser()
 
-        classification_chain = classification_prompt | self.chat_model | RunnablePassthrough()
-        
-        result = classification_chain.invoke({"question": question})
-        return result.content.strip().lower()
-
-    def answer_question(self, question: str):
-        """
-        질문을 LLM 체인을 통해 분류한 후,
-         - 'logo_request'이면 get_company_logo()를 반환하고,
-         - 'toc_request'이면 load_toc()를 반환하며,
-         - 그 외에는 분류 체인이 추출한 핵심 키워드를 검색 쿼리로 사용해 create_qa_chain()을 실행합니다.
-        """
-        label = self.classify_question(question)
-        print(label)
-        if label == "logo_request":
-            return self.get_company_logo()
-        elif label == "toc_request":
-            return self.load_toc()
-        else:
-            # label(예: "연차"나 "근로수당")를 검색 쿼리로 사용합니다.
-            return self.create_qa_chain(query=label)
+    async def _run(self, batch):
+        questions = list(batch)
+        labels = {}
+        if len(questions) > 1:
+            metrics.inc("guideline_classify_batches_total")
+            metrics.inc("guideline_classify_batched_questions_total", value=len(questions))
+            numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+            try:
+                output = await self.create_batch_chain().ainvoke({"questions": numbered})
+                for number, label in NUMBERED_LINE_PATTERN.findall(strip_think(output)):
+                    labels.setdefault(int(number), label.strip().lower())
+            except Exception as e:
+                print(f"묶음 분류 실패, 질문별로 분류합니다: {e}")
+        for i, question in enumerate(questions, 1):
+            future = batch[question]
+            if future.done():
+                continue
+            label = labels.get(i)
+            if not label:
+                if len(questions) > 1:
+                    metrics.inc("guideline_classify_batch_fallbacks_total")
+                try:
+                    label = await self.bot.aclassify_single(question)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+            future.set_result(label)
+
+
+class GuidelineOllamaBot(GuidelineBot):
+    """
+    GuidelineBot과 같은 검색 엔진/프롬프트를 사용하고, 채팅 모델만 Ollama로 바꾼 봇입니다.
+    임베딩은 공유 검색 엔진이 담당하므로 openai_api_key는 생략하면 환경 변수 값을 사용합니다.
+    GUIDELINE_OLLAMA_CLASSIFY_BATCH_WINDOW를 설정하면 동시에 들어온 분류 호출을 묶어서 보냅니다.
+    max_concurrency는 이 봇 앞의 동시 처리 제한입니다. 그보다 많은 질문이 한꺼번에 분류를 기다릴 수 없으므로
+    묶음 크기를 그 이하로 줄여, 들어올 수 있는 요청이 모두 모이면 대기 시간을 다 채우지 않고 바로 보냅니다.
+    동시 처리 슬롯은 분류/질문 재작성/답변 생성으로 모델을 처음 부를 때 얻습니다. (admission.RequestAdmission)
+    """
+    def __init__(self, json_path: str, openai_api_key: str = None, engine=None, use_router: bool = True,
+                 max_concurrency: int = None):
+        super().__init__(json_path, openai_api_key or os.getenv("OPENAI_API_KEY"), engine=engine, use_router=use_router)
+        max_batch = min(CLASSIFY_MAX_BATCH, max_concurrency) if max_concurrency else CLASSIFY_MAX_BATCH
+        self.classification_batcher = ClassificationBatcher(self, max_batch=max_batch) if CLASSIFY_BATCH_WINDOW > 0 else None
+
+    def classify_question(self, question: str):
+        return strip_think(super().classify_question(question))
+
+    async def aclassify_single(self, question: str):
+        return strip_think(await super().aclassify_question(question))
+
+    async def arewrite_question(self, question: str, history: str):
+        await admit_model_call()
+        rewritten = strip_think(await super().arewrite_question(question, history))
+        return rewritten or question
+
+    async def acreate_qa_chain(self, query: str, docs=None, history: str = None):
+        docs = docs if docs is not None else await self.engine.aretrieve(query)
+        # 관련 조항이 없으면 모델을 부르지 않고 되묻는 답변을 돌려주므로 슬롯도 얻지 않습니다.
+        if docs:
+            await admit_model_call()
+        return await super().acreate_qa_chain(query, docs=docs, history=history)
+
+    async def astream_qa_chain(self, query: str, docs=None, history: str = None):
+        docs = docs if docs is not None else await self.engine.aretrieve(query)
+        if docs:
+            await admit_model_call()
+        async for chunk in super().astream_qa_chain(query, docs=docs, history=history):
+            yield chunk
+
+    async def aclassify_question(self, question: str):
+        await admit_model_call()
+        if self.classification_batcher is None:
+            return await self.aclassify_single(question)
+        return await self.classification_batcher.classify(question)
+
+    def create_chat_model(self):
+        # ChatOpenAI 인스턴스를 Ollama API를 사용하도록 수정:
+        return ChatOpenAI(
+            openai_api_key="dummy",                   # Ollama는 API 키가 필요 없으므로 더미 값 사용
+            openai_api_base=OLLAMA_BASE_URL,          # Ollama API 엔드포인트 (GUIDELINE_OLLAMA_BASE_URL)
+            temperature=0.1,
+            model=OLLAMA_MODEL,                       # 모델 이름 (GUIDELINE_OLLAMA_MODEL)
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        )
 
 if __name__ == "__main__":
     load_dotenv()
     json_path = os.path.join(os.path.dirname(__file__), "../data/remo_guideline.json")
-    openai_api_key = os.getenv("OPENAI_API_KEY")
     bot = GuidelineOllamaBot(json_path)
-    
+
     question = input("질문을 입력하세요: ")
     answer = bot.answer_question(question)
     print(answer)
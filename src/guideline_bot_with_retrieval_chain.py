@@ -1,40 +1,31 @@
 import os
-import json
-from langchain.docstore.document import Document
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
+from retrieval_engine import get_retrieval_engine
+from http_clients import get_http_client, get_async_http_client, OPENAI_BASE_URL
+from context_assembler import CONTEXT_TOKEN_BUDGET
 
 class RetrievalGuidelineBot:
-    def __init__(self, json_path: str, openai_api_key: str):
+    def __init__(self, json_path: str, openai_api_key: str, engine=None):
         self.json_path = json_path
         self.openai_api_key = openai_api_key
-        self.documents = self.load_json_documents()
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
-        self.vectorstore = self.create_vector_store()
-        self.chat_model = ChatOpenAI(openai_api_key=self.openai_api_key, temperature=0.7, model="chatgpt-4o-latest")
+        # 다른 봇들과 같은 검색 엔진을 공유하므로 추가 인덱싱 비용이 없습니다.
+        self.engine = engine or get_retrieval_engine(json_path, openai_api_key)
+        self.chat_model = ChatOpenAI(
+            openai_api_key=self.openai_api_key,
+            openai_api_base=OPENAI_BASE_URL,
+            temperature=0.7,
+            model="chatgpt-4o-latest",
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        )
         self.qa_chain = self.create_qa_chain()
 
-    def load_json_documents(self):
-        with open(self.json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        documents = []
-        for entry in data:
-            text = f"{entry.get('title', '')}\n{entry.get('content', '')}"
-            metadata = {"section": entry.get("section", "")}
-            doc = Document(page_content=text, metadata=metadata)
-            documents.append(doc)
-        return documents
-
-    def create_vector_store(self):
-        vectorstore = FAISS.from_documents(self.documents, self.embeddings)
-        return vectorstore
-
     def create_qa_chain(self):
-        retriever = self.vectorstore.as_retriever()
+        retriever = self.engine.as_retriever(context_budget=CONTEXT_TOKEN_BUDGET)
         system_prompt = (
             "당신은 회사 'REMO'의 임직원들에게 회사 내규에 대해 답변해 주는 비서 역할입니다."
             "회사 내규에 관련된 질문이 아니라면, 일반적인 답변을 해 주면서 회사 내규와 관련된 질문을 해 달라고 유도하세요."
@@ -58,11 +49,15 @@ class RetrievalGuidelineBot:
         result = self.qa_chain.invoke({"input": question})
         return result.get("answer", "")
 
+    async def aanswer_question(self, question: str):
+        result = await self.qa_chain.ainvoke({"input": question})
+        return result.get("answer", "")
+
 if __name__ == "__main__":
     load_dotenv()
     json_path = os.path.join(os.path.dirname(__file__), "../data/remo_guideline.json")
     openai_api_key = os.getenv("OPENAI_API_KEY")
-    bot = GuidelineBot(json_path, openai_api_key)
+    bot = RetrievalGuidelineBot(json_path, openai_api_key)
     
     question = input("질문을 입력하세요: ")
     answer = bot.answer_question(question)
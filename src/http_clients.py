@@ -0,0 +1,56 @@
+import os
+import threading
+import httpx
+
+# 모든 봇/임베딩이 같은 커넥션 풀을 쓰도록 프로세스당 하나씩 만듭니다.
+MAX_CONNECTIONS = int(os.getenv("GUIDELINE_HTTP_MAX_CONNECTIONS", "200"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GUIDELINE_HTTP_MAX_KEEPALIVE", "50"))
+TIMEOUT_SECONDS = float(os.getenv("GUIDELINE_HTTP_TIMEOUT", "120"))
+# OpenAI 호환 API 주소. 지정하지 않으면 OpenAI API를 씁니다. (벤치마크용 스텁 서버, 프록시 등)
+OPENAI_BASE_URL = os.getenv("GUIDELINE_OPENAI_BASE_URL")
+# 로컬 Ollama의 OpenAI 호환 API 주소와 모델
+OLLAMA_BASE_URL = os.getenv("GUIDELINE_OLLAMA_BASE_URL", "http://localhost:6203/v1/")
+OLLAMA_MODEL = os.getenv("GUIDELINE_OLLAMA_MODEL", "deepseek-r1:671b")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+
+def _get_or_create(kind: str, factory):
+    # fork된 워커가 부모의 소켓을 물려받아 쓰지 않도록 pid별로 관리합니다.
+    key = (kind, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+    return client
+
+
+def get_http_client():
+    return _get_or_create("sync", lambda: httpx.Client(limits=_limits(), timeout=TIMEOUT_SECONDS))
+
+
+def get_async_http_client():
+    return _get_or_create("async", lambda: httpx.AsyncClient(limits=_limits(), timeout=TIMEOUT_SECONDS))
+
+
+async def aclose_http_clients():
+    pid = os.getpid()
+    for (kind, owner), client in list(_clients.items()):
+        if owner != pid:
+            continue
+        if kind == "async":
+            await client.aclose()
+        else:
+            client.close()
+        _clients.pop((kind, owner), None)
@@ -0,0 +1,299 @@
+import os
+import json
+import math
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from document_store import DocumentStore
+
+# 저장 포맷이 바뀌면 올려서 기존 인덱스를 무효화합니다.
+INDEX_FORMAT_VERSION = 3
+
+# auto: 문서 수에 따라 고름, flat: 정확 검색(float32), sq8: 8비트 스칼라 양자화(1/4 크기),
+# hnsw: 그래프 인덱스(빠르지만 flat보다 큼), ivf: 역파일 + flat, pq: 곱 양자화, ivfpq: 역파일 + 곱 양자화(가장 작음)
+INDEX_TYPES = ("auto", "flat", "sq8", "hnsw", "ivf", "pq", "ivfpq")
+DEFAULT_INDEX_TYPE = os.getenv("GUIDELINE_FAISS_INDEX", "auto")
+# auto일 때 이 문서 수 미만이면 flat, 그 이상이면 sq8
+# (pq/ivfpq는 훨씬 작지만 recall이 크게 떨어지므로 직접 지정할 때만 씁니다. benchmarks/bench_index.py 참고)
+AUTO_FLAT_MAX_DOCUMENTS = int(os.getenv("GUIDELINE_FAISS_AUTO_FLAT_MAX", "10000"))
+# 검색 시 IVF가 살펴볼 클러스터 수, HNSW 탐색 폭
+IVF_NPROBE = int(os.getenv("GUIDELINE_FAISS_NPROBE", "16"))
+HNSW_EF_SEARCH = int(os.getenv("GUIDELINE_FAISS_EF_SEARCH", "64"))
+# 인덱스를 만들 때 flat 대비 recall@k를 잴 표본 질의 수
+RECALL_SAMPLE_SIZE = int(os.getenv("GUIDELINE_FAISS_RECALL_SAMPLE", "200"))
+RECALL_K = 10
+
+# tempfile로 만든 임시 파일(0600)/디렉터리(0700)를 교체하기 전에, open()/mkdir()처럼 umask를 따르는 권한으로 바꿉니다.
+# (os.umask는 값을 바꿔야만 읽을 수 있어서, 스레드에서 호출해도 안전하도록 import 시점에 한 번만 읽습니다)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+INDEX_FILE = "index.faiss"
+# 재빌드 때 다시 임베딩하지 않도록 원본 벡터를 보관합니다. (검색 시에는 읽지 않음)
+VECTORS_FILE = "vectors.npy"
+
+
+def publish_mode(path: str, directory: bool = False):
+    os.chmod(path, (0o777 if directory else 0o666) & ~UMASK)
+
+
+def get_embedding_model_name(embeddings):
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+def get_index_dir(json_path: str):
+    # data/remo_guideline.json -> data/remo_guideline.index/
+    return os.path.splitext(json_path)[0] + ".index"
+
+
+def compute_file_hash(path: str):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def compute_document_hash(document):
+    # 조항 단위 변경 감지용: 본문과 메타데이터가 같으면 다시 임베딩하지 않습니다.
+    hasher = hashlib.sha256(document.page_content.encode("utf-8"))
+    hasher.update(b"\0" + json.dumps(document.metadata, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def compute_corpus_hash(json_path: str, embedding_model: str, index_type: str = None):
+    """
+    코퍼스 JSON 내용 + 임베딩 모델 이름 + 인덱스 종류 + 저장 포맷 버전으로 인덱스 키를 만듭니다.
+    파일 수정 시각이 아니라 내용 기준이므로, 내용이 같으면 재빌드하지 않습니다.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(compute_file_hash(json_path).encode("ascii"))
+    hasher.update(b"\0" + embedding_model.encode("utf-8"))
+    hasher.update(b"\0" + (index_type or DEFAULT_INDEX_TYPE).encode("utf-8"))
+    hasher.update(b"\0" + str(INDEX_FORMAT_VERSION).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def read_index_meta(index_dir: str):
+    try:
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def choose_index_type(num_documents: int, index_type: str = None):
+    index_type = index_type or DEFAULT_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (가능한 값: {', '.join(INDEX_TYPES)})")
+    if index_type != "auto":
+        return index_type
+    return "flat" if num_documents < AUTO_FLAT_MAX_DOCUMENTS else "sq8"
+
+
+def _pq_subquantizers(dim: int):
+    # 벡터 하나를 약 16차원씩 나눠 각각 1바이트로 부호화합니다. (m은 dim의 약수여야 함)
+    m = max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_faiss_index(vectors, index_type: str):
+    """
+    벡터 행렬로 FAISS 인덱스를 만듭니다. 학습이 필요한 종류(ivf/pq)인데 문서 수가 학습에
+    부족하면 flat으로 대신 만듭니다. (인덱스, 실제로 만든 종류)를 반환합니다.
+    """
+    num_vectors, dim = vectors.shape
+    nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+    specs = {
+        "flat": "Flat",
+        "sq8": "SQ8",
+        "hnsw": "HNSW32",
+        "ivf": f"IVF{nlist},Flat",
+        "pq": f"PQ{_pq_subquantizers(dim)}x8",
+        "ivfpq": f"IVF{nlist},PQ{_pq_subquantizers(dim)}x8",
+    }
+    min_training = {"ivf": nlist * 39, "pq": 256, "ivfpq": max(nlist * 39, 256)}
+    if num_vectors < min_training.get(index_type, 0):
+        print(f"문서 {num_vectors}개로는 {index_type} 인덱스를 학습할 수 없어 flat 인덱스를 만듭니다.")
+        index_type = "flat"
+    index = faiss.index_factory(dim, specs[index_type])
+    if num_vectors:
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+    return index, index_type
+
+
+def configure_search(index):
+    # 저장 파일에 들어가지 않는 검색 파라미터를 설정합니다.
+    try:
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+
+def measure_recall(index, vectors, k: int = RECALL_K, sample_size: int = RECALL_SAMPLE_SIZE):
+    """
+    코퍼스 벡터 일부를 질의로 써서, flat(정확 검색) 결과 대비 recall@k를 잽니다.
+    """
+    num_vectors = len(vectors)
+    if num_vectors == 0:
+        return 1.0
+    k = min(k, num_vectors)
+    queries = vectors[np.random.default_rng(0).choice(num_vectors, min(sample_size, num_vectors), replace=False)]
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, expected = exact.search(queries, k)
+    configure_search(index)
+    _, actual = index.search(queries, k)
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    return hits / (len(queries) * k)
+
+
+def load_vector_store(index_dir: str, embeddings):
+    """
+    저장된 인덱스와 문서 저장소를 엽니다. 둘 다 mmap으로 열어, 같은 파일을 여는 워커들이 페이지 캐시를 공유하게 합니다.
+    FAISS 행 번호가 곧 문서 저장소의 번호입니다.
+    (IO_FLAG_MMAP은 IVF 역리스트만 매핑하고 flat/sq8/pq/hnsw의 벡터 코드는 메모리로 복사하므로,
+    코드 배열까지 파일에 매핑하는 IO_FLAG_MMAP_IFC로 엽니다. 이렇게 연 인덱스는 읽기 전용입니다.)
+    """
+    index = faiss.read_index(os.path.join(index_dir, INDEX_FILE), faiss.IO_FLAG_MMAP_IFC)
+    configure_search(index)
+    store = DocumentStore(index_dir)
+    return FAISS(embeddings, index, store, {position: position for position in range(len(store))})
+
+
+def save_vector_store(index, vectors, documents, index_dir: str, meta: dict):
+    """
+    임시 디렉터리에 먼저 저장한 뒤 교체해서, 다른 프로세스가 반쯤 쓰인 인덱스를 읽지 않게 합니다.
+    """
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    tmp_dir = tempfile.mkdtemp(prefix=".index-", dir=parent)
+    try:
+        faiss.write_index(index, os.path.join(tmp_dir, INDEX_FILE))
+        np.save(os.path.join(tmp_dir, VECTORS_FILE), vectors)
+        DocumentStore.write(documents, tmp_dir)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        publish_mode(tmp_dir, directory=True)
+        if os.path.exists(index_dir):
+            old_dir = tmp_dir + ".old"
+            os.replace(index_dir, old_dir)
+            os.replace(tmp_dir, index_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, index_dir)
+        return True
+    except OSError as e:
+        # 다른 워커가 동시에 저장한 경우 등
+        print(f"벡터 인덱스 저장 실패: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+
+def diff_documents(old_hashes: dict, new_hashes: dict):
+    """
+    저장된 인덱스의 조항 해시(old)와 현재 코퍼스의 조항 해시(new)를 ID 기준으로 비교합니다.
+    (추가, 변경, 삭제) ID 목록을 반환합니다.
+    """
+    added = [doc_id for doc_id in new_hashes if doc_id not in old_hashes]
+    changed = [doc_id for doc_id in new_hashes if doc_id in old_hashes and old_hashes[doc_id] != new_hashes[doc_id]]
+    removed = [doc_id for doc_id in old_hashes if doc_id not in new_hashes]
+    return added, changed, removed
+
+
+def load_stored_vectors(index_dir: str, stored_meta: dict, embedding_model: str):
+    """
+    이전 인덱스에 저장한 {조항 ID: 벡터}를 읽습니다. 임베딩 모델이나 저장 포맷이 다르면 재사용하지 않습니다.
+    """
+    if not stored_meta or stored_meta.get("embedding_model") != embedding_model \
+            or stored_meta.get("format_version") != INDEX_FORMAT_VERSION:
+        return {}
+    try:
+        vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+    except (OSError, ValueError):
+        return {}
+    ids = list(stored_meta.get("documents", {}))
+    if len(ids) != len(vectors):
+        return {}
+    return dict(zip(ids, vectors))
+
+
+def embed_documents(documents, ids, hashes, embeddings, stored_meta, stored_vectors):
+    """
+    문서 순서대로 벡터 행렬을 만듭니다. 이전 인덱스와 해시가 같은 조항은 저장된 벡터를 쓰고,
+    추가/변경된 조항만 새로 임베딩합니다.
+    """
+    old_hashes = stored_meta.get("documents", {}) if stored_vectors else {}
+    added, changed, removed = diff_documents(old_hashes, hashes)
+    if stored_vectors:
+        print(f"벡터 인덱스 증분 갱신: 추가 {len(added)}, 변경 {len(changed)}, 삭제 {len(removed)}")
+    targets = set(added) | set(changed)
+    new_positions = [position for position, doc_id in enumerate(ids) if doc_id in targets]
+    new_vectors = embeddings.embed_documents([documents[position].page_content for position in new_positions]) \
+        if new_positions else []
+    vectors_by_position = dict(zip(new_positions, new_vectors))
+    rows = [vectors_by_position[position] if position in vectors_by_position else stored_vectors[doc_id]
+            for position, doc_id in enumerate(ids)]
+    if not rows:
+        return np.zeros((0, 1), dtype=np.float32)
+    return np.ascontiguousarray(np.asarray(rows, dtype=np.float32))
+
+
+def load_or_create_vector_store(load_documents, embeddings, json_path: str, corpus_hash: str = None,
+                                index_type: str = None):
+    """
+    json_path 옆에 저장된 FAISS 인덱스와 문서 저장소를 재사용합니다.
+     - 저장된 해시가 현재 코퍼스/임베딩 모델/인덱스 종류와 같으면 JSON을 읽지 않고 디스크에서 바로 열고,
+     - 다르면 load_documents()로 문서를 읽어, 바뀐 조항만 다시 임베딩한 뒤 인덱스를 새로 만들어 저장합니다.
+       (ivf/pq처럼 학습이 필요한 인덱스도 같은 방식으로 처음부터 다시 만듭니다.)
+    문서 ID는 metadata의 article_id(없으면 순번)입니다.
+    반환하는 vectorstore.docstore는 조항 문서를 번호로 읽는 DocumentStore입니다.
+    """
+    embedding_model = get_embedding_model_name(embeddings)
+    corpus_hash = corpus_hash or compute_corpus_hash(json_path, embedding_model, index_type)
+    index_dir = get_index_dir(json_path)
+
+    stored_meta = read_index_meta(index_dir)
+    if stored_meta and stored_meta.get("corpus_hash") == corpus_hash:
+        try:
+            return load_vector_store(index_dir, embeddings)
+        except Exception as e:
+            print(f"저장된 벡터 인덱스 로드 실패, 다시 생성합니다: {e}")
+
+    documents = load_documents()
+    ids = [doc.metadata.get("article_id") or str(position) for position, doc in enumerate(documents)]
+    hashes = {doc_id: compute_document_hash(doc) for doc_id, doc in zip(ids, documents)}
+    stored_vectors = load_stored_vectors(index_dir, stored_meta, embedding_model)
+    vectors = embed_documents(documents, ids, hashes, embeddings, stored_meta, stored_vectors)
+
+    index, built_type = build_faiss_index(vectors, choose_index_type(len(documents), index_type))
+    index_bytes = len(faiss.serialize_index(index))
+    recall = measure_recall(index, vectors) if built_type != "flat" else 1.0
+    print(f"벡터 인덱스 생성: {built_type}, 문서 {len(documents)}개, "
+          f"{index_bytes / max(1, len(documents)):.0f} bytes/문서, flat 대비 recall@{RECALL_K} {recall:.3f}")
+    meta = {
+        "corpus_hash": corpus_hash,
+        "embedding_model": embedding_model,
+        "format_version": INDEX_FORMAT_VERSION,
+        "index_type": built_type,
+        "num_documents": len(documents),
+        "index_bytes": index_bytes,
+        "bytes_per_document": index_bytes / max(1, len(documents)),
+        f"recall_at_{RECALL_K}": recall,
+        "documents": hashes,
+    }
+    if save_vector_store(index, vectors, documents, index_dir, meta):
+        return load_vector_store(index_dir, embeddings)
+    # 저장에 실패하면 메모리에 있는 인덱스와 문서로 그대로 서비스합니다.
+    configure_search(index)
+    docstore = InMemoryDocstore(dict(enumerate(documents)))
+    return FAISS(embeddings, index, docstore, {position: position for position in range(len(documents))})
@@ -0,0 +1,101 @@
+import os
+import json
+import hashlib
+import argparse
+import tempfile
+import httpx
+from dotenv import load_dotenv
+from article_index import make_article_ids
+from chunk_data import parse_company_regulations, read_document
+from index_store import diff_documents, publish_mode
+from retrieval_engine import GuidelineRetrievalEngine
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../data")
+
+
+def index_entries(entries):
+    """
+    parse_company_regulations() 결과를 {조항 ID: 내용 해시}로 만듭니다.
+    """
+    suffixes = ["-".join(filter(None, [entry.get("item", ""), entry.get("clause", "")])) for entry in entries]
+    ids = make_article_ids(
+        [entry.get("section", "") for entry in entries], [entry.get("title", "") for entry in entries], suffixes
+    )
+    hashes = {}
+    for article_id, entry in zip(ids, entries):
+        text = "\0".join([entry.get("section", ""), entry.get("title", ""), entry.get("content", "")])
+        hashes[article_id] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashes
+
+
+def diff_entries(old_entries, new_entries):
+    return diff_documents(index_entries(old_entries), index_entries(new_entries))
+
+
+def load_entries(json_path: str):
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def write_entries(entries, json_path: str):
+    # 실행 중인 백엔드가 반쯤 쓰인 JSON을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    fd, tmp_path = tempfile.mkstemp(prefix=".json-", dir=os.path.dirname(os.path.abspath(json_path)))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(json.dumps(entries, ensure_ascii=False, indent=2))
+    publish_mode(tmp_path)
+    os.replace(tmp_path, json_path)
+
+
+def request_reload(reload_url: str, admin_token: str = None):
+    headers = {"X-Admin-Token": admin_token} if admin_token else {}
+    response = httpx.post(reload_url, headers=headers, timeout=600)
+    response.raise_for_status()
+    return response.json()
+
+
+def ingest(doc_path: str, json_path: str, openai_api_key: str = None, dry_run: bool = False, force: bool = False,
+           corpus_path: str = None):
+    """
+    내규 문서를 다시 파싱해서 기존 JSON과 조항 단위(장/조 ID + 내용 해시)로 비교합니다.
+    바뀐 조항이 있으면 JSON을 교체하고, 저장된 FAISS 인덱스에는 추가/변경된 조항만 임베딩해서 반영합니다.
+    corpus_path(매니페스트)를 주면 백엔드와 같은 문서 ID/이름으로 인덱스를 만들고, 다른 문서의 샤드는 건드리지 않습니다.
+    (추가, 변경, 삭제) ID 목록을 반환합니다.
+    """
+    new_entries = parse_company_regulations(read_document(doc_path))
+    added, changed, removed = diff_entries(load_entries(json_path), new_entries)
+    print(f"조항 비교 결과: 추가 {len(added)}, 변경 {len(changed)}, 삭제 {len(removed)}")
+    for label, article_ids in (("추가", added), ("변경", changed), ("삭제", removed)):
+        for article_id in article_ids:
+            print(f"  [{label}] {article_id}")
+    if dry_run or not (added or changed or removed or force):
+        return added, changed, removed
+
+    write_entries(new_entries, json_path)
+    # 엔진을 만들면서 저장된 인덱스가 증분 갱신되므로, 이후 백엔드의 재적재는 로드만 하면 됩니다.
+    GuidelineRetrievalEngine(corpus_path or json_path, openai_api_key)
+    return added, changed, removed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="내규 문서를 다시 파싱해서 바뀐 조항만 인덱스에 반영합니다.")
+    parser.add_argument("--doc", default=os.path.join(DATA_DIR, "remo_guideline.doc"))
+    parser.add_argument("--json", default=os.path.join(DATA_DIR, "remo_guideline.json"))
+    parser.add_argument("--corpus", default=os.getenv("GUIDELINE_CORPUS") or os.path.join(DATA_DIR, "corpus.json"),
+                        help="--json 문서가 포함된 코퍼스 매니페스트")
+    parser.add_argument("--dry-run", action="store_true", help="비교 결과만 출력하고 파일은 바꾸지 않습니다.")
+    parser.add_argument("--force", action="store_true", help="바뀐 조항이 없어도 JSON과 인덱스를 다시 씁니다.")
+    parser.add_argument("--reload-url", help="갱신 후 재적재를 요청할 백엔드 주소 (예: http://localhost:8000/admin/reload)")
+    args = parser.parse_args()
+
+    try:
+        added, changed, removed = ingest(args.doc, args.json, os.getenv("OPENAI_API_KEY"), args.dry_run, args.force,
+                                         args.corpus)
+    except Exception as e:
+        print(f"문서 적재 실패: {e}")
+        exit(1)
+    if args.reload_url and not args.dry_run and (added or changed or removed or args.force):
+        print(request_reload(args.reload_url, os.getenv("GUIDELINE_ADMIN_TOKEN")))
@@ -0,0 +1,56 @@
+import time
+import asyncio
+import threading
+import metrics
+
+metrics.describe("guideline_component_ready", "구성 요소(검색 엔진/봇)가 만들어졌는지 (1이면 준비됨)")
+metrics.describe("guideline_component_init_seconds", "구성 요소를 만드는 데 걸린 시간(초)")
+
+
+class LazyComponent:
+    """
+    처음 필요할 때 한 번만 만드는 구성 요소입니다. (검색 엔진, 봇)
+    만드는 동안 들어온 다른 요청은 같은 결과를 기다리며, 만들다 실패하면 오류를 남기고
+    다음 요청에서 다시 시도합니다. 비동기 경로에서는 스레드에서 만들어 이벤트 루프를 막지 않습니다.
+    """
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.error = None
+        self.init_seconds = None
+        self.lock = threading.Lock()
+        metrics.set_gauge("guideline_component_ready", 0, {"component": name})
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def get(self):
+        if self.value is not None:
+            return self.value
+        with self.lock:
+            if self.value is None:
+                started = time.perf_counter()
+                try:
+                    value = self.factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.init_seconds = time.perf_counter() - started
+                self.error = None
+                self.value = value
+                metrics.set_gauge("guideline_component_ready", 1, {"component": self.name})
+                metrics.set_gauge("guideline_component_init_seconds", self.init_seconds, {"component": self.name})
+                print(f"{self.name} 준비 완료 ({self.init_seconds:.2f}s)")
+        return self.value
+
+    async def aget(self):
+        if self.value is not None:
+            return self.value
+        return await asyncio.to_thread(self.get)
+
+    def status(self):
+        if self.ready:
+            return {"ready": True, "init_seconds": round(self.init_seconds, 3)}
+        return {"ready": False, "error": self.error}
@@ -0,0 +1,78 @@
+import math
+import re
+from collections import Counter, defaultdict
+from query_router import strip_particle
+
+WORD_PATTERN = re.compile(r"[가-힣A-Za-z0-9]+")
+
+
+def tokenize(text: str):
+    """
+    한국어용 간이 토크나이저입니다. 형태소 분석기 없이도 조사/어미 변화에 강하도록
+     - 단어 원형(소문자),
+     - 조사를 뗀 단어,
+     - 조사를 뗀 단어의 글자 bigram
+    을 모두 토큰으로 씁니다. (예: '연차유급휴가를' -> 연차유급휴가를, 연차유급휴가, 연차, 차유, 유급, ...)
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        tokens.append(word)
+        stem = strip_particle(word)
+        if stem != word:
+            tokens.append(stem)
+        if len(stem) > 2:
+            tokens.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    프로세스 내 역색인 BM25입니다. 쿼리마다 임베딩 API를 호출하지 않고도 조항 번호나
+    정확한 용어가 들어간 질의를 빠르게 찾습니다.
+    """
+    def __init__(self, texts, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # token -> [(문서 번호, 빈도)]
+        self.doc_lengths = []
+        self.doc_terms = []  # 문서 번호 -> 토큰 집합 (재정렬에서 다시 토큰화하지 않도록 보관)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            self.doc_terms.append(frozenset(counts))
+            for token, tf in counts.items():
+                self.postings[token].append((doc_id, tf))
+        self.num_docs = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / self.num_docs) if self.num_docs else 0.0
+        self.idf = {
+            token: math.log(1 + (self.num_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for token, posting in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 4):
+        """
+        (문서 번호, 점수) 목록을 점수 내림차순으로 반환합니다. 일치하는 토큰이 없으면 빈 목록입니다.
+        """
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = self.idf[token]
+            for doc_id, tf in posting:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """
+    여러 검색 결과 순위를 RRF로 합칩니다. rankings는 키 목록들의 목록이고,
+    (키, 점수) 목록을 점수 내림차순으로 반환합니다.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,148 @@
+import os
+import bisect
+import threading
+from collections import defaultdict, deque
+
+# 지연 시간(초) 히스토그램의 기본 버킷 경계
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 히스토그램마다 최근 관측값을 이만큼 보관해서 p50/p95/p99를 함께 내보냅니다.
+QUANTILE_WINDOW = int(os.getenv("GUIDELINE_METRICS_QUANTILE_WINDOW", "1024"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, buckets, window: int = QUANTILE_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return []
+        return [(q, values[min(len(values) - 1, int(q * len(values)))]) for q in QUANTILES]
+
+
+class MetricsRegistry:
+    """
+    프로세스 내 카운터/게이지/히스토그램을 모아 두었다가 Prometheus 텍스트 포맷으로 내보냅니다.
+    히스토그램은 버킷과 함께, 최근 관측값 기준 p50/p95/p99를 '<이름>_recent' summary로도 내보냅니다.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._histograms = {}
+        self._buckets = {}
+        self._help = {}
+
+    def describe(self, name: str, help_text: str, buckets=None):
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name: str, labels: dict = None, value: float = 1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def set(self, name: str, value: float, labels: dict = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    def get(self, name: str, labels: dict = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            if key in self._gauges:
+                return self._gauges[key]
+            return self._counters.get(key, 0)
+
+    def total(self, name: str, labels: dict = None):
+        # labels를 모두 가진 카운터들의 합 (나머지 라벨은 상관없이 합칩니다)
+        wanted = set((labels or {}).items())
+        with self._lock:
+            return sum(value for (key, key_labels), value in self._counters.items()
+                       if key == name and wanted <= set(key_labels))
+
+    def _header(self, lines, seen, name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, list(h.buckets), list(h.counts), h.total, h.count, h.quantiles(), len(h.recent), sum(h.recent))
+                for key, h in self._histograms.items()
+            )
+        lines = []
+        seen = set()
+        for kind, samples in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), value in samples:
+                self._header(lines, seen, name, kind)
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), buckets, counts, total, count, _, _, _ in histograms:
+            self._header(lines, seen, name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for (name, labels), _, _, _, _, quantiles, recent_count, recent_total in histograms:
+            summary = f"{name}_recent"
+            if summary not in seen:
+                seen.add(summary)
+                lines.append(f"# HELP {summary} {self._help.get(name, name)} (최근 {QUANTILE_WINDOW}개 기준)")
+                lines.append(f"# TYPE {summary} summary")
+            for q, value in quantiles:
+                lines.append(f"{summary}{_format_labels(labels + (('quantile', f'{q:g}'),))} {value:g}")
+            lines.append(f"{summary}_sum{_format_labels(labels)} {recent_total:g}")
+            lines.append(f"{summary}_count{_format_labels(labels)} {recent_count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+    return f"{{{label_text}}}" if label_text else ""
+
+
+registry = MetricsRegistry()
+
+
+def inc(name: str, labels: dict = None, value: float = 1):
+    registry.inc(name, labels, value)
+
+
+def set_gauge(name: str, value: float, labels: dict = None):
+    registry.set(name, value, labels)
+
+
+def observe(name: str, value: float, labels: dict = None):
+    registry.observe(name, value, labels)
+
+
+def describe(name: str, help_text: str, buckets=None):
+    registry.describe(name, help_text, buckets)
@@ -0,0 +1,112 @@
+import re
+from collections import namedtuple
+import metrics
+from article_index import ARTICLE_PATTERN
+
+LOGO_LABEL = "logo_request"
+TOC_LABEL = "toc_request"
+
+# label: classify_question()과 같은 값 (logo_request / toc_request / 검색 키워드)
+# source: 어떤 규칙으로 결정했는지 (logo / toc / article / keyword)
+RouteDecision = namedtuple("RouteDecision", ["label", "source"])
+
+LOGO_PATTERN = re.compile(r"로고|logo|심볼\s*마크|\bCI\b", re.IGNORECASE)
+# '차례'는 '몇 차례'처럼 횟수로도 쓰이므로 보여/알려 달라는 요청이 붙을 때만 목차 요청으로 봅니다.
+TOC_PATTERN = re.compile(r"목차|차례\s*(?:를|좀)?\s*(?:좀\s*)?(?:보여|알려)|table\s+of\s+contents|\btoc\b",
+                         re.IGNORECASE)
+TITLE_KEYWORD_PATTERN = re.compile(r"\((.+?)\)", re.DOTALL)
+WORD_PATTERN = re.compile(r"[가-힣A-Za-z0-9]+")
+TERM_SPLIT_PATTERN = re.compile(r"[\s,·∙ㆍ]+|및|등")
+
+# 질문 끝에 붙는 조사/어미를 떼어 내고 키워드만 남깁니다. 긴 것부터 검사합니다.
+PARTICLES = sorted([
+    "은", "는", "이", "가", "을", "를", "에", "의", "도", "만", "와", "과", "로", "으로",
+    "에서", "에게", "한테", "까지", "부터", "이랑", "랑", "이나", "나", "이란", "란",
+    "이라는", "라는", "에는", "에선", "에서는", "으로는", "로는", "은요", "는요", "이요",
+    "하면", "하려면", "할때", "했을", "해도", "하는", "되면", "인가요", "이야", "야",
+], key=len, reverse=True)
+
+# 대부분의 조항 제목에 등장해서 키워드로서 변별력이 없는 단어들
+STOPWORDS = {
+    "회사", "규정", "내규", "규칙", "취업규칙", "사원", "직원", "임직원", "관한", "대한", "위한",
+    "알려줘", "알려", "주세요", "뭐야", "무엇", "어떻게", "얼마", "며칠", "언제", "궁금", "있어",
+    "있나요", "되나요", "하나요", "내용", "설명", "질문",
+}
+
+metrics.describe("guideline_router_decisions_total", "질문 라우팅 결과 (source=llm은 LLM 분류로 넘어간 경우)")
+
+
+def strip_particle(word: str):
+    for particle in PARTICLES:
+        if len(word) > len(particle) + 1 and word.endswith(particle):
+            return word[:-len(particle)]
+    return word
+
+
+class QueryRouter:
+    """
+    LLM 분류(classify_question) 전에 실행하는 규칙 기반 라우터입니다.
+     - 로고/목차 요청은 키워드 정규식으로,
+     - '제N조'가 포함된 질문은 해당 조항 번호로,
+     - 그 외에는 조항 제목에 등장하는 단어와 겹치는 질문 단어를 키워드로 결정합니다.
+    확신할 수 없으면 None을 반환하고, 호출한 쪽에서 LLM 분류를 실행합니다.
+    """
+    def __init__(self, titles):
+        # 조항 제목 괄호 안의 단어 -> 해당 단어가 등장하는 조항 수
+        self.term_counts = {}
+        for title in titles:
+            match = TITLE_KEYWORD_PATTERN.search(title or "")
+            if not match:
+                continue
+            terms = {t for t in TERM_SPLIT_PATTERN.split(match.group(1)) if len(t) >= 2}
+            for term in terms:
+                self.term_counts[term] = self.term_counts.get(term, 0) + 1
+
+    @classmethod
+    def from_documents(cls, documents):
+        return cls(doc.page_content.split("\n", 1)[0] for doc in documents)
+
+    def extract_keyword(self, question: str, max_words: int = 3):
+        """
+        조항 제목 단어와 겹치는 질문 단어들을 질문 순서대로 이어 붙여 검색 쿼리로 씁니다.
+        (예: '징계의 종류가 뭐야' -> '징계 종류')
+        """
+        keywords = []
+        for word in WORD_PATTERN.findall(question):
+            word = strip_particle(word)
+            if len(word) < 2 or word in STOPWORDS or word in keywords:
+                continue
+            if any(word in term or term in word for term in self.term_counts):
+                keywords.append(word)
+        if not keywords:
+            return None
+        if len(keywords) > max_words:
+            # 등장하는 조항 수가 적은(더 구체적인) 단어를 우선합니다.
+            specificity = {
+                word: sum(count for term, count in self.term_counts.items() if word in term or term in word)
+                for word in keywords
+            }
+            kept = set(sorted(keywords, key=lambda w: specificity[w])[:max_words])
+            keywords = [w for w in keywords if w in kept]
+        return " ".join(keywords)
+
+    def route(self, question: str):
+        if LOGO_PATTERN.search(question):
+            return RouteDecision(LOGO_LABEL, "logo")
+        if TOC_PATTERN.search(question):
+            return RouteDecision(TOC_LABEL, "toc")
+        article = ARTICLE_PATTERN.search(question)
+        if article:
+            return RouteDecision(f"제{article.group(1)}조", "article")
+        keyword = self.extract_keyword(question)
+        if keyword:
+            return RouteDecision(keyword.lower(), "keyword")
+        return None
+
+    def classify(self, question: str):
+        """
+        라우팅 결과 레이블을 반환하고 결정 출처를 메트릭에 기록합니다. 결정하지 못하면 None.
+        """
+        decision = self.route(question)
+        metrics.inc("guideline_router_decisions_total", {"source": decision.source if decision else "llm"})
+        return decision.label if decision else None
@@ -0,0 +1,106 @@
+import os
+import math
+from typing import List
+from lexical_index import tokenize
+import metrics
+
+# none: 1차 검색 결과를 그대로 사용, lexical: 질의어 IDF 가중 커버리지, cross-encoder: CPU 크로스 인코더
+RERANKERS = ("none", "lexical", "cross-encoder")
+DEFAULT_RERANKER = os.getenv("GUIDELINE_RERANKER", "lexical")
+# 재정렬할 1차 검색 후보 수 (최종 k보다 넓게 가져와서 k 바로 밖의 조항도 살립니다)
+RERANK_POOL = int(os.getenv("GUIDELINE_RERANK_POOL", "20"))
+# 이 점수(0~1) 미만인 후보는 버립니다. 비워 두면 재정렬기별 기본값을 씁니다.
+RERANK_MIN_SCORE = os.getenv("GUIDELINE_RERANK_MIN_SCORE")
+# 최고 점수 대비 이 비율 미만인 후보도 버립니다. (1등과 차이가 큰 꼬리 문서 제거)
+RERANK_RELATIVE_SCORE = float(os.getenv("GUIDELINE_RERANK_RELATIVE_SCORE", "0.5"))
+# 다국어(한국어 포함) MS MARCO 크로스 인코더
+CROSS_ENCODER_MODEL = os.getenv("GUIDELINE_CROSS_ENCODER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+
+metrics.describe("guideline_rerank_candidates_total", "재정렬한 1차 검색 후보 수")
+metrics.describe("guideline_rerank_kept_total", "재정렬 후 남긴 문서 수")
+metrics.describe("guideline_rerank_empty_total", "기준 점수를 넘는 문서가 없어 되묻기로 끝난 검색 수")
+
+
+class LexicalReranker:
+    """
+    질의 토큰 중 조항(제목+본문)에 들어 있는 토큰의 IDF 합을 질의 전체 IDF 합으로 나눈 값(0~1)입니다.
+    점수의 title_weight만큼은 조항 제목에 들어 있는 비율로 매겨서, 본문에만 스치듯 나오는 조항보다
+    제목이 질의와 맞는 조항을 앞에 둡니다.
+    모델 없이 동작하며, 임베딩으로만 가까운(키워드가 하나도 겹치지 않는) 후보를 걸러 냅니다.
+    IDF는 문서 샤드의 BM25 색인 값을 쓰므로, 코퍼스에 없는 질의 토큰은 점수에 영향이 없습니다.
+    조항의 토큰 집합도 샤드에 미리 만들어 둔 것을 terms_for로 받아서, 질의마다 후보를 토큰화하지 않습니다.
+    """
+    name = "lexical"
+    min_score = 0.25
+    title_weight = 0.2
+
+    def score(self, query: str, docs, terms_for) -> List[float]:
+        query_tokens = set(tokenize(query))
+        scores = []
+        for doc in docs:
+            idf, title_tokens, doc_tokens = terms_for(doc)
+            weights = {token: idf[token] for token in query_tokens if token in idf}
+            total = sum(weights.values())
+            if not total:
+                scores.append(0.0)
+                continue
+            coverage = sum(weight for token, weight in weights.items() if token in doc_tokens) / total
+            title_coverage = sum(weight for token, weight in weights.items() if token in title_tokens) / total
+            scores.append((1 - self.title_weight) * coverage + self.title_weight * title_coverage)
+        return scores
+
+
+class CrossEncoderReranker:
+    """
+    sentence-transformers 크로스 인코더로 (질의, 조항) 쌍의 관련도를 CPU에서 계산합니다.
+    로짓에 시그모이드를 씌워 0~1 점수로 씁니다.
+    sentence-transformers가 필요합니다: pip install sentence-transformers
+    """
+    name = "cross-encoder"
+    min_score = 0.3
+
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("크로스 인코더 재정렬에는 sentence-transformers 패키지가 필요합니다: pip install sentence-transformers") from e
+        self.client = CrossEncoder(model_name, device="cpu", max_length=512)
+
+    def score(self, query: str, docs, terms_for=None) -> List[float]:
+        if not docs:
+            return []
+        logits = self.client.predict([(query, doc.page_content) for doc in docs], show_progress_bar=False)
+        return [1 / (1 + math.exp(-float(logit))) for logit in logits]
+
+
+def create_reranker(name: str = None):
+    name = name or DEFAULT_RERANKER
+    if name == "none":
+        return None
+    if name == "lexical":
+        return LexicalReranker()
+    if name == "cross-encoder":
+        return CrossEncoderReranker()
+    raise ValueError(f"지원하지 않는 재정렬기입니다: {name} (가능한 값: {', '.join(RERANKERS)})")
+
+
+def cutoff(docs, scores, k: int, min_score: float, relative: float = RERANK_RELATIVE_SCORE):
+    """
+    점수 내림차순(같으면 1차 검색 순위)으로 정렬한 뒤, 최소 점수와 최고 점수 대비 비율을 모두 넘는
+    후보만 최대 k개 남깁니다. 남는 후보가 없으면 빈 목록입니다.
+    """
+    ranked = sorted(zip(docs, scores), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] < min_score:
+        return []
+    threshold = max(min_score, ranked[0][1] * relative)
+    return [doc for doc, score in ranked[:k] if score >= threshold]
+
+
+def rerank(reranker, query: str, docs, k: int, terms_for=None):
+    min_score = float(RERANK_MIN_SCORE) if RERANK_MIN_SCORE else reranker.min_score
+    kept = cutoff(docs, reranker.score(query, docs, terms_for), k, min_score)
+    metrics.inc("guideline_rerank_candidates_total", {"reranker": reranker.name}, value=len(docs))
+    metrics.inc("guideline_rerank_kept_total", {"reranker": reranker.name}, value=len(kept))
+    if not kept:
+        metrics.inc("guideline_rerank_empty_total", {"reranker": reranker.name})
+    return kept
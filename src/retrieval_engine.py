@@ -0,0 +1,401 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+from langchain.docstore.document import Document
+from langchain_core.retrievers import BaseRetriever
+from index_store import load_or_create_vector_store, compute_corpus_hash, get_embedding_model_name
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from article_index import ArticleIndex, make_article_ids, parse_article_number, parse_chapter_number
+from corpus_manifest import load_manifest
+from embedding_cache import CachedEmbeddings
+from embedding_providers import create_embeddings
+from document_store import DocumentStore
+from toc import load_or_render_toc
+from context_assembler import assemble_context
+from tracing import span
+from reranker import create_reranker, rerank as rerank_documents, RERANK_POOL
+
+# dense: FAISS 유사도 검색만, lexical: BM25만 (임베딩 호출 없음), hybrid: 둘을 RRF로 결합
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+DEFAULT_RETRIEVAL_MODE = os.getenv("GUIDELINE_RETRIEVAL_MODE", "hybrid")
+DEFAULT_K = int(os.getenv("GUIDELINE_RETRIEVAL_K", "4"))
+# '제N조' 직접 조회 시 함께 붙일 같은 장 안의 앞뒤 조항 수
+ARTICLE_NEIGHBORS = int(os.getenv("GUIDELINE_ARTICLE_NEIGHBORS", "0"))
+# 동기 검색에서 여러 문서 샤드를 동시에 검색할 스레드 수
+SHARD_SEARCH_WORKERS = int(os.getenv("GUIDELINE_SHARD_SEARCH_WORKERS", "8"))
+
+_shard_executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_WORKERS, thread_name_prefix="shard-search")
+
+
+class EngineRetriever(BaseRetriever):
+    """
+    LangChain 체인(create_retrieval_chain 등)에서 엔진의 검색 모드를 그대로 쓰기 위한 래퍼입니다.
+    """
+    engine: Any
+    mode: Optional[str] = None
+    k: int = DEFAULT_K
+    # 지정하면 검색 결과를 context_assembler로 중복 제거/토큰 예산에 맞춰 잘라서 돌려줍니다.
+    context_budget: Optional[int] = None
+
+    def _assemble(self, query: str, docs: List[Document]) -> List[Document]:
+        if self.context_budget is None:
+            return docs
+        return assemble_context(query, docs, self.context_budget).documents
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self._assemble(query, self.engine.retrieve(query, k=self.k, mode=self.mode))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self._assemble(query, await self.engine.aretrieve(query, k=self.k, mode=self.mode))
+
+
+def load_json_documents(json_path: str, doc_id: str = None, doc_title: str = None):
+    """
+    조항 JSON을 Document 목록으로 읽습니다. 메타데이터에는 문서 ID/이름, 장, 조, 항(있으면)과
+    문서 안에서 안정적인 article_id, 코퍼스 전체에서 유일한 chunk_id('문서ID:article_id')를 넣습니다.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    doc_id = doc_id or os.path.splitext(os.path.basename(json_path))[0]
+    suffixes = ["-".join(filter(None, [entry.get("item", ""), entry.get("clause", "")])) for entry in data]
+    article_ids = make_article_ids(
+        [entry.get("section", "") for entry in data], [entry.get("title", "") for entry in data], suffixes
+    )
+    documents = []
+    for entry, article_id in zip(data, article_ids):
+        text = f"{entry.get('title', '')}\n{entry.get('content', '')}"
+        metadata = {
+            "doc_id": doc_id,
+            "document": doc_title or doc_id,
+            "section": entry.get("section", ""),
+            "chapter": parse_chapter_number(entry.get("section", "")),
+            "article": parse_article_number(entry.get("title", "")),
+            "article_id": article_id,
+            "chunk_id": f"{doc_id}:{article_id}",
+        }
+        if entry.get("item"):
+            metadata["item"] = entry["item"]
+        if entry.get("clause"):
+            metadata["clause"] = entry["clause"]
+        doc = Document(page_content=text, metadata=metadata)
+        documents.append(doc)
+    return documents
+
+
+class DocumentShard:
+    """
+    규정 문서 하나의 조항과, 그로부터 만든 FAISS 인덱스/BM25 역색인/조항 색인/목차입니다.
+    인덱스는 문서 JSON 옆에 따로 저장되므로, 다른 문서를 추가하거나 고쳐도 이 샤드는 다시 임베딩하지 않습니다.
+    조항 본문은 인덱스와 함께 저장된 DocumentStore(mmap)에서 번호로 읽고, 메모리에 따로 들고 있지 않습니다.
+    """
+    def __init__(self, spec, embeddings, index_type: str = None):
+        self.spec = spec
+        self.doc_id = spec.doc_id
+        # 문서 내용 + 임베딩 모델 + 인덱스 종류 해시. 인덱스 무효화 기준으로 씁니다.
+        self.corpus_hash = compute_corpus_hash(spec.path, get_embedding_model_name(embeddings), index_type)
+        # 문서가 바뀌지 않았다면 디스크에 저장된 인덱스를 JSON을 읽지 않고 그대로 열고,
+        # 바뀌었다면 바뀐 조항만 다시 임베딩해서 인덱스를 다시 만듭니다.
+        self.vectorstore = load_or_create_vector_store(
+            lambda: load_json_documents(spec.path, spec.doc_id, spec.title),
+            embeddings, spec.path, self.corpus_hash, index_type,
+        )
+        docstore = self.vectorstore.docstore
+        if isinstance(docstore, DocumentStore):
+            self.documents = docstore
+        else:
+            # 인덱스를 저장하지 못한 경우에만 메모리의 문서 목록을 씁니다.
+            self.documents = [docstore.search(position) for position in range(len(self.vectorstore.index_to_docstore_id))]
+        self.lexical_index = BM25Index(doc.page_content for doc in self.documents)
+        self.article_index = ArticleIndex.from_documents(self.documents)
+        # 재정렬기가 질의마다 후보 조항을 다시 토큰화하지 않도록 chunk_id -> (제목 토큰, 조항 전체 토큰)을 만들어 둡니다.
+        # 조항 전체 토큰은 BM25 색인을 만들 때 구한 것을 그대로 씁니다.
+        self.rerank_terms = {
+            doc.metadata.get("chunk_id"): (frozenset(tokenize(doc.page_content.partition("\n")[0])), terms)
+            for doc, terms in zip(self.documents, self.lexical_index.doc_terms)
+        }
+        # 목차는 문서가 바뀔 때만 다시 만들고, 요청마다 메모리에서 바로 돌려줍니다.
+        self.toc = load_or_render_toc(spec.path, self.documents)
+
+    def lookup_articles(self, query: str, neighbors: int):
+        return [self.documents[position] for position in self.article_index.lookup(query, neighbors)]
+
+    def get_document(self, article_id: str):
+        if isinstance(self.documents, DocumentStore):
+            return self.documents.find(article_id)
+        return next((doc for doc in self.documents if doc.metadata.get("article_id") == article_id), None)
+
+    def lexical_search(self, query: str, k: int):
+        return [(self.documents[doc_id], score) for doc_id, score in self.lexical_index.search(query, k)]
+
+    def dense_search(self, vector, k: int):
+        # (문서, L2 거리) 목록. 모든 샤드가 같은 임베딩 모델을 쓰므로 거리끼리 비교할 수 있습니다.
+        return self.vectorstore.similarity_search_with_score_by_vector(vector, k=k)
+
+
+class CorpusSnapshot:
+    """
+    한 시점의 코퍼스(문서 샤드 목록)입니다.
+    코퍼스를 다시 적재할 때는 새 스냅샷을 다 만든 뒤 참조 하나만 바꿔서, 진행 중인 요청은
+    이전 스냅샷으로 끝까지 처리되고 새 요청부터 새 스냅샷을 봅니다.
+    """
+    def __init__(self, shards):
+        self.shards = list(shards)
+        self.shards_by_id = {shard.doc_id: shard for shard in self.shards}
+        # 문서 구성(ID/이름/별칭). 문서 내용이 같아도 매니페스트가 바뀌면 다시 적재합니다.
+        self.layout = [(shard.doc_id, shard.spec.title, tuple(shard.spec.aliases)) for shard in self.shards]
+        # 샤드 해시들을 합친 코퍼스 해시. 답변 캐시의 무효화 기준으로 씁니다.
+        if len(self.shards) == 1:
+            self.corpus_hash = self.shards[0].corpus_hash
+        else:
+            hasher = hashlib.sha256()
+            for shard in self.shards:
+                hasher.update(f"{shard.doc_id}:{shard.corpus_hash}\n".encode("utf-8"))
+            self.corpus_hash = hasher.hexdigest()
+        if len(self.shards) == 1:
+            self.toc = self.shards[0].toc
+        else:
+            self.toc = "\n\n".join(f"## {shard.spec.title}\n\n{shard.toc}" for shard in self.shards if shard.toc)
+
+    @property
+    def documents(self):
+        # 모든 샤드의 조항 목록 (라우터 생성 등 드물게 쓰이므로 필요할 때 만듭니다)
+        return [doc for shard in self.shards for doc in shard.documents]
+
+    def get_document(self, chunk_id: str):
+        doc_id, _, article_id = chunk_id.partition(":")
+        shard = self.shards_by_id.get(doc_id)
+        return shard.get_document(article_id) if shard is not None else None
+
+    def rerank_terms_for(self, doc):
+        """
+        재정렬 점수에 쓸 (조항이 속한 문서 샤드의 BM25 IDF, 제목 토큰 집합, 조항 전체 토큰 집합)입니다.
+        토큰 집합은 샤드를 만들 때 구해 둔 것을 쓰고, 없을 때만 토큰화합니다.
+        """
+        shard = self.shards_by_id[doc.metadata["doc_id"]]
+        terms = shard.rerank_terms.get(doc.metadata.get("chunk_id"))
+        if terms is None:
+            terms = (frozenset(tokenize(doc.page_content.partition("\n")[0])), frozenset(tokenize(doc.page_content)))
+        return (shard.lexical_index.idf,) + terms
+
+    def select_shards(self, query: str):
+        # 질문에 문서 이름이 나오면 그 문서만, 아니면 모든 문서를 검색합니다.
+        mentioned = [shard for shard in self.shards if shard.spec.mentioned_in(query)]
+        return mentioned or self.shards
+
+
+class GuidelineRetrievalEngine:
+    """
+    코퍼스 문서, 임베딩, 문서별 FAISS 인덱스/BM25 역색인을 소유하는 검색 엔진입니다.
+    봇들은 채팅 모델과 프롬프트만 가지고, 검색은 이 엔진을 공유해서 사용합니다.
+    corpus_path는 조항 JSON 하나 또는 여러 문서를 나열한 매니페스트이며(corpus_manifest 참고),
+    질의는 관련 문서 샤드들에 병렬로 보낸 뒤 결과를 합칩니다.
+    코퍼스 관련 상태는 CorpusSnapshot에 있으며, reload()로 재시작 없이 교체할 수 있습니다.
+    """
+    def __init__(self, corpus_path: str, openai_api_key: str = None, mode: str = None, embedding_provider: str = None,
+                 reranker: str = None, index_type: str = None):
+        self.corpus_path = corpus_path
+        self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+        self.mode = mode or DEFAULT_RETRIEVAL_MODE
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"지원하지 않는 검색 모드입니다: {self.mode} (가능한 값: {', '.join(RETRIEVAL_MODES)})")
+        # 임베딩 구현은 GUIDELINE_EMBEDDING_PROVIDER(openai/local)로 고릅니다.
+        # 같은 키워드가 반복해서 임베딩되지 않도록 쿼리 임베딩을 캐시하고, 동시 요청은 배치로 묶습니다.
+        self.embeddings = CachedEmbeddings(create_embeddings(embedding_provider, self.openai_api_key))
+        # 1차 검색 후보를 넓게 가져와 다시 점수를 매기고, 기준을 넘는 조항만 남깁니다. (GUIDELINE_RERANKER)
+        self.reranker = create_reranker(reranker)
+        # FAISS 인덱스 종류. 지정하지 않으면 GUIDELINE_FAISS_INDEX를 따릅니다.
+        self.index_type = index_type
+        self.reload_lock = threading.Lock()
+        self.snapshot = self.load_snapshot()
+
+    @property
+    def documents(self):
+        return self.snapshot.documents
+
+    @property
+    def corpus_hash(self):
+        return self.snapshot.corpus_hash
+
+    @property
+    def toc(self):
+        return self.snapshot.toc
+
+    def load_snapshot(self, previous=None):
+        # 이전 스냅샷에서 내용이 그대로인 문서 샤드는 다시 읽지 않고 재사용합니다.
+        previous_shards = {shard.doc_id: shard for shard in previous.shards} if previous else {}
+        embedding_model = get_embedding_model_name(self.embeddings)
+        shards = []
+        for spec in load_manifest(self.corpus_path):
+            shard = previous_shards.get(spec.doc_id)
+            if shard is None or shard.spec.path != spec.path or \
+                    shard.corpus_hash != compute_corpus_hash(spec.path, embedding_model, self.index_type):
+                shard = DocumentShard(spec, self.embeddings, self.index_type)
+            else:
+                shard.spec = spec
+            shards.append(shard)
+        return CorpusSnapshot(shards)
+
+    def reload(self):
+        """
+        매니페스트와 문서 JSON을 다시 읽어 새 스냅샷을 만들고 교체합니다. 바뀐 문서의 바뀐 조항만
+        다시 임베딩하며, 코퍼스가 그대로면 아무것도 바꾸지 않습니다. 교체했으면 True를 반환합니다.
+        """
+        with self.reload_lock:
+            snapshot = self.load_snapshot(self.snapshot)
+            if snapshot.corpus_hash == self.snapshot.corpus_hash and snapshot.layout == self.snapshot.layout:
+                return False
+            self.snapshot = snapshot
+            print(f"코퍼스를 다시 적재했습니다: 문서 {len(snapshot.shards)}개, 조항 {sum(len(shard.documents) for shard in snapshot.shards)}개 ({snapshot.corpus_hash[:12]})")
+            return True
+
+    def as_retriever(self, k: int = DEFAULT_K, mode: str = None, context_budget: int = None):
+        return EngineRetriever(engine=self, k=k, mode=mode, context_budget=context_budget)
+
+    def lookup_articles(self, query: str, neighbors: int = ARTICLE_NEIGHBORS, snapshot=None, shards=None):
+        """
+        질의가 '제N조'(또는 '제N장')를 가리키면 해당 조항 문서를 바로 반환합니다. 없으면 빈 목록.
+        """
+        snapshot = snapshot or self.snapshot
+        shards = shards if shards is not None else snapshot.select_shards(query)
+        return [doc for shard in shards for doc in shard.lookup_articles(query, neighbors)]
+
+    def get_documents_by_ids(self, chunk_ids):
+        # 대화 상태에 저장해 둔 chunk_id로 문서를 다시 찾습니다.
+        snapshot = self.snapshot
+        return [doc for doc in (snapshot.get_document(chunk_id) for chunk_id in chunk_ids) if doc is not None]
+
+    def lexical_search(self, query: str, k: int, shards=None):
+        """
+        샤드별 BM25 결과를 합칩니다. BM25 점수는 샤드마다 IDF가 달라 바로 비교할 수 없으므로
+        샤드 안의 최고 점수로 나눈 값으로 순위를 매깁니다.
+        """
+        shards = shards if shards is not None else self.snapshot.shards
+        if len(shards) == 1:
+            return [doc for doc, _ in shards[0].lexical_search(query, k)]
+        merged = []
+        for shard in shards:
+            results = shard.lexical_search(query, k)
+            if results:
+                top = results[0][1]
+                merged.extend((doc, score / top) for doc, score in results)
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return [doc for doc, _ in merged[:k]]
+
+    def merge_dense(self, results_per_shard, k: int):
+        merged = [item for results in results_per_shard for item in results]
+        merged.sort(key=lambda item: item[1])
+        return [doc for doc, _ in merged[:k]]
+
+    def dense_search(self, vector, k: int, shards):
+        if len(shards) == 1:
+            return self.merge_dense([shards[0].dense_search(vector, k)], k)
+        futures = [_shard_executor.submit(shard.dense_search, vector, k) for shard in shards]
+        return self.merge_dense([future.result() for future in futures], k)
+
+    async def adense_search(self, vector, k: int, shards):
+        # FAISS 검색은 샤드마다 스레드에서 동시에 실행되어 이벤트 루프를 막지 않습니다.
+        results = await asyncio.gather(*(asyncio.to_thread(shard.dense_search, vector, k) for shard in shards))
+        return self.merge_dense(results, k)
+
+    def fuse(self, dense_docs, lexical_docs, k: int):
+        # FAISS docstore의 문서는 별도 객체이므로 chunk_id 기준으로 같은 조항을 합칩니다.
+        by_key = {}
+        for doc in dense_docs + lexical_docs:
+            by_key.setdefault(doc.metadata["chunk_id"], doc)
+        fused = reciprocal_rank_fusion([
+            [doc.metadata["chunk_id"] for doc in dense_docs],
+            [doc.metadata["chunk_id"] for doc in lexical_docs],
+        ])
+        return [by_key[key] for key, _ in fused[:k]]
+
+    def candidate_count(self, k: int, rerank: bool):
+        return max(k, RERANK_POOL) if rerank else k
+
+    def retrieve(self, query: str, k: int = DEFAULT_K, mode: str = None, rerank: bool = True):
+        """
+        조항 번호 질의는 색인에서 바로, 그 외에는 검색 모드에 따라 1차 검색한 뒤 재정렬기로 후보를
+        다시 점수 매겨 기준을 넘는 조항만 최대 k개 반환합니다. 남는 조항이 없으면 빈 목록입니다.
+        """
+        # 검색 도중 reload()가 일어나도 한 요청은 같은 스냅샷만 봅니다.
+        snapshot = self.snapshot
+        shards = snapshot.select_shards(query)
+        # 조항 번호를 직접 지정한 질의는 임베딩/유사도 검색 없이 색인에서 바로 찾습니다.
+        with span("article_lookup"):
+            articles = self.lookup_articles(query, snapshot=snapshot, shards=shards)
+        if articles:
+            return articles
+        mode = mode or self.mode
+        # k가 후보 수(RERANK_POOL) 이상이어도 재정렬과 기준 점수 필터는 그대로 적용합니다.
+        rerank = rerank and self.reranker is not None
+        pool = self.candidate_count(k, rerank)
+        if mode == "lexical":
+            with span("lexical_search"):
+                candidates = self.lexical_search(query, pool, shards)
+        else:
+            # 쿼리는 한 번만 임베딩해서 모든 샤드에 같은 벡터로 검색합니다.
+            with span("embed_query"):
+                vector = self.embeddings.embed_query(query)
+            with span("faiss_search"):
+                dense_docs = self.dense_search(vector, pool * 2 if mode == "hybrid" else pool, shards)
+            if mode == "dense":
+                candidates = dense_docs
+            else:
+                with span("lexical_search"):
+                    lexical_docs = self.lexical_search(query, pool * 2, shards)
+                candidates = self.fuse(dense_docs, lexical_docs, pool)
+        if not rerank:
+            return candidates
+        with span("rerank"):
+            return rerank_documents(self.reranker, query, candidates, k, snapshot.rerank_terms_for)
+
+    async def aretrieve(self, query: str, k: int = DEFAULT_K, mode: str = None, rerank: bool = True):
+        # 쿼리 임베딩은 비동기 HTTP로, FAISS 검색과 재정렬은 스레드에서 실행되어 이벤트 루프를 막지 않습니다.
+        snapshot = self.snapshot
+        shards = snapshot.select_shards(query)
+        with span("article_lookup"):
+            articles = self.lookup_articles(query, snapshot=snapshot, shards=shards)
+        if articles:
+            return articles
+        mode = mode or self.mode
+        rerank = rerank and self.reranker is not None
+        pool = self.candidate_count(k, rerank)
+        if mode == "lexical":
+            with span("lexical_search"):
+                candidates = self.lexical_search(query, pool, shards)
+        else:
+            with span("embed_query"):
+                vector = await self.embeddings.aembed_query(query)
+            with span("faiss_search"):
+                dense_docs = await self.adense_search(vector, pool * 2 if mode == "hybrid" else pool, shards)
+            if mode == "dense":
+                candidates = dense_docs
+            else:
+                with span("lexical_search"):
+                    lexical_docs = self.lexical_search(query, pool * 2, shards)
+                candidates = self.fuse(dense_docs, lexical_docs, pool)
+        if not rerank:
+            return candidates
+        with span("rerank"):
+            return await asyncio.to_thread(rerank_documents, self.reranker, query, candidates, k, snapshot.rerank_terms_for)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_retrieval_engine(corpus_path: str, openai_api_key: str = None):
+    """
+    프로세스 전체에서 코퍼스 하나당 엔진 하나만 만들도록 캐싱합니다.
+    같은 corpus_path로 여러 봇을 만들어도 문서 로드와 인덱싱은 한 번만 일어납니다.
+    """
+    key = os.path.abspath(corpus_path)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = GuidelineRetrievalEngine(corpus_path, openai_api_key)
+            _engines[key] = engine
+        return engine
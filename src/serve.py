@@ -0,0 +1,178 @@
+"""
+여러 워커 프로세스로 백엔드를 실행하는 진입점입니다. (한 서버에서 코어 수만큼 확장)
+
+ 1. 인덱스가 없거나 코퍼스가 바뀌었으면 별도 프로세스에서 한 번만 임베딩해서 인덱스를 만들고,
+ 2. 마스터 프로세스가 검색 엔진과 봇을 미리 적재한 뒤 (LangChain/FAISS import, BM25/조항 색인, mmap 인덱스)
+ 3. 리스닝 소켓 하나를 열어 워커를 fork합니다. 워커마다 다시 임베딩하거나 인덱스를 읽지 않습니다.
+    FAISS 벡터 코드(IO_FLAG_MMAP_IFC)와 문서 저장소는 파일 mmap이라 워커들이 같은 페이지 캐시를 읽고,
+    BM25/조항 색인, HNSW 그래프, LangChain 객체처럼 마스터가 메모리에 만든 것은 copy-on-write로 공유합니다.
+    다만 CPython은 객체를 읽기만 해도 참조 카운트를 고치므로, 이런 페이지는 워커가 쓰는 만큼 워커마다 복사됩니다.
+    (remo_guideline.json, fake 임베딩, 워커 2개에서 잰 값: 워커당 RSS 약 99MB, 그중 워커 전용 약 13MB, PSS 약 41MB)
+ 4. 세션 기록과 쿼리 임베딩 캐시는 워커들이 공유하는 SQLite 파일에 둡니다.
+    (GUIDELINE_SESSION_STORE, GUIDELINE_EMBEDDING_CACHE_PATH를 지정하지 않았으면 data/ 아래 파일을 씁니다)
+    SQLite 호출은 스레드에서 실행하므로 다른 워커의 쓰기 잠금을 기다리는 동안에도 이벤트 루프는 막히지 않습니다.
+마스터는 죽은 워커를 다시 띄우고, SIGTERM/SIGINT를 받으면 워커들을 정상 종료시킨 뒤 끝납니다.
+fork를 쓰므로 Linux/macOS 전용입니다.
+
+워커별로 따로 가지는 것: 답변 캐시, /metrics 값(요청을 받은 워커의 값), Ollama 동시 처리 제한
+(GUIDELINE_OLLAMA_MAX_CONCURRENCY는 워커당 값이므로 전체 한도를 워커 수로 나눠 주세요).
+/admin/reload는 요청을 받은 워커만 다시 적재하므로, 문서 갱신은 ingest.py로 인덱스를 먼저 만든 뒤
+워커들이 GUIDELINE_CORPUS_WATCH_INTERVAL(여기서는 기본 30초)마다 변경을 확인해 로드만 하게 합니다.
+
+사용법: python serve.py [--host 0.0.0.0] [--port 8000] [--workers 코어 수]
+"""
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import subprocess
+from dotenv import load_dotenv
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+# 워커가 이 시간(초) 안에 죽으면 바로 다시 띄우지 않고 잠시 기다립니다. (기동 실패 반복 방지)
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def configure_shared_state(workers: int):
+    """
+    backend를 import하기 전에, 워커들이 공유해야 하는 저장소의 기본값을 정합니다.
+    """
+    if workers > 1:
+        os.environ.setdefault("GUIDELINE_SESSION_STORE", f"sqlite:///{os.path.join(DATA_DIR, 'sessions.sqlite3')}")
+        os.environ.setdefault("GUIDELINE_EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "query_embeddings.sqlite3"))
+        os.environ.setdefault("GUIDELINE_CORPUS_WATCH_INTERVAL", "30")
+        if os.environ["GUIDELINE_SESSION_STORE"] == "memory":
+            print("경고: GUIDELINE_SESSION_STORE=memory이면 세션 기록이 워커마다 따로 저장됩니다.")
+
+
+def build_indexes():
+    """
+    인덱스 생성(임베딩, FAISS 학습)은 자식 프로세스에서 합니다. 마스터가 FAISS의 OpenMP 스레드를
+    쓰지 않은 상태로 fork해야 워커에서 검색이 멈추지 않습니다. 마스터는 만들어진 인덱스를 열기만 합니다.
+    """
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--build-only"],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    print(f"인덱스 확인/생성 완료 ({time.perf_counter() - started:.2f}s)")
+
+
+def preload():
+    import backend
+    started = time.perf_counter()
+    for component in backend.COMPONENTS.values():
+        component.get()
+    # 적재한 객체들을 GC 대상에서 빼서, 워커의 GC가 참조 카운트/헤더를 건드려 페이지를 복사하는 일을 줄입니다.
+    gc.collect()
+    gc.freeze()
+    print(f"마스터 적재 완료 ({time.perf_counter() - started:.2f}s)")
+    return backend.app
+
+
+def create_socket(host: str, port: int, backlog: int):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, args):
+    import uvicorn
+    import faiss
+    # 워커들이 코어를 나눠 쓰도록 FAISS(OpenMP) 스레드 수를 줄입니다.
+    faiss.omp_set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=args.log_level, backlog=args.backlog,
+                            timeout_graceful_shutdown=args.graceful_timeout)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    워커 프로세스들을 fork하고 지켜봅니다. 워커가 죽으면 다시 띄우고, 종료 신호를 받으면 워커에 전달합니다.
+    """
+    def __init__(self, app, sock, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers = {}  # pid -> 기동 시각
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.args)
+            except BaseException as e:
+                print(f"워커 {os.getpid()} 오류: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        print(f"워커 시작: pid {pid}")
+
+    def stop(self, signum, frame):
+        if not self.stopping:
+            print(f"종료 신호({signal.Signals(signum).name})를 받았습니다. 워커 {len(self.workers)}개를 종료합니다.")
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            print(f"워커 {pid}가 종료되었습니다 (status {status}). 다시 시작합니다.")
+            if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+            if not self.stopping:
+                self.spawn()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="미리 적재한 검색 엔진을 여러 워커가 공유하는 백엔드 실행")
+    parser.add_argument("--host", default=os.getenv("GUIDELINE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("GUIDELINE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GUIDELINE_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=float, default=30, help="종료 시 처리 중인 요청을 기다릴 시간(초)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--build-only", action="store_true", help="인덱스만 만들고 끝냅니다. (배포 전 단계로도 사용)")
+    args = parser.parse_args()
+
+    # .env 값이 아래 기본값보다 우선하도록 먼저 읽습니다.
+    load_dotenv()
+    configure_shared_state(args.workers)
+    if args.build_only:
+        import backend
+        backend.engine.get()
+        return
+    build_indexes()
+    app = preload()
+    sock = create_socket(args.host, args.port, args.backlog)
+    print(f"http://{args.host}:{args.port} 에서 워커 {args.workers}개로 실행합니다.")
+    Supervisor(app, sock, args).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+# 세션당 보관할 최대 메시지 수 (User/Chatbot 메시지 각각 1개)
+MAX_MESSAGES_PER_SESSION = int(os.getenv("GUIDELINE_SESSION_MAX_MESSAGES", "50"))
+# 이 시간(초) 동안 요청이 없던 세션은 삭제합니다.
+SESSION_IDLE_TTL = float(os.getenv("GUIDELINE_SESSION_IDLE_TTL", str(6 * 60 * 60)))
+# 메모리 저장소 전체 메시지 용량 상한 (UTF-8 바이트 기준)
+SESSION_MEMORY_BUDGET = int(os.getenv("GUIDELINE_SESSION_MEMORY_BUDGET", str(64 * 1024 * 1024)))
+
+
+class SessionStore:
+    """
+    세션별 대화 기록 저장소 인터페이스입니다.
+    append()는 메시지를 추가하고, get_history()는 보관 중인 기록 전체를 반환합니다.
+    get_state()/set_state()는 대화 요약 등 세션별 상태(dict)를 읽고 씁니다.
+    blocking이 True인 저장소(파일 잠금을 기다릴 수 있는 SQLite)는 비동기 핸들러에서 스레드로 호출합니다.
+    """
+    blocking = False
+
+    def append(self, session_id: str, *messages: str):
+        raise NotImplementedError
+
+    def get_history(self, session_id: str):
+        raise NotImplementedError
+
+    def get_state(self, session_id: str):
+        raise NotImplementedError
+
+    def set_state(self, session_id: str, state: dict):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+
+class _Session:
+    __slots__ = ("messages", "size", "state", "last_access")
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.size = 0
+        self.state = None
+        self.last_access = time.monotonic()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    프로세스 메모리 저장소입니다. 세션당 메시지 수 상한, 유휴 TTL, 전체 용량 상한을 넘으면
+    가장 오래 사용하지 않은 세션(또는 메시지)부터 지웁니다.
+    """
+    def __init__(self, max_messages: int = MAX_MESSAGES_PER_SESSION, idle_ttl: float = SESSION_IDLE_TTL,
+                 memory_budget: int = SESSION_MEMORY_BUDGET):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+        self.sessions = OrderedDict()  # 최근 사용 순서
+        self.total_size = 0
+        self.lock = threading.Lock()
+
+    def _touch(self, session_id: str, create: bool):
+        session = self.sessions.get(session_id)
+        if session is None and create:
+            session = _Session(self.max_messages)
+            self.sessions[session_id] = session
+        if session is not None:
+            session.last_access = time.monotonic()
+            self.sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self, current_id: str = None):
+        now = time.monotonic()
+        for session_id in list(self.sessions):
+            session = self.sessions[session_id]
+            if now - session.last_access < self.idle_ttl and self.total_size <= self.memory_budget:
+                break
+            if session_id == current_id:
+                continue
+            self.total_size -= session.size
+            del self.sessions[session_id]
+        # 방금 사용한 세션 하나만으로도 용량을 넘으면 그 세션의 오래된 메시지부터 지웁니다.
+        current = self.sessions.get(current_id)
+        while current is not None and self.total_size > self.memory_budget and len(current.messages) > 1:
+            size = len(current.messages.popleft().encode("utf-8"))
+            current.size -= size
+            self.total_size -= size
+
+    def append(self, session_id: str, *messages: str):
+        with self.lock:
+            session = self._touch(session_id, create=True)
+            for message in messages:
+                if len(session.messages) == session.messages.maxlen:
+                    removed = session.messages[0]
+                    session.size -= len(removed.encode("utf-8"))
+                    self.total_size -= len(removed.encode("utf-8"))
+                session.messages.append(message)
+                size = len(message.encode("utf-8"))
+                session.size += size
+                self.total_size += size
+            self._evict(session_id)
+
+    def get_history(self, session_id: str):
+        with self.lock:
+            session = self._touch(session_id, create=False)
+            self._evict(session_id)
+            return list(session.messages) if session is not None else []
+
+    def get_state(self, session_id: str):
+        with self.lock:
+            session = self._touch(session_id, create=False)
+            self._evict(session_id)
+            return session.state if session is not None else None
+
+    def set_state(self, session_id: str, state: dict):
+        with self.lock:
+            session = self._touch(session_id, create=True)
+            session.state = state
+            self._evict(session_id)
+
+    def delete(self, session_id: str):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self.total_size -= session.size
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite 파일 저장소입니다. 같은 파일을 여러 uvicorn 워커가 함께 열어 세션을 공유합니다.
+    메시지 수 상한과 유휴 TTL은 쓰기 시점에 정리합니다.
+    다른 워커가 쓰는 동안 잠금을 최대 30초까지 기다리므로 blocking 저장소입니다.
+    """
+    blocking = True
+
+    def __init__(self, path: str, max_messages: int = MAX_MESSAGES_PER_SESSION, idle_ttl: float = SESSION_IDLE_TTL):
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.local = threading.local()
+        conn = self._conn()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "  session_id TEXT PRIMARY KEY, last_access REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "  id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, content TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "  session_id TEXT PRIMARY KEY, state TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);"
+            "CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);"
+        )
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 연결은 스레드 간에 공유하지 않고 스레드마다 하나씩 엽니다.
+        # fork된 워커(serve.py)는 부모가 열어 둔 연결을 물려받으므로 pid가 바뀌면 새로 엽니다.
+        pid, conn = getattr(self.local, "conn", (None, None))
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = (os.getpid(), conn)
+        return conn
+
+    def _touch(self, conn, session_id: str, now: float):
+        conn.execute(
+            "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+            (session_id, now),
+        )
+
+    def _expire(self, conn, now: float):
+        expired = now - self.idle_ttl
+        for table in ("messages", "session_state"):
+            conn.execute(
+                f"DELETE FROM {table} WHERE session_id IN (SELECT session_id FROM sessions WHERE last_access < ?)",
+                (expired,),
+            )
+        conn.execute("DELETE FROM sessions WHERE last_access < ?", (expired,))
+
+    def append(self, session_id: str, *messages: str):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            self._touch(conn, session_id, now)
+            conn.executemany(
+                "INSERT INTO messages (session_id, content) VALUES (?, ?)",
+                [(session_id, message) for message in messages],
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                "  SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages),
+            )
+            self._expire(conn, now)
+
+    def get_history(self, session_id: str):
+        conn = self._conn()
+        row = conn.execute("SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[0] >= self.idle_ttl:
+            return []
+        rows = conn.execute(
+            "SELECT content FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        return [content for (content,) in rows]
+
+    def get_state(self, session_id: str):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT s.last_access, st.state FROM sessions s JOIN session_state st USING (session_id) "
+            "WHERE s.session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[0] >= self.idle_ttl:
+            return None
+        return json.loads(row[1])
+
+    def set_state(self, session_id: str, state: dict):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            self._touch(conn, session_id, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO session_state (session_id, state) VALUES (?, ?)",
+                (session_id, json.dumps(state, ensure_ascii=False)),
+            )
+            self._expire(conn, now)
+
+    def delete(self, session_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+def create_session_store(url: str = None):
+    """
+    GUIDELINE_SESSION_STORE 값으로 저장소를 고릅니다.
+     - 'memory' (기본값): 워커 프로세스마다 따로 가지는 메모리 저장소
+     - 'sqlite:///경로': 여러 워커가 공유하는 SQLite 파일 저장소
+    """
+    url = url or os.getenv("GUIDELINE_SESSION_STORE", "memory")
+    if url == "memory":
+        return InMemorySessionStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    raise ValueError(f"지원하지 않는 세션 저장소입니다: {url}")
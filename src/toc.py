@@ -0,0 +1,70 @@
+import os
+import re
+import tempfile
+from index_store import compute_file_hash, publish_mode
+from article_index import parse_article_number, base_article_id
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# 목차 형식이 바뀌면 TOC_VERSION을 올려서 같은 코퍼스로 저장해 둔 목차 파일도 다시 만들게 합니다.
+TOC_VERSION = 2
+HASH_HEADER = "<!-- toc-v" + str(TOC_VERSION) + " corpus-sha256: {} -->"
+
+
+def get_toc_path(json_path: str):
+    # data/remo_guideline.json -> data/remo_guideline.toc.md
+    return os.path.splitext(json_path)[0] + ".toc.md"
+
+
+def render_toc(documents):
+    """
+    파싱된 조항 문서(section 메타데이터 + 첫 줄 제목)로 마크다운 목차를 만듭니다.
+    LLM 없이 항상 같은 결과가 나오며, 조항 제목으로 잘못 잘린 레코드는 건너뜁니다.
+    항/호 단위로 나눈 코퍼스는 한 조가 여러 레코드로 이어지므로 조마다 제목을 한 번만 씁니다.
+    """
+    lines = []
+    current_section = None
+    previous_article = None
+    for doc in documents:
+        section = doc.metadata.get("section", "")
+        title = WHITESPACE_PATTERN.sub(" ", doc.page_content.split("\n", 1)[0]).strip()
+        if parse_article_number(title) is None:
+            continue
+        # 같은 조의 레코드는 연달아 나옵니다. (본칙/부칙의 같은 번호 조항처럼 떨어져 있는 것은 따로 씁니다)
+        article = base_article_id(doc.metadata["article_id"]) if doc.metadata.get("article_id") else (section, title)
+        if article == previous_article:
+            continue
+        previous_article = article
+        if section != current_section:
+            if lines:
+                lines.append("")
+            lines.append(f"### {section}")
+            current_section = section
+        lines.append(f"- {title}")
+    return "\n".join(lines)
+
+
+def load_or_render_toc(json_path: str, documents):
+    """
+    json_path 옆에 저장된 목차 파일을 재사용합니다. 첫 줄에 기록된 코퍼스 해시가
+    현재 JSON과 다를 때만 다시 만들어 저장합니다.
+    """
+    toc_path = get_toc_path(json_path)
+    header = HASH_HEADER.format(compute_file_hash(json_path))
+    try:
+        with open(toc_path, "r", encoding="utf-8") as f:
+            first_line, _, body = f.read().partition("\n")
+        if first_line == header:
+            return body
+    except OSError:
+        pass
+
+    body = render_toc(documents)
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".toc-", dir=os.path.dirname(os.path.abspath(toc_path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(header + "\n" + body)
+        publish_mode(tmp_path)
+        os.replace(tmp_path, toc_path)
+    except OSError as e:
+        print(f"목차 파일 저장 실패: {e}")
+    return body
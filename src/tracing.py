@@ -0,0 +1,93 @@
+import os
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+import metrics
+
+# 1이면 요청마다 단계별 소요 시간을 한 줄로 출력합니다.
+TRACE_LOG = os.getenv("GUIDELINE_TRACE_LOG", "0") == "1"
+
+metrics.describe("guideline_stage_seconds", "답변 파이프라인 단계별 소요 시간(초)")
+
+_current_trace = contextvars.ContextVar("guideline_trace", default=None)
+
+
+class Trace:
+    """
+    요청 하나의 추적 정보입니다. 단계(span)별 소요 시간과, 분류 레이블 같은 속성을 모읍니다.
+    contextvars로 전달되므로 asyncio 작업과 asyncio.to_thread 안에서도 같은 Trace에 기록됩니다.
+    """
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans = []  # (단계, 시작 오프셋(초), 소요 시간(초))
+        self.attributes = {}
+
+    def add_span(self, stage: str, started: float, seconds: float):
+        self.spans.append((stage, started - self.started, seconds))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "elapsed_ms": round(self.elapsed() * 1000, 1),
+            "spans": [
+                {"stage": stage, "start_ms": round(offset * 1000, 1), "duration_ms": round(seconds * 1000, 1)}
+                for stage, offset, seconds in self.spans
+            ],
+            "attributes": self.attributes,
+        }
+
+    def summary(self):
+        stages = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, _, seconds in self.spans)
+        attributes = " ".join(f"{key}={value}" for key, value in self.attributes.items())
+        return f"[trace {self.trace_id}] {self.elapsed() * 1000:.1f}ms {stages} {attributes}".rstrip()
+
+
+def start_trace(trace_id: str = None):
+    """
+    새 Trace를 현재 컨텍스트에 설정하고 (Trace, 되돌릴 토큰)을 반환합니다.
+    """
+    trace = Trace(trace_id)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def annotate(**attributes):
+    # 현재 요청의 추적 정보에 속성을 남깁니다. (추적 중이 아니면 무시)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def record_span(stage: str, started: float):
+    """
+    started(time.perf_counter() 값)부터 지금까지를 stage의 소요 시간으로 기록합니다.
+    """
+    seconds = time.perf_counter() - started
+    metrics.observe("guideline_stage_seconds", seconds, {"stage": stage})
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, started, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    with 블록의 소요 시간을 guideline_stage_seconds{stage} 히스토그램과 현재 요청의 Trace에 기록합니다.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, started)
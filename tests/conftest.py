@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src/ 모듈을 패키지 없이 그대로 import합니다. (benchmarks/와 같은 방식)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from langchain.docstore.document import Document
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from admission import AdmissionController, RequestAdmission, Overloaded
+from guideline_bot_with_ollama import GuidelineOllamaBot
+
+DOCS = [
+    Document(page_content="제31조(연차유급휴가)\n1년간 80퍼센트 이상 출근한 사원에게 15일의 유급휴가를 준다.", metadata={"chunk_id": "a:31"}),
+]
+
+
+class StubEngine:
+    corpus_hash = "corpus"
+    documents = DOCS
+    embeddings = None
+    mode = "lexical"
+    toc = "### 제1장\n- 제31조(연차유급휴가)"
+
+    async def aretrieve(self, query):
+        return DOCS
+
+
+def make_bot():
+    bot = GuidelineOllamaBot("unused.json", "test", engine=StubEngine())
+    bot.chat_model = RunnableLambda(lambda prompt: AIMessage(content="연차"))
+    return bot
+
+
+async def answer(bot, controller, question):
+    with RequestAdmission(controller, timeout=0.1):
+        return await bot.aanswer_question(question)
+
+
+def test_slot_is_taken_only_for_model_calls():
+    async def run():
+        bot = make_bot()
+        controller = AdmissionController("test", max_concurrency=1, max_queue=0, max_wait=0.1)
+        held = await controller.acquire()
+        # 목차 요청은 모델을 부르지 않으므로 슬롯이 모두 차 있어도 답합니다.
+        assert await answer(bot, controller, "회사 내규 목차 보여줘") == StubEngine.toc
+        with pytest.raises(Overloaded):
+            await answer(bot, controller, "연차휴가는 며칠인가요?")
+        held.release()
+        assert await answer(bot, controller, "연차휴가는 며칠인가요?") == "연차"
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
@@ -0,0 +1,50 @@
+import asyncio
+from answer_cache import AnswerCache
+
+CORPUS_HASH = "corpus"
+
+
+class ConstantEmbeddings:
+    """어떤 질문이든 같은 벡터를 돌려줘서 의미 기반 단계가 항상 유사도 1.0이 되게 합니다."""
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0, 0.0]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def _cache_with(question, answer, embeddings):
+    cache = AnswerCache(embeddings, threshold=0.95)
+    _, vector = cache.get(question, CORPUS_HASH)
+    cache.put(question, answer, CORPUS_HASH, vector)
+    return cache
+
+
+def test_semantic_hit_for_same_numbers():
+    cache = _cache_with("연차 휴가는 며칠인가요?", "15일입니다.", ConstantEmbeddings())
+    answer, _ = cache.get("연차휴가 며칠 받을 수 있어?", CORPUS_HASH)
+    assert answer == "15일입니다."
+
+
+def test_semantic_tier_skips_different_article_numbers():
+    cache = _cache_with("제15조 내용 알려줘", "제15조 답변", ConstantEmbeddings())
+    answer, _ = cache.get("제16조 내용 알려줘", CORPUS_HASH)
+    assert answer is None
+    answer, _ = cache.get("제15조 내용을 알려 줘", CORPUS_HASH)
+    assert answer == "제15조 답변"
+
+
+def test_semantic_false_does_not_embed():
+    embeddings = ConstantEmbeddings()
+    cache = _cache_with("연차 휴가는 며칠인가요?", "15일입니다.", embeddings)
+    calls = embeddings.calls
+    answer, vector = asyncio.run(cache.aget("연차휴가 며칠 받을 수 있어?", CORPUS_HASH, semantic=False))
+    assert answer is None and vector is None
+    assert embeddings.calls == calls
+    # exact 단계는 semantic=False여도 그대로 씁니다.
+    answer, _ = cache.get("연차 휴가는 며칠인가요", CORPUS_HASH, semantic=False)
+    assert answer == "15일입니다."
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from embedding_cache import CachedEmbeddings, SQLiteEmbeddingStore
+
+
+class RecordingEmbeddings:
+    model = "recording"
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def test_disk_cache_keeps_newest_entries(tmp_path):
+    store = SQLiteEmbeddingStore(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for i in range(5):
+        store.put("m", f"q{i}", [float(i)])
+    store.prune()
+    assert [store.get("m", f"q{i}") for i in range(5)] == [None, None, [2.0], [3.0], [4.0]]
+
+
+def test_async_disk_access_runs_off_the_event_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    embeddings = CachedEmbeddings(RecordingEmbeddings(), cache_path=path, batch_window=0)
+    calls = []
+    for name in ("get", "put"):
+        original = getattr(embeddings.store, name)
+
+        def recording(*args, _original=original, _name=name):
+            calls.append((_name, threading.current_thread() is threading.main_thread()))
+            return _original(*args)
+        monkeypatch.setattr(embeddings.store, name, recording)
+
+    assert asyncio.run(embeddings.aembed_query("연차")) == [2.0, 1.0]
+    assert calls == [("get", False), ("put", False)]
+
+    # 다른 워커처럼 새로 연 캐시는 디스크에서 읽습니다.
+    other = CachedEmbeddings(RecordingEmbeddings(), cache_path=path, batch_window=0)
+    assert asyncio.run(other._aget_cached("연차")) == [2.0, 1.0]
@@ -0,0 +1,67 @@
+import asyncio
+from langchain.docstore.document import Document
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from conversation import ConversationState
+from guideline_bot import GuidelineBot
+
+DOCS = [
+    Document(page_content="제31조(연차유급휴가)\n1년간 80퍼센트 이상 출근한 사원에게 15일의 유급휴가를 준다.", metadata={"chunk_id": "a:31"}),
+    Document(page_content="제58조(징계의 종류)\n징계는 견책, 감봉, 정직, 해고로 구분한다.", metadata={"chunk_id": "a:58"}),
+]
+
+
+class StubEngine:
+    """임베딩 없이(lexical) 항상 같은 조항을 돌려주는 검색 엔진입니다."""
+    corpus_hash = "corpus"
+    documents = DOCS
+    embeddings = None
+    mode = "lexical"
+    toc = None
+
+    async def aretrieve(self, query):
+        return DOCS
+
+    def get_documents_by_ids(self, chunk_ids):
+        return [doc for doc in DOCS if doc.metadata["chunk_id"] in chunk_ids]
+
+
+def answer_by_prompt(prompt):
+    # 생성 프롬프트에 대화 요약이 들어갔는지에 따라 다른 답을 돌려줍니다.
+    return AIMessage(content="대화 맥락 답변" if "이전 대화 요약" in prompt.to_string() else "일반 답변")
+
+
+def make_bot():
+    bot = GuidelineBot("unused.json", "test", engine=StubEngine())
+    bot.chat_model = RunnableLambda(answer_by_prompt)
+    return bot
+
+
+def session_with_history():
+    conversation = ConversationState()
+    conversation.add_turn("징계 종류가 뭐야?", "견책, 감봉, 정직, 해고입니다.", "징계", ["a:58"])
+    return conversation
+
+
+def test_history_answer_is_not_served_to_other_sessions():
+    bot = make_bot()
+    question = "연차휴가는 며칠인가요?"
+    # 세션 A: 대화 기록이 있지만 독립적인 질문이므로 요약 없이 답하고, 그 답만 캐시합니다.
+    assert asyncio.run(bot.aanswer_question(question, session_with_history())) == "일반 답변"
+    assert asyncio.run(bot.aanswer_question(question, ConversationState())) == "일반 답변"
+
+    # 세션 A의 후속 질문은 요약을 넣어 답하고, 캐시하지 않습니다.
+    follow_up = "그럼 그건 어떻게 신청해?"
+    assert asyncio.run(bot.aanswer_question(follow_up, session_with_history())) == "대화 맥락 답변"
+    assert asyncio.run(bot.aanswer_question(follow_up, ConversationState())) == "일반 답변"
+
+
+def test_streamed_history_answer_is_not_served_to_other_sessions():
+    bot = make_bot()
+
+    async def stream(question, conversation):
+        return "".join([chunk async for chunk in bot.astream_answer(question, conversation)])
+
+    question = "연차휴가는 며칠인가요?"
+    assert asyncio.run(stream(question, session_with_history())) == "일반 답변"
+    assert asyncio.run(stream(question, ConversationState())) == "일반 답변"
@@ -0,0 +1,25 @@
+import asyncio
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from guideline_bot_with_ollama import GuidelineOllamaBot
+
+
+class StubEngine:
+    corpus_hash = "corpus"
+    documents = []
+    embeddings = None
+    mode = "lexical"
+REASONING_OUTPUT = "<think>\n질문이 휴가 일수를 묻고 있으니 핵심 단어는 연차다.\n</think>\n\n연차"
+
+
+def make_bot():
+    bot = GuidelineOllamaBot("unused.json", "test", engine=StubEngine())
+    bot.chat_model = RunnableLambda(lambda prompt: AIMessage(content=REASONING_OUTPUT))
+    return bot
+
+
+def test_think_block_is_stripped_from_every_classifier_path():
+    bot = make_bot()
+    assert bot.classify_question("휴가는 며칠이야?") == "연차"
+    assert asyncio.run(bot.aclassify_question("휴가는 며칠이야?")) == "연차"
+    assert asyncio.run(bot.arewrite_question("그건 며칠이야?", "연차 휴가 질문")) == "연차"
@@ -0,0 +1,46 @@
+import os
+import stat
+import numpy as np
+import faiss
+import pytest
+from langchain.docstore.document import Document
+from index_store import build_faiss_index, save_vector_store, load_vector_store, UMASK
+
+
+class FixedEmbeddings:
+    def embed_query(self, text):
+        return [0.0] * 8
+
+
+def _codes(index):
+    index = faiss.downcast_index(index)
+    if hasattr(index, "storage"):
+        index = faiss.downcast_index(index.storage)
+    return index.codes
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8", "hnsw"])
+def test_loaded_index_is_memory_mapped(tmp_path, index_type):
+    vectors = np.random.default_rng(0).random((300, 8), dtype=np.float32)
+    documents = [Document(page_content=f"제{i}조", metadata={"article_id": str(i)}) for i in range(len(vectors))]
+    index, built_type = build_faiss_index(vectors, index_type)
+    assert built_type == index_type
+    index_dir = str(tmp_path / "corpus.index")
+    assert save_vector_store(index, vectors, documents, index_dir, {})
+
+    vectorstore = load_vector_store(index_dir, FixedEmbeddings())
+
+    # 파일에 매핑된 코드 배열은 인덱스가 소유하지 않습니다. (메모리로 복사했다면 is_owned가 True)
+    assert _codes(vectorstore.index).is_owned is False
+    _, expected = index.search(vectors[:5], 3)
+    _, actual = vectorstore.index.search(vectors[:5], 3)
+    assert (expected == actual).all()
+
+
+def test_saved_index_follows_umask(tmp_path):
+    vectors = np.random.default_rng(0).random((10, 8), dtype=np.float32)
+    documents = [Document(page_content=f"제{i}조", metadata={}) for i in range(len(vectors))]
+    index, _ = build_faiss_index(vectors, "flat")
+    index_dir = tmp_path / "corpus.index"
+    assert save_vector_store(index, vectors, documents, str(index_dir), {})
+    assert stat.S_IMODE(os.stat(index_dir).st_mode) == 0o777 & ~UMASK
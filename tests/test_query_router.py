@@ -0,0 +1,28 @@
+import pytest
+from query_router import QueryRouter, TOC_LABEL
+
+TITLES = [
+    "제31조(연차유급휴가)",
+    "제32조(연차휴가의 사용)",
+    "제58조(징계의 종류)",
+]
+
+
+@pytest.fixture
+def router():
+    return QueryRouter(TITLES)
+
+
+@pytest.mark.parametrize("question", ["목차 보여줘", "규정 차례 좀 알려줘", "차례를 보여 주세요", "Show me the table of contents"])
+def test_toc_request(router, question):
+    assert router.route(question).label == TOC_LABEL
+
+
+@pytest.mark.parametrize("question", ["연차를 몇 차례 나눠 쓸 수 있나요?", "징계는 두 차례까지 받을 수 있어?"])
+def test_counter_word_is_not_toc_request(router, question):
+    decision = router.route(question)
+    assert decision is None or decision.label != TOC_LABEL
+
+
+def test_article_reference(router):
+    assert router.route("제15조 내용 알려줘").label == "제15조"
@@ -0,0 +1,51 @@
+import os
+import shutil
+import asyncio
+import pytest
+from langchain.docstore.document import Document
+from lexical_index import BM25Index, tokenize
+from reranker import LexicalReranker, RERANK_POOL, rerank
+import retrieval_engine
+
+DOCS = [
+    Document(page_content="제31조(연차유급휴가)\n1년간 80퍼센트 이상 출근한 사원에게 15일의 유급휴가를 준다.", metadata={"chunk_id": "a:31"}),
+    Document(page_content="제58조(징계의 종류)\n징계는 견책, 감봉, 정직, 해고로 구분한다.", metadata={"chunk_id": "a:58"}),
+]
+
+
+def test_precomputed_terms_match_tokenized_documents():
+    index = BM25Index(doc.page_content for doc in DOCS)
+    precomputed = {
+        doc.metadata["chunk_id"]: (index.idf, frozenset(tokenize(doc.page_content.partition("\n")[0])), terms)
+        for doc, terms in zip(DOCS, index.doc_terms)
+    }
+
+    def tokenized(doc):
+        title, _, content = doc.page_content.partition("\n")
+        return index.idf, set(tokenize(title)), set(tokenize(title)) | set(tokenize(content))
+
+    reranker = LexicalReranker()
+    query = "연차휴가는 며칠인가요"
+    scores = reranker.score(query, DOCS, lambda doc: precomputed[doc.metadata["chunk_id"]])
+    assert scores == reranker.score(query, DOCS, tokenized)
+    assert scores[0] > scores[1]
+
+
+@pytest.mark.parametrize("mode", ["lexical", "hybrid"])
+def test_rerank_runs_when_k_is_at_least_the_pool(tmp_path, monkeypatch, mode):
+    corpus = tmp_path / "corpus.json"
+    shutil.copy(os.path.join(os.path.dirname(__file__), "../data/remo_guideline.json"), corpus)
+    engine = retrieval_engine.GuidelineRetrievalEngine(str(corpus), mode=mode, embedding_provider="fake", reranker="lexical")
+    calls = []
+
+    def spy(reranker, query, docs, k, terms_for=None):
+        calls.append(len(docs))
+        return rerank(reranker, query, docs, k, terms_for)
+
+    monkeypatch.setattr(retrieval_engine, "rerank_documents", spy)
+    k = RERANK_POOL + 5
+    engine.retrieve("연차휴가는 며칠인가요", k=k)
+    asyncio.run(engine.aretrieve("연차휴가는 며칠인가요", k=k))
+    assert len(calls) == 2
+    assert engine.retrieve("연차휴가는 며칠인가요", k=k, rerank=False)
+    assert len(calls) == 2
@@ -0,0 +1,23 @@
+import os
+import json
+from chunk_data import refine_records
+from retrieval_engine import load_json_documents
+from toc import render_toc
+
+CORPUS = os.path.join(os.path.dirname(__file__), "../data/remo_guideline.json")
+
+
+def documents_at(granularity, tmp_path):
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        records = list(refine_records(json.load(f), granularity))
+    path = tmp_path / f"{granularity}.json"
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return load_json_documents(str(path))
+
+
+def test_fine_grained_corpus_renders_each_article_once(tmp_path):
+    article_toc = render_toc(documents_at("article", tmp_path))
+    for granularity in ("item", "clause"):
+        documents = documents_at(granularity, tmp_path)
+        assert len(documents) > article_toc.count("\n- ")
+        assert render_toc(documents) == article_toc